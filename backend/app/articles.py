@@ -0,0 +1,160 @@
+import itertools
+import threading
+
+from dataclasses import dataclass, field, fields
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence
+
+
+# Large per-article payloads (raw scrape responses, prepared content) are kept here and articles
+# only hold a reference, so pipeline state stays small however many results a query fans out to.
+# Each query's articles share one store, which goes away with them: a reference stays valid as long
+# as the article holding it, and one the store never handed out raises KeyError.
+class PayloadStore:
+    def __init__(self):
+        self._entries: Dict[str, Any] = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def put(self, value: Any) -> Optional[str]:
+        if value is None:
+            return None
+        with self._lock:
+            ref = f"payload-{next(self._ids)}"
+            self._entries[ref] = value
+        return ref
+
+    def get(self, ref: Optional[str]) -> Optional[Any]:
+        return self._entries[ref] if ref is not None else None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __repr__(self) -> str:
+        return f"PayloadStore({len(self._entries)} payloads)"
+
+    # Copies of pipeline state (Burr deep-copies it for parallel branches) still share the query's store
+    def __deepcopy__(self, memo: dict) -> "PayloadStore":
+        return self
+
+
+# One SERP result and everything the pipeline learns about it. The scrape response and
+# prepared content are stored by reference in the query's PayloadStore; the rest is small.
+@dataclass(slots=True)
+class Article:
+    position: Optional[int]
+    link: str
+    title: Optional[str] = None
+    source: Optional[str] = None
+    date: Optional[str] = None
+    snippet: Optional[str] = None
+    thumbnail: Optional[str] = None
+    outlet: Optional[str] = None
+    political_bias: Optional[str] = None
+    scraped_ref: Optional[str] = None
+    prepared_ref: Optional[str] = None
+    news_analyst_response: Optional[str] = None
+    bias_analysis: Optional[dict] = None
+    bias_analysis_stats: Optional[dict] = None
+    duplicate_of: Optional[str] = None  # link of the earlier article in the query this one repeats
+    payloads: Optional[PayloadStore] = field(default=None, repr=False, compare=False)
+
+    @classmethod
+    def from_serp(cls, result: dict, payloads: Optional[PayloadStore] = None) -> "Article":
+        return cls(
+            position=result.get("position"),
+            link=result["link"],
+            title=result.get("title"),
+            source=result.get("source"),
+            date=result.get("date"),
+            snippet=result.get("snippet"),
+            thumbnail=result.get("thumbnail"),
+            payloads=payloads,
+        )
+
+    # The store an article without one (built outside a query's batch) writes its payloads to.
+    def _payload_store(self) -> PayloadStore:
+        if self.payloads is None:
+            self.payloads = PayloadStore()
+        return self.payloads
+
+    @property
+    def scraped_article(self) -> Optional[dict]:
+        return self.payloads.get(self.scraped_ref) if self.payloads is not None else None
+
+    @scraped_article.setter
+    def scraped_article(self, scraped: Optional[dict]) -> None:
+        self.scraped_ref = self._payload_store().put(scraped)
+
+    @property
+    def prepared_content(self) -> Optional[dict]:
+        return self.payloads.get(self.prepared_ref) if self.payloads is not None else None
+
+    @prepared_content.setter
+    def prepared_content(self, prepared: Optional[dict]) -> None:
+        self.prepared_ref = self._payload_store().put(prepared)
+
+    # The record as the API, job results and persistence see it: payload references are
+    # resolved (or left out with include_payloads=False).
+    def to_dict(self, include_payloads: bool = True) -> dict:
+        record = {name: getattr(self, name) for name in ARTICLE_FIELDS if name not in PAYLOAD_FIELDS}
+        if include_payloads:
+            record["scraped_article"] = self.scraped_article
+        return record
+
+
+ARTICLE_FIELDS = tuple(article_field.name for article_field in fields(Article))
+PAYLOAD_FIELDS = ("scraped_ref", "prepared_ref", "payloads")
+
+
+# A query's articles stored column by column (one tuple per Article field). Columns are
+# immutable and shared between batches, so with_columns() and the Burr state updates holding
+# a batch copy a few references instead of every article; rows are built as Article records
+# on demand.
+class ArticleBatch:
+    __slots__ = ("_columns", "_length")
+
+    def __init__(self, columns: Dict[str, Sequence]):
+        self._columns = {name: tuple(columns[name]) for name in ARTICLE_FIELDS}
+        self._length = len(self._columns["link"])
+        if any(len(column) != self._length for column in self._columns.values()):
+            raise ValueError("All ArticleBatch columns must have the same length")
+
+    @classmethod
+    def from_articles(cls, articles: Iterable[Article]) -> "ArticleBatch":
+        articles = list(articles)
+        return cls({name: [getattr(article, name) for article in articles] for name in ARTICLE_FIELDS})
+
+    # A query's articles, sharing one payload store that lives as long as they do
+    @classmethod
+    def from_serp(cls, results: Iterable[dict]) -> "ArticleBatch":
+        payloads = PayloadStore()
+        return cls.from_articles(Article.from_serp(result, payloads) for result in results)
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __getitem__(self, index: int) -> Article:
+        return Article(*(self._columns[name][index] for name in ARTICLE_FIELDS))
+
+    def __iter__(self) -> Iterator[Article]:
+        for values in zip(*(self._columns[name] for name in ARTICLE_FIELDS)):
+            yield Article(*values)
+
+    def __repr__(self) -> str:
+        return f"ArticleBatch({self._length} articles)"
+
+    def articles(self) -> List[Article]:
+        return list(self)
+
+    def column(self, name: str) -> tuple:
+        return self._columns[name]
+
+    # A new batch with some columns replaced; the others are shared with this one.
+    def with_columns(self, **columns: Sequence) -> "ArticleBatch":
+        unknown = set(columns) - set(ARTICLE_FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown Article fields: {sorted(unknown)}")
+        return ArticleBatch({**self._columns, **columns})
+
+    def to_dicts(self, include_payloads: bool = True) -> List[dict]:
+        return [article.to_dict(include_payloads=include_payloads) for article in self]
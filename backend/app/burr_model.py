@@ -1,16 +1,29 @@
+import dataclasses
 import os
-import requests
+import time
 
-from burr.core import action, State, ApplicationBuilder
-from burr.tracking import LocalTrackingClient
-from dotenv import load_dotenv
+from burr.core import action, State, ApplicationBuilder, ApplicationContext, Application, default, when
+from burr.core.graph import GraphBuilder
+from burr.core.parallelism import MapActions, RunnableGraph, SubGraphTask
+from burr.lifecycle import PreRunStepHook, PostRunStepHook
+from concurrent.futures import Future, ThreadPoolExecutor, FIRST_COMPLETED, wait
 from pydantic import BaseModel, Field
-from serpapi.google_search import GoogleSearch
-from typing import Optional, List
-
-from constants import (news_rating_bias, fox_exclude_tags, npr_exclude_tags, include_tags, summarize_article_system_prompt)
-from utils import assign_article_bias, group_sources, call_groq, client
-from models import NewsExtractSchema
+from typing import Any, Dict, Generator, Iterator, Optional, List, Sequence, Tuple
+
+from articles import Article, ArticleBatch, PayloadStore
+from constants import (summarize_article_system_prompt, scrape_max_workers, scrape_per_host_concurrency,
+                       scrape_per_host_rate, bias_analysis_max_workers, bias_analysis_batched, dedup_enabled,
+                       persist_results)
+from concurrency import HostThrottle
+from dedup import (DuplicateDetector, analyze_articles_deduplicated, dedupe_by_canonical_url, get_fingerprint_index,
+                   merge_duplicate)
+from outlets import get_outlet_registry
+from utils import (assign_article_bias, drop_disabled_outlets, group_sources, call_groq, scrape_articles_concurrently,
+                   analyze_articles_bias_concurrently, analyze_articles_bias_batched, analyze_article_bias,
+                   scrape_single_article, summarize_article, bias_comparison_prompts, stream_bias_comparison,
+                   get_prepared_content, scrape_article, serp_search)
+from semantic_cache import get_semantic_cache
+from telemetry import is_enabled as telemetry_enabled, run_timed, span, time_action
 
 @action(reads=[], writes=['original_user_input'])
 def user_entry_point(
@@ -28,8 +41,12 @@ def set_serp_params(
         state: State,
         # time_range: Optional[str],
         country: Optional[str] = "us",
-        site_list: Optional[List[str]] = ["foxnews.com", "npr.org"]
+        site_list: Optional[List[str]] = None
 ) -> State:
+    # Defaults to the outlets marked search_by_default in outlets.json
+    if site_list is None:
+        site_list = get_outlet_registry().default_search_domains()
+
     # Set up your search parameters
     params = {
         "api_key": os.environ['SERP_API_KEY'],
@@ -54,26 +71,25 @@ def serp_google_search(
 ) -> State:
 
     # Execute the search
-    search = GoogleSearch(state["serp_params"])
-    results = search.get_dict()
-
-    # Process the results
-    news_results = results.get("news_results", [])
-    news_results = assign_article_bias(
-         news_bias_ratings=news_rating_bias,
-         articles=news_results
-    )
+    results = serp_search(state["serp_params"])
+
+    # Process the results; the query's scrape responses and prepared content live as long as its articles
+    payloads = PayloadStore()
+    articles = [Article.from_serp(result, payloads) for result in results.get("news_results", []) if result.get("link")]
+    articles = assign_article_bias(drop_disabled_outlets(articles))
+    if dedup_enabled:
+        articles = dedupe_by_canonical_url(articles)
     
-    return state.update(news_results=news_results)
+    return state.update(news_results=ArticleBatch.from_articles(articles))
 
 @action(reads=["news_results"], writes=["media_grouped_news_results"])
 def group_serp_results_by_source(
         state: State,
 ) -> State:
-    # Group results by news source
+    # Group results by news outlet (SERP's source name when the outlet isn't in the registry)
     news_by_source = {}
     for article in state["news_results"]:
-        source = article.get("source")
+        source = article.outlet or article.source
         if source not in news_by_source:
             news_by_source[source] = []
         news_by_source[source].append(article)
@@ -92,70 +108,25 @@ def subject_extraction(
     subject_extraction_system_prompt = "You will be given a question regarding a subject in the news. Extract the subject from the question."
     subject = call_groq(
         user_prompt=state['original_user_input'],
-        system_prompt=subject_extraction_system_prompt)
+        system_prompt=subject_extraction_system_prompt,
+        task="subject_extraction")
     
     return state.update(query_subject=subject)
 
-# Helper function for scraping all articles
-def scrape_article(
-        url: str, 
-        exclude_tags: List, 
-        include_tags: List
-     ) -> dict:
-    # API endpoint
-    api_url = "https://api.firecrawl.dev/v1/scrape"
-    
-    # Request payload using Firecrawl's automatic content extraction
-    payload = {
-        "url": url,
-        "formats": ['json'],
-        "onlyMainContent": True,
-        "jsonOptions": {
-            "schema": NewsExtractSchema.model_json_schema(),
-            "systemPrompt": "Extract out the main title of the article and the main contents of the article. Don't pull any advertisement or extraneous information."
-        },
-        "excludeTags": exclude_tags,
-        "includeTags": include_tags,
-        "removeBase64Images": True,
-    }
-    
-    # Headers with your API key
-    headers = {
-        "Authorization": f"Bearer {os.environ['FIRECRAWL_API_KEY']}",
-        "Content-Type": "application/json"
-    }
-    
-    # Make the request
-    response = requests.post(api_url, json=payload, headers=headers)
-    
-    # Parse response
-    if response.status_code == 200:
-        return response.json()
-    else:
-        return {"error": response.text}
-    
 @action(reads=["news_results"], writes=["news_results"])
 def scrape_article_corpus(
-        state: State
+        state: State,
+        max_workers: int = scrape_max_workers
 ) -> State:
-        articles = state["news_results"]
-
-        for article in articles:
-
-                if article['source'] == 'Fox News':
-                        articles[article['position']-1]['scraped_article'] = scrape_article(
-                        article['link'], 
-                        exclude_tags=fox_exclude_tags,
-                        include_tags=include_tags
-                        )
-                else:
-                        articles[article['position']-1]['scraped_article'] = scrape_article(
-                        article['link'],
-                        exclude_tags=npr_exclude_tags,
-                        include_tags=include_tags
-                        )
+        articles = scrape_articles_concurrently(
+                state["news_results"].articles(),
+                scrape_fn=scrape_article,
+                max_workers=max_workers
+        )
 
-        return state.update(news_results=articles)
+        return state.update(news_results=state["news_results"].with_columns(
+                scraped_ref=[article.scraped_ref for article in articles]
+        ))
 
 
 # This one's output isn't being used as part of the bias work. More so useful for presenting main points to the user at the end.
@@ -164,109 +135,361 @@ def news_articles_summarizer(
         state: State,
         summarize_article_system_prompt: str = summarize_article_system_prompt
 ) -> State:
-    articles = state["news_results"]
+    articles = state["news_results"].articles()
 
     for article in articles:
 
-        user_prompt = f"Article: {articles[article['position']-1]['scraped_article']}"
-        chat_completion = client.chat.completions.create(
-                messages=[
-                {
-                        "role": "system",
-                        "content": summarize_article_system_prompt
-                },
-                {
-                        "role": "user",
-                        "content": user_prompt
-                },
-                ],
-                model="llama-3.1-8b-instant",
+        article.news_analyst_response = summarize_article(
+                article,
+                summarize_article_system_prompt=summarize_article_system_prompt
         )
 
-        articles[article['position']-1]['news_analyst_response'] = chat_completion.choices[0].message.content
+    return state.update(news_results=ArticleBatch.from_articles(articles))
 
-    return state.update(news_results=articles)
 
+# determine bias of a list of articles
+@action(reads=['news_results', 'query_subject'], writes=['news_results'])
+def bias_analysis_all_articles(
+        state: State,
+        max_workers: int = bias_analysis_max_workers,
+        batched: bool = bias_analysis_batched
+) -> State:
+    analyze = analyze_articles_bias_batched if batched else analyze_articles_bias_concurrently
+    articles = analyze_articles_deduplicated(
+        user_query_subject=state['query_subject'],
+        articles=state['news_results'].articles(),
+        analyze=analyze,
+        max_workers=max_workers
+    )
 
-# Determine bias of one article
-def single_article_bias_analysis(
-    user_query_subject: str,
-    media_publisher: str,
-    media_bias_leaning: str,
-    article_title: str,
-    article_content: str
-    ) -> dict:
+    return state.update(news_results=ArticleBatch.from_articles(articles))
 
-    bias_user_prompt = f"""
-    USER QUERY SUBJECT: {user_query_subject}
-    NEWS PUBLISHER: {media_publisher}
-    MEDIA BIAS LEANING: {media_bias_leaning}
 
-    ======
+# Compare the bias of different articles grouped by media source
+@action(reads=['query_subject', 'media_grouped_news_results'], writes=["bias_comparison_output"])
+def bias_comparison(
+        state: State
+    ) -> str:
 
-    ARTICLE TITLE: {article_title}
-    ARTICLE CONTENT: {article_content}
-    """
-    tries = 0
-    while tries <= 5:
-        tries += 1
-        groq_bias_analysis = call_groq(
-            system_prompt=bias_system_prompt,
-            user_prompt=bias_user_prompt
-        )
+    system_prompt, user_prompt = bias_comparison_prompts(state['query_subject'], state['media_grouped_news_results'])
+    bias_comparison_output = call_groq(system_prompt=system_prompt, user_prompt=user_prompt, task="bias_comparison")
 
-        print(f"groq bias analysis: {groq_bias_analysis}")
-        
-        try:
-            groq_output_dict = json.loads(groq_bias_analysis.replace('\n', ''))
-            return groq_output_dict
-        except json.JSONDecodeError as e:
-            print(f"{json.JSONDecodeError}. Retrying...")
+    return state.update(bias_comparison_output=bias_comparison_output)
 
 
-# determine bias of a list of articles
-@action(reads=['news_results', 'query_subject'], writes=['news_results'])
-def bias_analysis_all_articles(
+##############
+## Pipeline ##
+##############
+
+# Extract the subject up front and reuse a recent analysis of a similar subject if there is one.
+@action(reads=["original_user_input"], writes=["query_subject", "semantic_cache_hit", "bias_comparison_output"])
+def lookup_semantic_cache(
         state: State
 ) -> State:
-    articles = state['news_results']
+    subject_state = subject_extraction(state)
+    cached = get_semantic_cache().lookup(subject_state['query_subject'])
+    if cached is None:
+        return subject_state.update(semantic_cache_hit=False, bias_comparison_output=None)
 
-    for article in articles:
-        if article['scraped_article'].get('data'):
-
-            articles[article['position']-1]['bias_analysis'] = single_article_bias_analysis(
-            user_query_subject=state['query_subject'],
-            media_publisher=article['source'],
-            media_bias_leaning=article['political_bias'],
-            article_title=article['scraped_article']['data']['json']['main_article_title'],
-            article_content=article['scraped_article']['data']['json']['main_article_content']
-            )
-        else:
-            continue
-        
-    return state.update(news_results=articles)
+    return subject_state.update(semantic_cache_hit=True, bias_comparison_output=cached['result']['bias_comparison_output'])
 
 
-# Compare the bias of different articles grouped by media source
-@action(reads=['query_subject', 'media_grouped_news_results'], writes=["bias_comparison_output"])
-def bias_comparison(
+@action(reads=["bias_comparison_output"], writes=[])
+def serve_cached_comparison(
         state: State
-    ) -> str:
+) -> State:
+    return state
 
-    compare_biases_user_prompt = f"""
-    USER QUERY SUBJECT: {state['query_subject']}
 
-    ======\n
-    """
-    for agency in state['media_grouped_news_results']:
-        compare_biases_user_prompt += f"\n# {agency}\n"
-        for article in state['media_grouped_news_results'][agency]:
-            if article.get('bias_analysis') is not None:
-                compare_biases_user_prompt += f"{article['bias_analysis']}\n"
+@action(reads=["original_user_input", "query_subject", "bias_comparison_output"], writes=[])
+def store_in_semantic_cache(
+        state: State
+) -> State:
+    get_semantic_cache().add(state['query_subject'], {
+        "original_user_input": state['original_user_input'],
+        "bias_comparison_output": state['bias_comparison_output'],
+    })
+    return state
+
+
+# A parallel branch that runs with the parent application's hooks, so the per-action timing
+# trace and telemetry see the actions inside it too.
+@dataclasses.dataclass
+class _HookedSubGraphTask(SubGraphTask):
+    hooks: tuple = ()
+
+    def _create_app_builder(self, parent_context) -> ApplicationBuilder:
+        builder = super()._create_app_builder(parent_context)
+        return builder.with_hooks(*self.hooks) if self.hooks else builder
+
+
+# subject_extraction only depends on the user's question, so Burr runs it as a parallel branch
+# next to SERP search -> scraping (the slow branch) and joins both. If the subject is already
+# known (semantic cache lookup), only the search branch runs.
+class SearchScrapeAndExtractSubject(MapActions):
+    def __init__(self, hooks: Sequence = ()):
+        super().__init__()
+        self._hooks = tuple(hooks)
+
+    def actions(self, state: State, context: ApplicationContext, inputs: Dict[str, Any]) -> Generator:
+        yield RunnableGraph(
+            graph=(
+                GraphBuilder()
+                .with_actions(serp_google_search=serp_google_search, scrape_article_corpus=scrape_article_corpus)
+                .with_transitions(("serp_google_search", "scrape_article_corpus"))
+                .build()
+            ),
+            entrypoint="serp_google_search",
+            halt_after=["scrape_article_corpus"],
+        )
+        if "query_subject" not in state:
+            yield subject_extraction
+
+    def tasks(self, state: State, context: ApplicationContext, inputs: Dict[str, Any]) -> Generator:
+        for task in super().tasks(state, context, inputs):
+            yield _HookedSubGraphTask(
+                **{field.name: getattr(task, field.name) for field in dataclasses.fields(task)}, hooks=self._hooks
+            )
 
-    bias_comparison_output = call_groq(
-        system_prompt=compare_biases_system_prompt,
-        user_prompt=compare_biases_user_prompt
+    def reduce(self, state: State, states: Generator[State, None, None]) -> State:
+        for branch_state in states:
+            state = state.update(**{key: branch_state[key] for key in ("query_subject", "news_results")
+                                    if key in branch_state})
+        return state
+
+    @property
+    def reads(self) -> List[str]:
+        return ["original_user_input", "serp_params", "query_subject"]
+
+    @property
+    def writes(self) -> List[str]:
+        return ["query_subject", "news_results"]
+
+
+# Records wall-clock duration of every action the application runs.
+class ActionTimingHook(PreRunStepHook, PostRunStepHook):
+    def __init__(self):
+        self.trace = []
+        self._started = {}
+
+    def pre_run_step(self, *, action, **future_kwargs):
+        self._started[action.name] = time.perf_counter()
+
+    def post_run_step(self, *, action, exception, **future_kwargs):
+        started = self._started.pop(action.name, None)
+        self.trace.append({
+            "action": action.name,
+            "duration_s": round(time.perf_counter() - started, 3) if started is not None else None,
+            "error": repr(exception) if exception else None,
+        })
+
+
+# Feeds each action's duration into the pipeline_action_duration_seconds histogram and, with
+# tracing on, opens an OpenTelemetry span around it (external calls made on the same thread nest under it).
+class TelemetryHook(PreRunStepHook, PostRunStepHook):
+    def __init__(self):
+        self._timers = {}
+
+    def pre_run_step(self, *, action, **future_kwargs):
+        timer = time_action(action.name)
+        timer.__enter__()
+        self._timers[action.name] = timer
+
+    def post_run_step(self, *, action, exception, **future_kwargs):
+        timer = self._timers.pop(action.name, None)
+        if timer is not None:
+            timer.__exit__(type(exception) if exception else None, exception, None)
+
+
+# With the semantic cache on, the subject is extracted first and a similar recent question
+# short-circuits the run; otherwise subject extraction overlaps with search and scraping.
+def build_application(
+        timing_hook: Optional[ActionTimingHook] = None,
+        tracking_project: Optional[str] = None,
+        use_semantic_cache: Optional[bool] = None
+) -> Application:
+    if use_semantic_cache is None:
+        use_semantic_cache = get_semantic_cache() is not None
+
+    hooks = []
+    if timing_hook is not None:
+        hooks.append(timing_hook)
+    if telemetry_enabled():
+        hooks.append(TelemetryHook())
+
+    actions = dict(
+        user_entry_point=user_entry_point,
+        set_serp_params=set_serp_params,
+        search_scrape_and_extract_subject=SearchScrapeAndExtractSubject(hooks=hooks),
+        bias_analysis_all_articles=bias_analysis_all_articles,
+        group_serp_results_by_source=group_serp_results_by_source,
+        bias_comparison=bias_comparison,
     )
+    transitions = [
+        ("set_serp_params", "search_scrape_and_extract_subject"),
+        ("search_scrape_and_extract_subject", "bias_analysis_all_articles"),
+        ("bias_analysis_all_articles", "group_serp_results_by_source"),
+        ("group_serp_results_by_source", "bias_comparison"),
+    ]
+    if use_semantic_cache:
+        actions.update(
+            lookup_semantic_cache=lookup_semantic_cache,
+            serve_cached_comparison=serve_cached_comparison,
+            store_in_semantic_cache=store_in_semantic_cache,
+        )
+        transitions += [
+            ("user_entry_point", "lookup_semantic_cache"),
+            ("lookup_semantic_cache", "serve_cached_comparison", when(semantic_cache_hit=True)),
+            ("lookup_semantic_cache", "set_serp_params", default),
+            ("bias_comparison", "store_in_semantic_cache"),
+        ]
+    else:
+        transitions.append(("user_entry_point", "set_serp_params"))
 
-    return state.update(bias_comparison_output=bias_comparison_output)
+    builder = (
+        ApplicationBuilder()
+        .with_actions(**actions)
+        .with_transitions(*transitions)
+        .with_entrypoint("user_entry_point")
+    )
+    if hooks:
+        builder = builder.with_hooks(*hooks)
+    if tracking_project is not None:
+        from burr.tracking import LocalTrackingClient  # pulls in the tracking server's dependencies
+
+        builder = builder.with_tracker(LocalTrackingClient(project=tracking_project))
+
+    return builder.build()
+
+
+# Run the full pipeline for one question. Returns the final state and the per-action timing trace.
+def run_pipeline(
+        query: str,
+        tracking_project: Optional[str] = None,
+        use_semantic_cache: Optional[bool] = None
+) -> Tuple[State, List[dict]]:
+    if use_semantic_cache is None:
+        use_semantic_cache = get_semantic_cache() is not None
+    timing_hook = ActionTimingHook()
+    app = build_application(
+        timing_hook=timing_hook,
+        tracking_project=tracking_project,
+        use_semantic_cache=use_semantic_cache
+    )
+    halt_after = ["serve_cached_comparison", "store_in_semantic_cache"] if use_semantic_cache else ["bias_comparison"]
+    with span("pipeline", query=query):
+        _, _, state = app.run(halt_after=halt_after, inputs={"query": query})
+
+    return state, timing_hook.trace
+
+
+# Streaming variant of the pipeline: each article's bias analysis (and summary) is dispatched
+# as soon as its scrape completes, so scraping and LLM latency overlap. Only the final
+# comparison waits for everything. Yields {"event": ..., "data": ...} dicts as results arrive:
+# serp_results, query_subject, article_scraped, article_summary, article_bias_analysis, bias_comparison.
+# With stream_comparison, the comparison is also emitted token by token as bias_comparison_token events.
+def stream_pipeline(
+        query: str,
+        summarize: bool = True,
+        stream_comparison: bool = False,
+        scrape_workers: int = scrape_max_workers,
+        llm_workers: int = bias_analysis_max_workers
+) -> Iterator[dict]:
+    state = user_entry_point(State({}), query=query)
+    semantic_cache = get_semantic_cache()
+    if semantic_cache is not None:
+        state = run_timed("lookup_semantic_cache", lookup_semantic_cache, state)
+        yield {"event": "query_subject", "data": state['query_subject']}
+        if state['semantic_cache_hit']:
+            yield {"event": "bias_comparison", "data": state['bias_comparison_output']}
+            return
+
+    state = set_serp_params(state)
+    throttle = HostThrottle(max_concurrent=scrape_per_host_concurrency, rate_per_sec=scrape_per_host_rate,
+                            host_limits=get_outlet_registry().host_limits)
+
+    with ThreadPoolExecutor(max_workers=scrape_workers) as scrape_pool, \
+            ThreadPoolExecutor(max_workers=llm_workers) as llm_pool:
+        if "query_subject" in state:
+            subject_future = Future()
+            subject_future.set_result(state)
+            pending = {}
+        else:
+            subject_future = llm_pool.submit(run_timed, "subject_extraction", subject_extraction, state)
+            pending = {subject_future: ("query_subject", None)}
+
+        state = run_timed("serp_google_search", serp_google_search, state)
+        articles = state['news_results'].articles()
+        yield {"event": "serp_results", "data": [article.to_dict(include_payloads=False) for article in articles]}
+
+        for article in articles:
+            future = scrape_pool.submit(scrape_single_article, article, scrape_fn=scrape_article, throttle=throttle)
+            pending[future] = ("article_scraped", article)
+
+        # Near-duplicates get no LLM jobs; they follow their original's results as those arrive
+        detector = DuplicateDetector(index=get_fingerprint_index()) if dedup_enabled else None
+        by_link = {article.link: article for article in articles}
+        duplicates = {}
+
+        # Bias jobs block on the subject, which was the first job submitted to the LLM pool
+        def analyze(article: Article) -> Tuple[Optional[dict], dict]:
+            subject = subject_future.result()['query_subject']
+            if detector is not None and detector.reuse(article, subject):
+                return article.bias_analysis, article.bias_analysis_stats
+            return analyze_article_bias(subject, article)
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                event, article = pending.pop(future)
+                result = future.result()
+
+                if event == "query_subject":
+                    state = state.update(query_subject=result['query_subject'])
+                    yield {"event": event, "data": result['query_subject']}
+                elif event == "article_scraped":
+                    article.scraped_article = result
+                    prepared = get_prepared_content(article)
+                    if prepared is not None and detector is not None and detector.check(article, prepared['content']):
+                        merge_duplicate(article, by_link[article.duplicate_of])
+                        duplicates.setdefault(article.duplicate_of, []).append(article)
+                        yield {"event": event, "data": article.to_dict()}
+                        if article.bias_analysis is not None:
+                            yield {"event": "article_bias_analysis", "data": article.to_dict()}
+                        continue
+                    yield {"event": event, "data": article.to_dict()}
+                    if prepared is not None:
+                        pending[llm_pool.submit(analyze, article)] = ("article_bias_analysis", article)
+                        if summarize:
+                            pending[llm_pool.submit(summarize_article, article)] = ("article_summary", article)
+                elif event == "article_summary":
+                    article.news_analyst_response = result
+                    yield {"event": event, "data": article.to_dict()}
+                    for duplicate in duplicates.get(article.link, []):
+                        merge_duplicate(duplicate, article)
+                        yield {"event": event, "data": duplicate.to_dict()}
+                else:
+                    article.bias_analysis, article.bias_analysis_stats = result
+                    if detector is not None:
+                        detector.remember(article, subject_future.result()['query_subject'])
+                    yield {"event": event, "data": article.to_dict()}
+                    for duplicate in duplicates.get(article.link, []):
+                        merge_duplicate(duplicate, article)
+                        yield {"event": event, "data": duplicate.to_dict()}
+
+    state = group_serp_results_by_source(state.update(news_results=ArticleBatch.from_articles(articles)))
+    if stream_comparison:
+        tokens = []
+        for token in stream_bias_comparison(state['query_subject'], state['media_grouped_news_results']):
+            tokens.append(token)
+            yield {"event": "bias_comparison_token", "data": token}
+        state = state.update(bias_comparison_output="".join(tokens))
+    else:
+        state = run_timed("bias_comparison", bias_comparison, state)
+    if semantic_cache is not None:
+        store_in_semantic_cache(state)
+    if persist_results:
+        from persistence import persist_pipeline_state
+
+        persist_pipeline_state(state)
+    yield {"event": "bias_comparison", "data": state['bias_comparison_output']}
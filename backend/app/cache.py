@@ -0,0 +1,287 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+from urllib.parse import parse_qsl, urlencode, urlparse, urlunparse
+
+from constants import (scrape_cache_enabled, scrape_cache_path, scrape_cache_ttl, scrape_cache_max_entries,
+                       llm_cache_enabled, llm_cache_memory_max_bytes, llm_cache_persistent,
+                       llm_cache_path, llm_cache_ttl, llm_cache_max_bytes)
+from providers import register
+
+TRACKING_PARAM_PREFIXES = ("utm_", "fbclid", "gclid", "cmpid", "ocid")
+
+
+# Lowercase scheme/host, drop fragments, tracking params and trailing slashes so the
+# same article reached through different SERP links maps to one cache entry.
+def normalize_url(url: str) -> str:
+    parts = urlparse(url.strip())
+    query = sorted(
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not k.lower().startswith(TRACKING_PARAM_PREFIXES)
+    )
+    path = parts.path.rstrip("/") or "/"
+    return urlunparse((parts.scheme.lower(), parts.netloc.lower(), path, "", urlencode(query), ""))
+
+
+def hash_key(*parts: Any) -> str:
+    raw = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+# Key for a Firecrawl scrape: normalized URL plus everything else in the request
+# payload (exclude/include tags, extraction schema and prompt, ...).
+def scrape_cache_key(url: str, payload: dict) -> str:
+    extraction_config = {k: v for k, v in payload.items() if k != "url"}
+    return hash_key(normalize_url(url), extraction_config)
+
+
+# Persistent JSON key/value store on SQLite with TTL expiry, LRU eviction and
+# hit/miss counters. Safe to share between threads.
+class SqliteCache:
+    def __init__(
+            self,
+            path: str,
+            table: str = "cache",
+            ttl_seconds: Optional[float] = None,
+            max_entries: Optional[int] = None,
+            max_bytes: Optional[int] = None,
+            clock: Callable[[], float] = time.time
+    ):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.table = table
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_last_access ON {table} (last_access)")
+        self._conn.commit()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        now = self._clock()
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT value, created_at FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            value, created_at = row
+            if self.ttl_seconds is not None and now - created_at > self.ttl_seconds:
+                self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+                self._conn.commit()
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._conn.execute(f"UPDATE {self.table} SET last_access = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+        return json.loads(value)
+
+    def set(self, key: str, value: Any) -> None:
+        now = self._clock()
+        with self._lock:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, created_at, last_access) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now, now)
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self) -> None:
+        if self.max_entries is not None:
+            (count,) = self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()
+            overflow = count - self.max_entries
+            if overflow > 0:
+                self._conn.execute(
+                    f"DELETE FROM {self.table} WHERE key IN "
+                    f"(SELECT key FROM {self.table} ORDER BY last_access ASC LIMIT ?)",
+                    (overflow,)
+                )
+                self.evictions += overflow
+        if self.max_bytes is not None:
+            (total,) = self._conn.execute(f"SELECT COALESCE(SUM(LENGTH(value)), 0) FROM {self.table}").fetchone()
+            if total <= self.max_bytes:
+                return
+            rows = self._conn.execute(
+                f"SELECT key, LENGTH(value) FROM {self.table} ORDER BY last_access ASC"
+            ).fetchall()
+            for key, size in rows:
+                if total <= self.max_bytes:
+                    break
+                self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+                total -= size
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.table}")
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            (count,) = self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()
+        return count
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "entries": len(self),
+        }
+
+
+# In-process LRU cache bounded by the approximate size (in bytes) of its JSON values.
+class LRUMemoryCache:
+    def __init__(self, max_bytes: int = 32 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key: str, value: Any) -> None:
+        size = len(json.dumps(value))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (value, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+        }
+
+
+# Memory tier in front of an optional persistent tier; persistent hits are promoted.
+class TieredCache:
+    def __init__(self, memory: LRUMemoryCache, persistent: Optional[SqliteCache] = None):
+        self.memory = memory
+        self.persistent = persistent
+
+    def get(self, key: str) -> Optional[Any]:
+        value = self.memory.get(key)
+        if value is None and self.persistent is not None:
+            value = self.persistent.get(key)
+            if value is not None:
+                self.memory.set(key, value)
+        return value
+
+    def set(self, key: str, value: Any) -> None:
+        self.memory.set(key, value)
+        if self.persistent is not None:
+            self.persistent.set(key, value)
+
+    def clear(self) -> None:
+        self.memory.clear()
+        if self.persistent is not None:
+            self.persistent.clear()
+
+    def stats(self) -> dict:
+        return {
+            "memory": self.memory.stats(),
+            "persistent": self.persistent.stats() if self.persistent is not None else None,
+        }
+
+
+def llm_cache_key(model: str, system_prompt: str, user_prompt: str, **options: Any) -> str:
+    return hash_key(model, system_prompt, user_prompt, options)
+
+
+def _build_llm_cache() -> TieredCache:
+    persistent = None
+    if llm_cache_persistent:
+        persistent = SqliteCache(
+            llm_cache_path,
+            table="llm_cache",
+            ttl_seconds=llm_cache_ttl,
+            max_bytes=llm_cache_max_bytes
+        )
+    return TieredCache(LRUMemoryCache(max_bytes=llm_cache_memory_max_bytes), persistent)
+
+
+# SQLite connections must not cross a fork, so each process opens its own
+_scrape_cache = register("cache.scrape", lambda: SqliteCache(
+    scrape_cache_path,
+    table="scrape_cache",
+    ttl_seconds=scrape_cache_ttl,
+    max_entries=scrape_cache_max_entries
+))
+_llm_cache = register("cache.llm", _build_llm_cache)
+
+
+# Shared Firecrawl scrape cache, or None when disabled via SCRAPE_CACHE_ENABLED=0.
+def get_scrape_cache() -> Optional[SqliteCache]:
+    return _scrape_cache.get() if scrape_cache_enabled else None
+
+
+# Shared LLM response cache, or None when disabled via LLM_CACHE_ENABLED=0.
+def get_llm_cache() -> Optional[TieredCache]:
+    return _llm_cache.get() if llm_cache_enabled else None
+
+
+# Hit/miss/eviction counters of the shared caches created so far, by cache (and tier) name.
+def cache_counters() -> Dict[str, dict]:
+    caches = {"scrape": _scrape_cache.peek()}
+    llm_cache = _llm_cache.peek()
+    if llm_cache is not None:
+        caches.update(llm_memory=llm_cache.memory, llm_persistent=llm_cache.persistent)
+    return {
+        name: {"hits": cache.hits, "misses": cache.misses, "evictions": cache.evictions}
+        for name, cache in caches.items() if cache is not None
+    }
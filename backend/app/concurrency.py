@@ -0,0 +1,80 @@
+import threading
+import time
+
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, List, Optional, Tuple, TypeVar
+from urllib.parse import urlparse
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+# Limits how hard we hit any single host: at most `max_concurrent` in-flight
+# requests and (optionally) at most `rate_per_sec` request starts per second.
+# `host_limits` can override both for particular hosts (e.g. OutletRegistry.host_limits).
+class HostThrottle:
+    def __init__(
+            self,
+            max_concurrent: int = 4,
+            rate_per_sec: Optional[float] = None,
+            clock: Callable[[], float] = time.monotonic,
+            sleep: Callable[[float], None] = time.sleep,
+            host_limits: Optional[Callable[[str], Optional[Tuple[int, Optional[float]]]]] = None
+    ):
+        self.max_concurrent = max_concurrent
+        self.min_interval = 1.0 / rate_per_sec if rate_per_sec else 0.0
+        self._clock = clock
+        self._sleep = sleep
+        self._host_limits = host_limits
+        self._lock = threading.Lock()
+        self._semaphores = {}
+        self._min_intervals = {}
+        self._next_slot = defaultdict(float)
+
+    @staticmethod
+    def host_of(url: str) -> str:
+        return urlparse(url).netloc.lower()
+
+    # Semaphore and minimum interval for a host, created the first time the host is seen.
+    def _host_state(self, host: str) -> Tuple[threading.BoundedSemaphore, float]:
+        with self._lock:
+            if host not in self._semaphores:
+                limits = self._host_limits(host) if self._host_limits is not None else None
+                max_concurrent, rate_per_sec = limits if limits is not None else (self.max_concurrent, None)
+                self._semaphores[host] = threading.BoundedSemaphore(max_concurrent)
+                self._min_intervals[host] = 1.0 / rate_per_sec if rate_per_sec else self.min_interval
+            return self._semaphores[host], self._min_intervals[host]
+
+    def _wait_for_slot(self, host: str, min_interval: float) -> None:
+        if not min_interval:
+            return
+        with self._lock:
+            now = self._clock()
+            start_at = max(now, self._next_slot[host])
+            self._next_slot[host] = start_at + min_interval
+        if start_at > now:
+            self._sleep(start_at - now)
+
+    def run(self, url: str, fn: Callable[[], R]) -> R:
+        host = self.host_of(url)
+        semaphore, min_interval = self._host_state(host)
+        with semaphore:
+            self._wait_for_slot(host, min_interval)
+            return fn()
+
+
+# Apply fn to every item on a bounded thread pool, returning results in input order.
+def map_concurrently(
+        fn: Callable[[T], R],
+        items: Iterable[T],
+        max_workers: int = 8
+) -> List[R]:
+    items = list(items)
+    if not items:
+        return []
+    if max_workers <= 1 or len(items) == 1:
+        return [fn(item) for item in items]
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as pool:
+        return list(pool.map(fn, items))
@@ -1,12 +1,15 @@
+import json
+import os
+
 system_prompt_default = """You are a helpful news analyst."""
 
-fox_exclude_tags = ["video", "div.sidebar", "div.contain", "comment", "related", "recommendation",
-            "advertisement", "social", "share", "newsletter", "subscription",
-            "author-bio", "read-more", "popular", "trending", "strong", "div.pdf-container", "div.sidebar", "div.contain",
-            "div.article-meta", "footer", "div.image-ct", "div.ad-container"]
+# Per-outlet bias ratings, selector rules, rate limits and enablement live in outlets.json (see outlets.py)
+outlets_path = os.environ.get("OUTLETS_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "outlets.json"))
+unknown_outlet_bias = "Unrated"  # bias leaning given to SERP sources that aren't in the registry
 
-npr_exclude_tags = ["div.tags", "div.callout-end-of-story-piano-wrap", "aside", "footer", "div.bucketblock",
-            "picture", "div.primaryaudio", "div.credit-caption"]
+# Used for outlets without curated selector lists of their own
+default_exclude_tags = ["nav", "aside", "footer", "form", "figure", "picture", "video", "script", "style",
+            "div.newsletter", "div.related", "div.ad"]
 
 include_tags = ["h1", "p"]
 
@@ -38,7 +41,210 @@ You will also be given a write up on the bias shown in each article.
 Compare the biases between these two media outlets, and draw conclusions between the biases of each of the outlets.
 """
 
-news_rating_bias = {
-    "NPR": "Center Left",
-    "Fox News": "Right",
-}
\ No newline at end of file
+## Comparison statistics
+
+# With NumPy installed the comparison prompt carries per-outlet sentiment statistics and a few
+# representative write-ups instead of every article's bias analysis (see sentiment_stats.py)
+comparison_digest_enabled = os.environ.get("COMPARISON_DIGEST_ENABLED", "1") != "0"
+comparison_digest_excerpts = int(os.environ.get("COMPARISON_DIGEST_EXCERPTS", 2))        # bias write-ups quoted per outlet
+comparison_digest_excerpt_chars = int(os.environ.get("COMPARISON_DIGEST_EXCERPT_CHARS", 400))
+comparison_digest_max_gaps = int(os.environ.get("COMPARISON_DIGEST_MAX_GAPS", 5))        # outlet pairs listed by difference
+sentiment_trend_bucket = float(os.environ.get("SENTIMENT_TREND_BUCKET", 24 * 3600))      # seconds per trend bucket
+sentiment_trend_max_buckets = int(os.environ.get("SENTIMENT_TREND_MAX_BUCKETS", 7))      # most recent buckets shown per outlet
+
+compare_digest_system_prompt = """Your job is to compare the biases from different media outlets, based off the subject of a topic searched for by a user.
+You will be given the subject the user searched for.
+You will be given statistics of the sentiment analyses of every article found, by outlet: the number of articles, the mean sentiment
+with its 95% confidence interval, the spread, the largest differences between outlets and, when articles span several days, how each
+outlet's sentiment changed over time. Sentiment is a float between -1 and 1, where -1 is full negative bias and 1 is full positive bias.
+You will also be given a few representative write-ups of the bias shown in each outlet's articles.
+Compare the biases between the media outlets and draw conclusions about each of them. Treat differences whose confidence intervals
+include 0, or outlets with only a few articles, as uncertain.
+"""
+
+## Scraping
+
+firecrawl_api_url = os.environ.get("FIRECRAWL_API_URL", "https://api.firecrawl.dev/v1/scrape")
+
+scrape_max_workers = int(os.environ.get("SCRAPE_MAX_WORKERS", 8))            # total in-flight scrapes
+scrape_per_host_concurrency = int(os.environ.get("SCRAPE_PER_HOST_CONCURRENCY", 4))
+scrape_per_host_rate = float(os.environ.get("SCRAPE_PER_HOST_RATE", 0)) or None  # requests/sec per article host, None = unlimited
+scrape_timeout = float(os.environ.get("SCRAPE_TIMEOUT", 60))                 # seconds per Firecrawl request
+
+## Caching
+
+cache_dir = os.environ.get("CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".cache"))
+
+scrape_cache_enabled = os.environ.get("SCRAPE_CACHE_ENABLED", "1") != "0"
+scrape_cache_path = os.environ.get("SCRAPE_CACHE_PATH", os.path.join(cache_dir, "scrape_cache.sqlite"))
+scrape_cache_ttl = float(os.environ.get("SCRAPE_CACHE_TTL", 7 * 24 * 3600)) or None  # seconds, 0 = never expire
+scrape_cache_max_entries = int(os.environ.get("SCRAPE_CACHE_MAX_ENTRIES", 50_000)) or None
+
+llm_cache_enabled = os.environ.get("LLM_CACHE_ENABLED", "1") != "0"
+llm_cache_memory_max_bytes = int(os.environ.get("LLM_CACHE_MEMORY_MAX_BYTES", 32 * 1024 * 1024))
+llm_cache_persistent = os.environ.get("LLM_CACHE_PERSISTENT", "0") == "1"
+llm_cache_path = os.environ.get("LLM_CACHE_PATH", os.path.join(cache_dir, "llm_cache.sqlite"))
+llm_cache_ttl = float(os.environ.get("LLM_CACHE_TTL", 24 * 3600)) or None
+llm_cache_max_bytes = int(os.environ.get("LLM_CACHE_MAX_BYTES", 256 * 1024 * 1024)) or None
+
+## Bias analysis
+
+bias_analysis_max_workers = int(os.environ.get("BIAS_ANALYSIS_MAX_WORKERS", 4))  # concurrent Groq requests
+bias_analysis_max_tries = int(os.environ.get("BIAS_ANALYSIS_MAX_TRIES", 3))
+
+## Jobs
+
+job_db_path = os.environ.get("JOB_DB_PATH", os.path.join(cache_dir, "jobs.sqlite"))
+job_workers = int(os.environ.get("JOB_WORKERS", 2))             # worker processes running the pipeline
+job_max_pending = int(os.environ.get("JOB_MAX_PENDING", 20))    # queued + running jobs before new ones are rejected
+persist_results = os.environ.get("PERSIST_RESULTS", "0") == "1"  # write finished jobs to DATABASE_URL
+
+## Standing queries
+
+topic_db_path = os.environ.get("TOPIC_DB_PATH", os.path.join(cache_dir, "topics.sqlite"))
+topic_scheduler_enabled = os.environ.get("TOPIC_SCHEDULER_ENABLED", "1") != "0"
+topic_default_interval = float(os.environ.get("TOPIC_DEFAULT_INTERVAL", 3600))  # seconds between runs of a topic
+topic_max_concurrent_runs = int(os.environ.get("TOPIC_MAX_CONCURRENT_RUNS", 2))  # topics updated at the same time
+topic_poll_interval = float(os.environ.get("TOPIC_POLL_INTERVAL", 30))           # seconds between checks for due topics
+
+update_comparison_system_prompt = """Your job is to keep a comparison of the biases of different media outlets up to date, for a subject a user follows.
+You will be given the subject, the current comparison, per-outlet sentiment statistics over every article analyzed so far,
+and bias analyses of the articles published since the comparison was written.
+The sentiment analysis is a float between -1 and 1, where -1 is full negative bias and 1 is full positive bias.
+Rewrite the comparison so it reflects the new articles and statistics, keeping the conclusions that still hold.
+"""
+
+## Semantic query cache
+
+# Opt-in. Subjects are compared by word overlap, which can't tell "rate hike" from "rate cut" (0.77)
+# or one politician's policy from another's (0.61), so keep the threshold high. The lookup also
+# needs the subject before anything else runs, putting subject extraction back in front of the SERP
+# search and scrapes (see search_scrape_and_extract_subject): misses get slower, hits skip the pipeline.
+semantic_cache_enabled = os.environ.get("SEMANTIC_CACHE_ENABLED", "0") == "1"
+semantic_cache_path = os.environ.get("SEMANTIC_CACHE_PATH", os.path.join(cache_dir, "semantic_cache.sqlite"))
+semantic_cache_threshold = float(os.environ.get("SEMANTIC_CACHE_THRESHOLD", 0.9))  # estimated Jaccard similarity of subjects
+semantic_cache_max_age = float(os.environ.get("SEMANTIC_CACHE_MAX_AGE", 6 * 3600)) or None  # seconds; news goes stale
+
+## Content preparation
+
+article_token_budget = int(os.environ.get("ARTICLE_TOKEN_BUDGET", 3000))  # longer articles are chunked and map-reduced
+
+condense_chunk_system_prompt = """You will be given one section of a longer news article, and what the condensed notes will be used for.
+Rewrite the section as compact notes. Keep every claim, quote, named source, loaded word and framing choice, and preserve the author's tone.
+Drop anything unrelated to the article's story. Return plain text only.
+"""
+
+# Batched mode packs several short articles from one outlet into a single request
+bias_analysis_batched = os.environ.get("BIAS_ANALYSIS_BATCHED", "0") == "1"
+bias_batch_token_budget = int(os.environ.get("BIAS_BATCH_TOKEN_BUDGET", 6000))  # article tokens per request
+bias_batch_max_articles = int(os.environ.get("BIAS_BATCH_MAX_ARTICLES", 5))
+
+batch_bias_system_prompt = """You are a bias identifier for news articles. You will be given the subject of the user query, the news publisher,
+pre-determined media bias leaning, and several articles, each with an ARTICLE ID, title, and content.
+Analyze each article independently: determine its sentiment towards the subject and describe the bias shown.
+Return ONLY a JSON object with a single key "analyses" holding an array with exactly one entry per article, in this schema
+
+{
+    "analyses": [
+        {
+            "article_id": Field("int", description="The ARTICLE ID the analysis is for"),
+            "sentiment_analysis": Field("float", description="Bias range between -1 and 1, where -1 is very negative, 0 is unbiased/neutral, and 1 is very positive"),
+            "bias_shown": Field("str", description="Description of the bias shown in the article"),
+        }
+    ]
+}
+"""
+
+## Rate limits (per provider; Groq limits apply per model)
+
+rate_limits = {
+    "groq": {
+        "rate_per_sec": float(os.environ.get("GROQ_RATE_PER_SEC", 0.5)),    # 30 requests/minute
+        "burst": float(os.environ.get("GROQ_BURST", 5)),
+        "initial_concurrency": int(os.environ.get("GROQ_CONCURRENCY", 4)),
+        "max_concurrency": int(os.environ.get("GROQ_MAX_CONCURRENCY", 16)),
+    },
+    "firecrawl": {
+        "rate_per_sec": float(os.environ.get("FIRECRAWL_RATE_PER_SEC", 1.0)),
+        "burst": float(os.environ.get("FIRECRAWL_BURST", 10)),
+        "initial_concurrency": int(os.environ.get("FIRECRAWL_CONCURRENCY", 8)),
+        "max_concurrency": int(os.environ.get("FIRECRAWL_MAX_CONCURRENCY", 16)),
+    },
+    "llm": {  # providers configured in LLM_PROVIDERS without limits of their own
+        "rate_per_sec": float(os.environ.get("LLM_RATE_PER_SEC", 1.0)),
+        "burst": float(os.environ.get("LLM_BURST", 5)),
+        "initial_concurrency": int(os.environ.get("LLM_CONCURRENCY", 4)),
+        "max_concurrency": int(os.environ.get("LLM_MAX_CONCURRENCY", 16)),
+    },
+    "serpapi": {
+        "rate_per_sec": float(os.environ.get("SERPAPI_RATE_PER_SEC", 1.0)),
+        "burst": float(os.environ.get("SERPAPI_BURST", 5)),
+        "initial_concurrency": int(os.environ.get("SERPAPI_CONCURRENCY", 4)),
+        "max_concurrency": int(os.environ.get("SERPAPI_MAX_CONCURRENCY", 8)),
+    },
+}
+
+## LLM routing
+
+# Each task's requests go to an ordered list of "provider:model" targets (see llm_gateway.py): the
+# first healthy one is asked first, the next ones are hedged to once it runs past its p95 latency
+# and failed over to when it errors. "default" covers tasks without a route of their own.
+# LLM_ROUTES replaces this with JSON of the same shape.
+llm_routes = json.loads(os.environ["LLM_ROUTES"]) if os.environ.get("LLM_ROUTES") else {
+    "default": {"targets": ["groq:llama-3.1-8b-instant"]},
+    "subject_extraction": {"targets": ["groq:llama-3.1-8b-instant"]},
+    "bias_comparison": {"targets": ["groq:llama-3.3-70b-versatile", "groq:llama-3.1-8b-instant"]},
+}
+
+# Providers besides Groq, as JSON: {"name": {"type": "openai", "base_url": ..., "api_key_env": ...}} for any
+# OpenAI-compatible chat completions API, or {"type": "fake", "latency_s": ..., "error_rate": ...} for local testing
+llm_providers = json.loads(os.environ.get("LLM_PROVIDERS", "{}"))
+
+llm_hedge_enabled = os.environ.get("LLM_HEDGE_ENABLED", "1") != "0"
+llm_hedge_quantile = float(os.environ.get("LLM_HEDGE_QUANTILE", 0.95))      # latency quantile a request is hedged after
+llm_hedge_min_delay = float(os.environ.get("LLM_HEDGE_MIN_DELAY", 0.25))    # seconds
+llm_hedge_max_delay = float(os.environ.get("LLM_HEDGE_MAX_DELAY", 30))
+llm_hedge_budget = float(os.environ.get("LLM_HEDGE_BUDGET", 0.1))           # hedges per request, at most
+llm_latency_window = int(os.environ.get("LLM_LATENCY_WINDOW", 200))         # recent latencies kept per route target
+llm_latency_min_samples = int(os.environ.get("LLM_LATENCY_MIN_SAMPLES", 20))  # before a target's quantiles are trusted
+llm_circuit_failures = int(os.environ.get("LLM_CIRCUIT_FAILURES", 3))       # consecutive errors before a target is skipped
+llm_circuit_cooldown = float(os.environ.get("LLM_CIRCUIT_COOLDOWN", 30))    # seconds a failing target stays skipped
+llm_gateway_max_workers = int(os.environ.get("LLM_GATEWAY_MAX_WORKERS", 32))  # threads running LLM requests
+
+## Outbound HTTP
+
+serpapi_url = os.environ.get("SERPAPI_URL", "https://serpapi.com/search")
+
+http_pool_connections = int(os.environ.get("HTTP_POOL_CONNECTIONS", 10))   # distinct hosts kept pooled
+http_pool_maxsize = int(os.environ.get("HTTP_POOL_MAXSIZE", 32))           # keep-alive connections per host
+http_connect_timeout = float(os.environ.get("HTTP_CONNECT_TIMEOUT", 5))
+http_read_timeout = float(os.environ.get("HTTP_READ_TIMEOUT", 60))
+
+## Telemetry
+
+metrics_enabled = os.environ.get("METRICS_ENABLED", "1") != "0"   # Prometheus metrics served on /metrics
+tracing_enabled = os.environ.get("TRACING_ENABLED", "0") == "1"   # OpenTelemetry spans; needs opentelemetry-api
+tracing_service_name = os.environ.get("TRACING_SERVICE_NAME", "news_comparison")
+
+## Deduplication
+
+# Repeated URLs (AMP, tracking params, ...) are dropped before scraping, and near-copies of an article
+# from the same outlet skip their LLM calls and share the earlier article's analysis
+dedup_enabled = os.environ.get("DEDUP_ENABLED", "1") != "0"
+dedup_threshold = float(os.environ.get("DEDUP_THRESHOLD", 0.8))  # estimated Jaccard similarity of body word trigrams
+# Analyses are also kept by content fingerprint, so the same story seen again for the same subject is reused
+fingerprint_index_enabled = os.environ.get("FINGERPRINT_INDEX_ENABLED", "1") != "0"
+fingerprint_index_path = os.environ.get("FINGERPRINT_INDEX_PATH", os.path.join(cache_dir, "fingerprints.sqlite"))
+fingerprint_index_max_age = float(os.environ.get("FINGERPRINT_INDEX_MAX_AGE", 7 * 24 * 3600)) or None  # seconds
+
+## Local extraction
+
+# Outlets with selector rules in outlets.json are fetched and parsed locally (needs selectolax); Firecrawl's
+# LLM extraction is only the fallback when that fails
+local_extraction_enabled = os.environ.get("LOCAL_EXTRACTION_ENABLED", "1") != "0"
+local_extraction_min_chars = int(os.environ.get("LOCAL_EXTRACTION_MIN_CHARS", 400))  # shorter bodies fall back
+article_html_dir = os.environ.get("ARTICLE_HTML_DIR") or None  # recorded <hash_key(normalized url)>.html files
+article_fetch_user_agent = os.environ.get(
+    "ARTICLE_FETCH_USER_AGENT",
+    "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0 Safari/537.36"
+)
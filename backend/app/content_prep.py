@@ -0,0 +1,110 @@
+import hashlib
+import re
+import time
+
+from functools import lru_cache
+from typing import List
+
+try:
+    import tiktoken
+except ImportError:  # tiktoken is optional; fall back to an estimate
+    tiktoken = None
+
+BOILERPLATE_PATTERNS = [
+    r"\bsubscribe\b", r"\bsign up\b", r"\bnewsletter\b", r"\bclick here\b", r"^advertisement$",
+    r"all rights reserved", r"^copyright\b", r"^©", r"\bread more\b", r"\bfollow us\b",
+    r"\bdownload the .* app\b", r"may not be published, broadcast, rewritten", r"\bcookie",
+    r"^share (this|on)\b", r"^(video|watch|listen)\s*:", r"^related\s*:", r"^image:",
+    r"this story (was|has been) updated", r"^(fox news|npr)'s? .* contributed to this report",
+]
+_boilerplate_re = re.compile("|".join(f"(?:{p})" for p in BOILERPLATE_PATTERNS), re.IGNORECASE)
+_sentence_split_re = re.compile(r"(?<=[.!?])\s+")
+_word_re = re.compile(r"\w+|[^\w\s]")
+
+
+# Loading the BPE ranks is slow, so it waits for the first count rather than import time
+@lru_cache(maxsize=None)
+def _get_encoding():
+    return tiktoken.get_encoding("cl100k_base") if tiktoken is not None else None
+
+
+def count_tokens(text: str) -> int:
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    # Llama/GPT tokenizers average a bit over one token per word or punctuation mark
+    return int(len(_word_re.findall(text)) * 1.3) + 1
+
+
+def _is_boilerplate(paragraph: str) -> bool:
+    # Long paragraphs are real content even if they happen to mention e.g. a newsletter
+    return len(paragraph) < 300 and bool(_boilerplate_re.search(paragraph))
+
+
+# Split into paragraphs, drop boilerplate (newsletter plugs, copyright lines, "read more" links...)
+# and paragraphs that repeat earlier ones, e.g. pull quotes and duplicated captions.
+def clean_paragraphs(text: str) -> List[str]:
+    paragraphs = []
+    seen = set()
+    for raw in re.split(r"\n+", text or ""):
+        paragraph = " ".join(raw.split())
+        if not paragraph or _is_boilerplate(paragraph):
+            continue
+        fingerprint = hashlib.md5(re.sub(r"\W+", "", paragraph.lower()).encode("utf-8")).digest()
+        if fingerprint in seen:
+            continue
+        seen.add(fingerprint)
+        paragraphs.append(paragraph)
+    return paragraphs
+
+
+# Pack paragraphs into chunks of at most `budget` tokens, splitting oversized paragraphs on sentences.
+def chunk_paragraphs(paragraphs: List[str], budget: int) -> List[str]:
+    pieces = []
+    for paragraph in paragraphs:
+        if count_tokens(paragraph) <= budget:
+            pieces.append(paragraph)
+        else:
+            pieces.extend(_sentence_split_re.split(paragraph))
+
+    chunks = []
+    current = []
+    current_tokens = 0
+    for piece in pieces:
+        piece_tokens = count_tokens(piece)
+        if current and current_tokens + piece_tokens > budget:
+            chunks.append("\n\n".join(current))
+            current, current_tokens = [], 0
+        current.append(piece)
+        current_tokens += piece_tokens
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+
+# Clean an article's extracted body and, if it is still over budget, split it into chunks
+# for map-reduce. Token counts let callers report what the cleanup saved.
+def prepare_article_content(
+        title: str,
+        content: str,
+        token_budget: int
+) -> dict:
+    started = time.perf_counter()
+    paragraphs = clean_paragraphs(content)
+    cleaned = "\n\n".join(paragraphs)
+    cleaned_tokens = count_tokens(cleaned)
+    chunks = [cleaned] if cleaned_tokens <= token_budget else chunk_paragraphs(paragraphs, token_budget)
+    original_tokens = count_tokens(title) + count_tokens(content)
+    prepared_tokens = count_tokens(title) + cleaned_tokens
+
+    return {
+        "title": title,
+        "content": cleaned,
+        "chunks": chunks,
+        "original_tokens": original_tokens,
+        "prepared_tokens": prepared_tokens,
+        "tokens_saved": max(0, original_tokens - prepared_tokens),
+        "prep_elapsed_s": round(time.perf_counter() - started, 4),
+    }
@@ -0,0 +1,325 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlparse, urlunparse
+
+from articles import Article
+from cache import hash_key, normalize_url
+from constants import (dedup_enabled, dedup_threshold, fingerprint_index_enabled, fingerprint_index_path,
+                       fingerprint_index_max_age, bias_analysis_max_workers)
+from fingerprints import MinHasher, lsh_band_keys, tokenize, word_shingles
+from providers import register
+from semantic_cache import normalize_subject
+from utils import get_prepared_content
+
+NUM_PERM = 64
+BANDS = 8  # 8 rows per band: pairs above ~0.77 similarity almost always share a band
+SHINGLE_SIZE = 3
+
+AMP_QUERY_PARAMS = ("amp", "outputtype", "amp_js_v", "usqp")
+_AMP_CACHE_PATH_RE = re.compile(r"^/[a-z]/(s/)?(.+)$")
+_HOST_PREFIXES = ("www.", "amp.", "m.")
+
+_hasher = MinHasher(num_perm=NUM_PERM)
+
+
+# The article URL without its AMP wrapping: Google AMP cache links are unwrapped and amp
+# subdomains, path segments (/amp, .amp) and query flags (?amp=1, ?outputType=amp) removed.
+# Otherwise the same as cache.normalize_url.
+def strip_amp(url: str) -> str:
+    parts = urlparse(normalize_url(url))
+    if parts.netloc.endswith(".cdn.ampproject.org"):
+        match = _AMP_CACHE_PATH_RE.match(parts.path)
+        if match:
+            scheme = "https" if match.group(1) else "http"
+            query = f"?{parts.query}" if parts.query else ""
+            return strip_amp(f"{scheme}://{match.group(2)}{query}")
+
+    host = parts.netloc
+    if host.startswith("amp."):
+        host = "www." + host[len("amp."):]
+    segments = [segment for segment in parts.path.split("/") if segment.lower() != "amp"]
+    path = "/".join(segments) or "/"
+    if path.endswith(".amp"):
+        path = path[:-len(".amp")]
+    elif path.endswith(".amp.html"):
+        path = path[:-len(".amp.html")] + ".html"
+    query = urlencode([(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+                       if k.lower() not in AMP_QUERY_PARAMS])
+    return urlunparse((parts.scheme, host, path.rstrip("/") or "/", "", query, ""))
+
+
+# Identity of an article URL for deduplication: strip_amp plus https and no www./m. prefix,
+# so every variant SERP hands back for one page compares equal.
+def canonical_url(url: str) -> str:
+    parts = urlparse(strip_amp(url))
+    host = parts.netloc
+    for prefix in _HOST_PREFIXES:
+        if host.startswith(prefix):
+            host = host[len(prefix):]
+            break
+    return urlunparse(("https", host, parts.path, "", parts.query, ""))
+
+
+# Keep the first of each set of SERP results pointing at the same page. AMP links are
+# swapped for the regular page, which is what the outlet's selectors expect.
+def dedupe_by_canonical_url(articles: List[Article]) -> List[Article]:
+    kept = []
+    seen = set()
+    for article in articles:
+        key = canonical_url(article.link)
+        if key in seen:
+            continue
+        seen.add(key)
+        stripped = strip_amp(article.link)
+        if stripped != normalize_url(article.link):
+            article.link = stripped
+        kept.append(article)
+    return kept
+
+
+# Exact hash and MinHash signature (over word trigrams) of an article's cleaned body.
+def content_fingerprint(content: str) -> Tuple[str, Tuple[int, ...]]:
+    tokens = tokenize(content, drop_stopwords=False)
+    return hash_key(tokens), _hasher.signature(word_shingles(tokens, SHINGLE_SIZE))
+
+
+# Bias analyses stored by article content fingerprint, outlet and query subject, with an LSH
+# band index in SQLite (the same layout as the semantic query cache), so content analyzed in an
+# earlier query can be found again without comparing against every stored article.
+class FingerprintIndex:
+    def __init__(
+            self,
+            path: str = fingerprint_index_path,
+            threshold: float = dedup_threshold,
+            max_age_seconds: Optional[float] = fingerprint_index_max_age,
+            clock: Callable[[], float] = time.time
+    ):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.threshold = threshold
+        self.max_age_seconds = max_age_seconds
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS fingerprint_entries (
+                id INTEGER PRIMARY KEY, canonical_url TEXT NOT NULL, outlet TEXT, subject TEXT NOT NULL,
+                content_hash TEXT NOT NULL, signature TEXT NOT NULL, analysis TEXT NOT NULL, created_at REAL NOT NULL);
+            CREATE INDEX IF NOT EXISTS fingerprint_entries_hash ON fingerprint_entries (content_hash, created_at);
+            CREATE TABLE IF NOT EXISTS fingerprint_bands (
+                band INTEGER NOT NULL, bucket TEXT NOT NULL, entry_id INTEGER NOT NULL, created_at REAL NOT NULL);
+            CREATE INDEX IF NOT EXISTS fingerprint_bands_lookup ON fingerprint_bands (band, bucket, created_at);
+        """)
+        self._conn.commit()
+        self.hits = 0
+        self.misses = 0
+
+    def add(
+            self,
+            canonical_url: str,
+            outlet: Optional[str],
+            subject: str,
+            content_hash: str,
+            signature: Tuple[int, ...],
+            analysis: dict
+    ) -> int:
+        now = self._clock()
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO fingerprint_entries (canonical_url, outlet, subject, content_hash, signature, analysis, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (canonical_url, outlet, subject, content_hash, json.dumps(signature), json.dumps(analysis, default=str), now)
+            )
+            entry_id = cursor.lastrowid
+            self._conn.executemany(
+                "INSERT INTO fingerprint_bands (band, bucket, entry_id, created_at) VALUES (?, ?, ?, ?)",
+                [(band, bucket, entry_id, now) for band, bucket in enumerate(lsh_band_keys(signature, BANDS))]
+            )
+            self._conn.commit()
+        return entry_id
+
+    # Most similar stored analysis of the same outlet and (normalized) subject within the time window.
+    # Returns {"canonical_url", "similarity", "created_at", "analysis"} or None.
+    def find(
+            self,
+            outlet: Optional[str],
+            subject: str,
+            content_hash: str,
+            signature: Tuple[int, ...]
+    ) -> Optional[dict]:
+        cutoff = self._clock() - self.max_age_seconds if self.max_age_seconds else 0.0
+        with self._lock:
+            exact = self._conn.execute(
+                "SELECT canonical_url, analysis, created_at FROM fingerprint_entries "
+                "WHERE content_hash = ? AND outlet IS ? AND subject = ? AND created_at >= ? "
+                "ORDER BY created_at DESC LIMIT 1",
+                (content_hash, outlet, subject, cutoff)
+            ).fetchone()
+            if exact is not None:
+                self.hits += 1
+                return {"canonical_url": exact[0], "similarity": 1.0, "created_at": exact[2],
+                        "analysis": json.loads(exact[1])}
+
+            candidate_ids = set()
+            for band, bucket in enumerate(lsh_band_keys(signature, BANDS)):
+                candidate_ids.update(row[0] for row in self._conn.execute(
+                    "SELECT entry_id FROM fingerprint_bands WHERE band = ? AND bucket = ? AND created_at >= ?",
+                    (band, bucket, cutoff)
+                ))
+            best = None
+            if candidate_ids:
+                placeholders = ",".join("?" * len(candidate_ids))
+                rows = self._conn.execute(
+                    f"SELECT canonical_url, signature, analysis, created_at FROM fingerprint_entries "
+                    f"WHERE id IN ({placeholders}) AND outlet IS ? AND subject = ?",
+                    (*candidate_ids, outlet, subject)
+                ).fetchall()
+                for stored_url, stored_signature, analysis, created_at in rows:
+                    similarity = MinHasher.similarity(signature, json.loads(stored_signature))
+                    if similarity >= self.threshold and (best is None or similarity > best["similarity"]):
+                        best = {"canonical_url": stored_url, "similarity": similarity, "created_at": created_at,
+                                "analysis": analysis}
+
+            if best is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        best["analysis"] = json.loads(best["analysis"])
+        return best
+
+    # Drop entries older than the time window.
+    def prune(self) -> int:
+        if not self.max_age_seconds:
+            return 0
+        cutoff = self._clock() - self.max_age_seconds
+        with self._lock:
+            self._conn.execute("DELETE FROM fingerprint_bands WHERE created_at < ?", (cutoff,))
+            deleted = self._conn.execute("DELETE FROM fingerprint_entries WHERE created_at < ?", (cutoff,)).rowcount
+            self._conn.commit()
+        return deleted
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        with self._lock:
+            (entries,) = self._conn.execute("SELECT COUNT(*) FROM fingerprint_entries").fetchone()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": entries,
+        }
+
+
+_fingerprint_index = register("dedup.fingerprint_index", FingerprintIndex)
+
+
+# Shared fingerprint index, or None when disabled via FINGERPRINT_INDEX_ENABLED=0.
+def get_fingerprint_index() -> Optional[FingerprintIndex]:
+    return _fingerprint_index.get() if fingerprint_index_enabled else None
+
+
+def get_fingerprint_index_if_created() -> Optional[FingerprintIndex]:
+    return _fingerprint_index.peek()
+
+
+# Near-duplicate detection for one query's articles, run on each scraped article before its LLM
+# calls. check() marks a near-copy of an earlier article from the same outlet in this query as
+# duplicate_of it; reuse() gives content analyzed for the same outlet and subject in an earlier
+# query its stored analysis. Either way the article needs no Groq requests. Thread-safe.
+class DuplicateDetector:
+    def __init__(
+            self,
+            index: Optional[FingerprintIndex] = None,
+            threshold: float = dedup_threshold
+    ):
+        self.index = index
+        self.threshold = threshold
+        self._fingerprints: Dict[str, Tuple[str, Tuple[int, ...]]] = {}  # link -> (hash, signature)
+        self._seen: List[Article] = []
+        self._lock = threading.Lock()
+
+    # True (and duplicate_of set) if the article repeats one checked earlier.
+    def check(self, article: Article, content: str) -> bool:
+        content_hash, signature = content_fingerprint(content)
+        with self._lock:
+            for earlier in self._seen:
+                if earlier.outlet != article.outlet:
+                    continue
+                earlier_hash, earlier_signature = self._fingerprints[earlier.link]
+                if earlier_hash == content_hash or MinHasher.similarity(signature, earlier_signature) >= self.threshold:
+                    article.duplicate_of = earlier.link
+                    return True
+            self._seen.append(article)
+            self._fingerprints[article.link] = (content_hash, signature)
+        return False
+
+    # True (and bias_analysis set) if the index has an analysis of this content for the subject.
+    def reuse(self, article: Article, user_query_subject: str) -> bool:
+        fingerprint = self._fingerprints.get(article.link)
+        if self.index is None or fingerprint is None:
+            return False
+        match = self.index.find(article.outlet, normalize_subject(user_query_subject), *fingerprint)
+        if match is None:
+            return False
+        article.bias_analysis = match["analysis"]
+        article.bias_analysis_stats = {
+            "tries": 0, "reused_from": match["canonical_url"], "similarity": round(match["similarity"], 3)
+        }
+        return True
+
+    # Store a fresh analysis for later queries.
+    def remember(self, article: Article, user_query_subject: str) -> None:
+        fingerprint = self._fingerprints.get(article.link)
+        if self.index is None or fingerprint is None or article.bias_analysis is None:
+            return
+        if "reused_from" in (article.bias_analysis_stats or {}):
+            return
+        self.index.add(canonical_url(article.link), article.outlet, normalize_subject(user_query_subject),
+                       *fingerprint, article.bias_analysis)
+
+
+# A duplicate shares its original's analysis and summary.
+def merge_duplicate(duplicate: Article, original: Article) -> None:
+    duplicate.bias_analysis = original.bias_analysis
+    duplicate.bias_analysis_stats = {"tries": 0, "duplicate_of": original.link}
+    duplicate.news_analyst_response = original.news_analyst_response
+
+
+# Run `analyze` (analyze_articles_bias_concurrently or _batched) on the articles that aren't
+# near-duplicates or already analyzed in an earlier query, then fill in the rest.
+def analyze_articles_deduplicated(
+        user_query_subject: str,
+        articles: List[Article],
+        analyze: Callable[..., List[Article]],
+        max_workers: int = bias_analysis_max_workers,
+        index: Optional[FingerprintIndex] = None
+) -> List[Article]:
+    if not dedup_enabled:
+        return analyze(user_query_subject=user_query_subject, articles=articles, max_workers=max_workers)
+
+    detector = DuplicateDetector(index=get_fingerprint_index() if index is None else index)
+    to_analyze = []
+    for article in articles:
+        prepared = get_prepared_content(article)
+        if prepared is not None and detector.check(article, prepared['content']):
+            continue
+        if prepared is not None and detector.reuse(article, user_query_subject):
+            continue
+        to_analyze.append(article)
+
+    analyze(user_query_subject=user_query_subject, articles=to_analyze, max_workers=max_workers)
+
+    by_link: Dict[str, Article] = {article.link: article for article in articles}
+    for article in articles:
+        if article.duplicate_of is not None:
+            merge_duplicate(article, by_link[article.duplicate_of])
+    for article in to_analyze:
+        detector.remember(article, user_query_subject)
+    return articles
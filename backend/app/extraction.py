@@ -0,0 +1,92 @@
+import os
+
+from typing import List, Optional, Sequence
+
+from cache import hash_key, normalize_url
+from constants import article_fetch_user_agent, article_html_dir, local_extraction_min_chars
+from http_client import default_timeout, get_session
+
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:  # selectolax is optional; without it every article goes through Firecrawl
+    LexborHTMLParser = None
+
+
+def local_extraction_available() -> bool:
+    return LexborHTMLParser is not None
+
+
+def html_fixture_path(url: str, html_dir: str) -> str:
+    return os.path.join(html_dir, f"{hash_key(normalize_url(url))}.html")
+
+
+# Raw article HTML, from a recorded file in ARTICLE_HTML_DIR if there is one, otherwise fetched
+# on the pooled session. Raises requests.RequestException on network or HTTP errors.
+def fetch_article_html(
+        url: str,
+        timeout: Optional[float] = None,
+        html_dir: Optional[str] = article_html_dir
+) -> str:
+    if html_dir is not None:
+        path = html_fixture_path(url, html_dir)
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                return f.read()
+
+    response = get_session().get(
+        url,
+        headers={"User-Agent": article_fetch_user_agent, "Accept": "text/html,application/xhtml+xml"},
+        timeout=default_timeout(timeout)
+    )
+    response.raise_for_status()
+    return response.text
+
+
+def _text(node) -> str:
+    return " ".join(node.text(deep=True, separator=" ").split())
+
+
+def _first_match(root, selectors: Sequence[str]):
+    for selector in selectors:
+        node = root.css_first(selector)
+        if node is not None and _text(node):
+            return node
+    return None
+
+
+# Title and body from raw HTML with an outlet's selectors (see outlets.json): the title comes from
+# the first matching title selector (or og:title), the body is the text of the include_tags elements
+# inside the first matching content root once exclude_tags are removed. Returns the same shape as
+# Firecrawl's NewsExtractSchema extraction, or None when the result doesn't look like an article.
+def extract_article(
+        html: str,
+        title_selectors: Sequence[str],
+        content_selectors: Sequence[str],
+        exclude_tags: List[str],
+        include_tags: List[str],
+        min_content_chars: int = local_extraction_min_chars
+) -> Optional[dict]:
+    tree = LexborHTMLParser(html)
+
+    title_node = _first_match(tree, title_selectors)
+    if title_node is not None:
+        title = _text(title_node)
+    else:
+        og_title = tree.css_first('meta[property="og:title"]')
+        title = " ".join((og_title.attributes.get("content") or "").split()) if og_title is not None else ""
+
+    root = _first_match(tree, content_selectors)
+    if root is None or not title:
+        return None
+    for selector in exclude_tags:
+        for node in root.css(selector):
+            node.decompose()
+
+    # The headline is already the title; everything else in include_tags is body text
+    body_tags = [tag for tag in include_tags if tag != "h1"] or ["p"]
+    paragraphs = [text for text in (_text(node) for node in root.css(", ".join(body_tags))) if text]
+    content = "\n\n".join(paragraphs)
+    if len(content) < min_content_chars:
+        return None
+
+    return {"main_article_title": title, "main_article_content": content}
@@ -0,0 +1,91 @@
+import hashlib
+import re
+import struct
+
+from typing import Iterable, List, Sequence, Set, Tuple
+
+# Mersenne prime used for the MinHash permutations
+_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+STOPWORDS = frozenset("""
+a about after an and any are as at be been before being between but by can did do does for from
+had has have how i in into is it its latest me more most new news no not of on or out over say says
+should so some tell than that the their them there these they this those to up us was what when
+where which who whom why will with would you your
+""".split())
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def _hash32(value: str) -> int:
+    return struct.unpack("<I", hashlib.blake2b(value.encode("utf-8"), digest_size=4).digest())[0]
+
+
+def tokenize(text: str, drop_stopwords: bool = True) -> List[str]:
+    tokens = _TOKEN_RE.findall(text.lower())
+    if drop_stopwords:
+        tokens = [token for token in tokens if token not in STOPWORDS]
+    # Cheap plural folding so "tariff" and "tariffs" match
+    return [token[:-1] if len(token) > 3 and token.endswith("s") and not token.endswith("ss") else token
+            for token in tokens]
+
+
+def word_shingles(tokens: Sequence[str], k: int = 1) -> Set[str]:
+    if len(tokens) < k:
+        return {" ".join(tokens)} if tokens else set()
+    return {" ".join(tokens[i:i + k]) for i in range(len(tokens) - k + 1)}
+
+
+def char_shingles(tokens: Iterable[str], k: int = 3) -> Set[str]:
+    shingles = set()
+    for token in tokens:
+        padded = f"#{token}#"
+        shingles.update(padded[i:i + k] for i in range(max(1, len(padded) - k + 1)))
+    return shingles
+
+
+def jaccard(a: Set[str], b: Set[str]) -> float:
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+# MinHash signatures: the fraction of equal positions in two signatures estimates the
+# Jaccard similarity of the underlying shingle sets.
+class MinHasher:
+    def __init__(self, num_perm: int = 64, seed: int = 1):
+        self.num_perm = num_perm
+        params = hashlib.blake2b(f"minhash-{seed}".encode("utf-8"), digest_size=64)
+        permutations = []
+        counter = 0
+        while len(permutations) < num_perm:
+            digest = hashlib.blake2b(params.digest() + counter.to_bytes(4, "little"), digest_size=16).digest()
+            a, b = struct.unpack("<QQ", digest)
+            permutations.append((a % (_PRIME - 1) + 1, b % _PRIME))
+            counter += 1
+        self._permutations = permutations
+
+    def signature(self, shingles: Iterable[str]) -> Tuple[int, ...]:
+        hashes = [_hash32(shingle) for shingle in shingles]
+        if not hashes:
+            return tuple([_MAX_HASH] * self.num_perm)
+        return tuple(
+            min((a * h + b) % _PRIME for h in hashes) & _MAX_HASH
+            for a, b in self._permutations
+        )
+
+    @staticmethod
+    def similarity(a: Sequence[int], b: Sequence[int]) -> float:
+        return sum(x == y for x, y in zip(a, b)) / len(a)
+
+
+# Split a signature into LSH bands. Two signatures share at least one band key with high
+# probability when their similarity is above roughly (1 / bands) ** (1 / rows_per_band).
+def lsh_band_keys(signature: Sequence[int], bands: int) -> List[str]:
+    rows = len(signature) // bands
+    return [
+        hashlib.blake2b(struct.pack(f"<{rows}I", *signature[i * rows:(i + 1) * rows]), digest_size=8).hexdigest()
+        for i in range(bands)
+    ]
+
@@ -0,0 +1,33 @@
+import requests
+
+from requests.adapters import HTTPAdapter
+from typing import Optional
+
+from constants import http_pool_connections, http_pool_maxsize, http_connect_timeout, http_read_timeout
+from providers import register
+
+
+def default_timeout(read_timeout: Optional[float] = None) -> tuple:
+    return (http_connect_timeout, read_timeout if read_timeout is not None else http_read_timeout)
+
+
+def build_session(
+        pool_connections: int = http_pool_connections,
+        pool_maxsize: int = http_pool_maxsize
+) -> requests.Session:
+    session = requests.Session()
+    # Retries are the rate limiter's job, so the adapter never retries on its own
+    adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, max_retries=0)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+# Per process: a forked worker opens its own connections rather than sharing the parent's sockets
+_session = register("http.session", build_session)
+
+
+# Shared keep-alive session for outbound sync calls (Firecrawl, SerpAPI), so repeat requests
+# to the same host reuse a pooled TCP+TLS connection instead of handshaking every time.
+def get_session() -> requests.Session:
+    return _session.get()
@@ -0,0 +1,193 @@
+import json
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+from concurrent.futures import Future, ProcessPoolExecutor
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+from constants import job_db_path, job_max_pending, job_workers, persist_results
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+FINISHED_STATUSES = (SUCCEEDED, FAILED)
+
+
+class QueueFullError(Exception):
+    pass
+
+
+# Identical questions differing only in case/whitespace share one in-flight job.
+def normalize_query(query: str) -> str:
+    return " ".join(query.lower().split())
+
+
+# SQLite-backed job status and result storage. Opens a connection per call so it can be
+# used from the API process and from the worker processes alike.
+class JobStore:
+    def __init__(self, path: str = job_db_path):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id TEXT PRIMARY KEY, query TEXT NOT NULL, query_key TEXT NOT NULL, status TEXT NOT NULL, "
+                "result TEXT, error TEXT, created_at REAL NOT NULL, updated_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_query_key_status ON jobs (query_key, status)")
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def create(self, query: str) -> str:
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, query, query_key, status, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, query, normalize_query(query), QUEUED, now, now)
+            )
+        return job_id
+
+    def update(self, job_id: str, status: str, result: Optional[dict] = None, error: Optional[str] = None) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, updated_at = ? WHERE id = ?",
+                (status, json.dumps(result, default=str) if result is not None else None, error, time.time(), job_id)
+            )
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT id, query, status, result, error, created_at, updated_at FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            "id": row[0],
+            "query": row[1],
+            "status": row[2],
+            "result": json.loads(row[3]) if row[3] else None,
+            "error": row[4],
+            "created_at": row[5],
+            "updated_at": row[6],
+        }
+
+    # Jobs left unfinished by a previous process will never complete.
+    def fail_unfinished(self, reason: str = "interrupted by restart") -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, updated_at = ? WHERE status IN (?, ?)",
+                (FAILED, reason, time.time(), QUEUED, RUNNING)
+            )
+
+    # Yield the job every time its status changes, until it finishes.
+    def watch(self, job_id: str, poll_interval: float = 0.5) -> Iterator[dict]:
+        last_status = None
+        while True:
+            job = self.get(job_id)
+            if job is None:
+                return
+            if job["status"] != last_status:
+                last_status = job["status"]
+                yield job
+            if job["status"] in FINISHED_STATUSES:
+                return
+            time.sleep(poll_interval)
+
+
+# Runs inside a worker process.
+def run_job(db_path: str, job_id: str, query: str) -> None:
+    from burr_model import run_pipeline
+
+    store = JobStore(db_path)
+    store.update(job_id, RUNNING)
+    try:
+        state, timings = run_pipeline(query)
+    except Exception as e:
+        store.update(job_id, FAILED, error=repr(e))
+        return
+
+    result = {
+        "query_subject": state["query_subject"],
+        "bias_comparison_output": state["bias_comparison_output"],
+        "news_results": state["news_results"].to_dicts() if state.get("news_results") is not None else None,
+        "semantic_cache_hit": state.get("semantic_cache_hit", False),
+        "timings": timings,
+    }
+    store.update(job_id, SUCCEEDED, result=result)
+
+    # The analysis is done either way; failing to store it is reported alongside the result
+    if persist_results:
+        from persistence import persist_pipeline_state
+
+        try:
+            persist_pipeline_state(state)
+        except Exception as e:
+            store.update(job_id, SUCCEEDED, result=dict(result, persist_error=repr(e)))
+
+
+# Accepts analysis requests and runs them on a pool of worker processes. Submissions
+# beyond max_pending unfinished jobs are rejected, and a query that is already queued
+# or running returns the existing job id instead of starting a new one.
+class JobQueue:
+    def __init__(
+            self,
+            store: Optional[JobStore] = None,
+            max_workers: int = job_workers,
+            max_pending: int = job_max_pending,
+            runner=run_job
+    ):
+        self.store = store or JobStore()
+        self.max_pending = max_pending
+        self._runner = runner
+        self._lock = threading.Lock()
+        self._in_flight = {}  # query_key -> job_id
+        # spawn so workers don't inherit the API process's threads, sockets or DB connections
+        self._pool = ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"))
+        self.store.fail_unfinished()
+
+    def submit(self, query: str) -> str:
+        query_key = normalize_query(query)
+        with self._lock:
+            if query_key in self._in_flight:
+                return self._in_flight[query_key]
+            if len(self._in_flight) >= self.max_pending:
+                raise QueueFullError(f"{len(self._in_flight)} jobs already pending")
+
+            job_id = self.store.create(query)
+            self._in_flight[query_key] = job_id
+
+        future = self._pool.submit(self._runner, self.store.path, job_id, query)
+        future.add_done_callback(lambda f: self._finished(query_key, job_id, f))
+        return job_id
+
+    def _finished(self, query_key: str, job_id: str, future: Future) -> None:
+        with self._lock:
+            self._in_flight.pop(query_key, None)
+        # The worker records its own result; this only catches crashed or cancelled workers
+        if future.cancelled():
+            self.store.update(job_id, FAILED, error="cancelled")
+        elif future.exception() is not None:
+            self.store.update(job_id, FAILED, error=repr(future.exception()))
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._in_flight)
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._pool.shutdown(wait=wait, cancel_futures=not wait)
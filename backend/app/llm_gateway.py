@@ -0,0 +1,491 @@
+import json
+import os
+import random
+import threading
+import time
+
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from types import SimpleNamespace
+from typing import Callable, Dict, Generator, Iterator, List, Optional, Tuple, Union
+
+from constants import (llm_routes, llm_providers, llm_hedge_enabled, llm_hedge_quantile, llm_hedge_min_delay,
+                       llm_hedge_max_delay, llm_hedge_budget, llm_latency_window, llm_latency_min_samples,
+                       llm_circuit_failures, llm_circuit_cooldown, llm_gateway_max_workers, rate_limits)
+from http_client import default_timeout, get_session
+from providers import register
+from rate_limit import THROTTLE_STATUS_CODES, RateLimitedError, get_limiter, parse_retry_after
+from telemetry import (LLM_FAILOVERS, LLM_HEDGES, LLM_HEDGE_WINS, LLM_REQUEST_DURATION, record_llm_usage,
+                       time_external_call)
+
+Messages = List[Dict[str, str]]
+
+
+## Providers
+
+# Retries are handled by our rate limiter (see GroqProvider), not the SDK.
+# The SDK is imported and the client built on first use, so importing this module
+# doesn't need GROQ_API_KEY and forked workers get their own connection pool.
+def _create_groq_client():
+    from groq import Groq
+
+    return Groq(
+        api_key=os.environ['GROQ_API_KEY'],
+        max_retries=0
+    )
+
+
+_groq_client = register("groq.client", _create_groq_client)
+
+
+def get_groq_client():
+    return _groq_client.get()
+
+
+# Every Groq request goes through the per-model limiter; 429/503 responses shrink our
+# concurrency and are retried after the Retry-After delay (or a jittered backoff).
+def create_chat_completion(model: str, **options):
+    from groq import APIStatusError
+
+    def create():
+        with time_external_call("groq") as timer:
+            try:
+                completion = get_groq_client().chat.completions.create(model=model, **options)
+            except APIStatusError as e:
+                if e.status_code in THROTTLE_STATUS_CODES:
+                    timer.set_outcome("throttled")
+                    raise RateLimitedError(str(e), parse_retry_after(e.response.headers.get("retry-after"))) from e
+                raise
+        # Streamed responses report usage on their last chunk instead (see GroqProvider.stream)
+        record_llm_usage(model, getattr(completion, "usage", None))
+        return completion
+
+    return get_limiter("groq", model).call(create)
+
+
+# Every provider answers complete() with the completion text and stream() with its content deltas.
+class GroqProvider:
+    name = "groq"
+
+    def complete(self, model: str, messages: Messages, **options) -> Optional[str]:
+        return create_chat_completion(model=model, messages=messages, **options).choices[0].message.content
+
+    def stream(self, model: str, messages: Messages, **options) -> Iterator[str]:
+        for chunk in create_chat_completion(model=model, messages=messages, stream=True, **options):
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                yield delta
+            x_groq = getattr(chunk, "x_groq", None)
+            if x_groq is not None:
+                record_llm_usage(model, getattr(x_groq, "usage", None))
+
+
+# Any OpenAI-compatible chat completions API (hosted or a local server), over the pooled session
+# and behind its own per-model limiter.
+class OpenAICompatibleProvider:
+    def __init__(
+            self,
+            name: str,
+            base_url: str,
+            api_key_env: Optional[str] = None,
+            timeout: Optional[float] = None,
+            limits: Optional[dict] = None
+    ):
+        self.name = name
+        self.url = base_url.rstrip("/") + "/chat/completions"
+        self.api_key_env = api_key_env
+        self.timeout = timeout
+        self.limits = limits or rate_limits["llm"]
+
+    def _post(self, model: str, body: dict, stream: bool = False):
+        import requests
+
+        headers = {"Content-Type": "application/json"}
+        if self.api_key_env:
+            headers["Authorization"] = f"Bearer {os.environ[self.api_key_env]}"
+
+        def post():
+            with time_external_call(self.name) as timer:
+                response = get_session().post(self.url, json=dict(body, model=model), headers=headers,
+                                              timeout=default_timeout(self.timeout), stream=stream)
+                if response.status_code in THROTTLE_STATUS_CODES:
+                    timer.set_outcome("throttled")
+                    raise RateLimitedError(f"{self.name} returned {response.status_code}",
+                                           parse_retry_after(response.headers.get("Retry-After")))
+                if not response.ok:
+                    raise requests.HTTPError(f"{self.name} returned {response.status_code}: {response.text[:200]}",
+                                             response=response)
+                return response
+
+        return get_limiter(self.name, model, self.limits).call(post)
+
+    def complete(self, model: str, messages: Messages, **options) -> Optional[str]:
+        completion = self._post(model, dict(options, messages=messages)).json()
+        usage = completion.get("usage")
+        record_llm_usage(f"{self.name}:{model}", SimpleNamespace(**usage) if usage else None)
+        return completion["choices"][0]["message"]["content"]
+
+    def stream(self, model: str, messages: Messages, **options) -> Iterator[str]:
+        response = self._post(model, dict(options, messages=messages, stream=True), stream=True)
+        with response:
+            for line in response.iter_lines(decode_unicode=True):
+                if not line or not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                chunk = json.loads(data)
+                delta = (chunk.get("choices") or [{}])[0].get("delta", {}).get("content")
+                if delta:
+                    yield delta
+
+
+# Answers locally after a (possibly random) delay and fails at `error_rate`, so routing, hedging
+# and failover can be exercised without network access. `respond` builds the answer from the model
+# and messages; by default it echoes the last message.
+class FakeLLMProvider:
+    def __init__(
+            self,
+            name: str = "fake",
+            respond: Optional[Callable[[str, Messages], str]] = None,
+            latency_s: Union[float, Callable[[], float]] = 0.0,
+            error_rate: float = 0.0,
+            seed: Optional[int] = None,
+            sleep: Callable[[float], None] = time.sleep
+    ):
+        self.name = name
+        self.respond = respond or (lambda model, messages: messages[-1]["content"])
+        self.latency_s = latency_s
+        self.error_rate = error_rate
+        self._rng = random.Random(seed)
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self.calls = 0
+
+    def complete(self, model: str, messages: Messages, **options) -> Optional[str]:
+        with self._lock:
+            self.calls += 1
+            failed = self._rng.random() < self.error_rate
+        self._sleep(self.latency_s() if callable(self.latency_s) else self.latency_s)
+        if failed:
+            raise RuntimeError(f"{self.name}: injected failure")
+        return self.respond(model, messages)
+
+    def stream(self, model: str, messages: Messages, **options) -> Iterator[str]:
+        for word in self.complete(model, messages, **options).split(" "):
+            yield word + " "
+
+
+def build_provider(name: str, config: dict):
+    config = dict(config)
+    kind = config.pop("type", "openai")
+    if kind == "fake":
+        return FakeLLMProvider(name, **config)
+    if kind == "openai":
+        return OpenAICompatibleProvider(name, **config)
+    raise ValueError(f"Unknown LLM provider type {kind!r} for {name!r}")
+
+
+## Routing
+
+@dataclass(frozen=True)
+class Target:
+    provider: str
+    model: str
+
+    @classmethod
+    def parse(cls, spec: str) -> "Target":
+        provider, _, model = spec.partition(":")
+        if not model:
+            raise ValueError(f"LLM route target {spec!r} must look like 'provider:model'")
+        return cls(provider, model)
+
+    # Groq models keep their bare names, as in the LLM cache keys and token metrics before routing
+    @property
+    def label(self) -> str:
+        return self.model if self.provider == "groq" else f"{self.provider}:{self.model}"
+
+
+# Latencies of a route target's most recent successful requests.
+class LatencyWindow:
+    def __init__(self, size: int = llm_latency_window):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    # Nearest-rank quantile, or None with fewer than `min_samples` requests to go on.
+    def quantile(self, q: float, min_samples: int = llm_latency_min_samples) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples or len(samples) < min_samples:
+            return None
+        return samples[min(len(samples) - 1, max(0, int(q * len(samples) + 0.5) - 1))]
+
+
+class _Circuit:
+    __slots__ = ("failures", "open_until")
+
+    def __init__(self):
+        self.failures = 0
+        self.open_until = 0.0
+
+
+# Routes each LLM call by task to an ordered list of provider/model targets. The first healthy
+# target is asked; once it runs past its recent p95 latency for the task a duplicate goes to the next
+# target (or the same one again), within a budget of hedges per request, and whichever answers first
+# wins. A target that errors is failed over to the next one, and one that keeps failing, or whose
+# p95 is over the route's latency_budget_s, is moved to the back of the list.
+class LLMGateway:
+    def __init__(
+            self,
+            providers: Dict[str, object],
+            routes: Dict[str, dict] = llm_routes,
+            hedge: bool = llm_hedge_enabled,
+            hedge_quantile: float = llm_hedge_quantile,
+            hedge_min_delay: float = llm_hedge_min_delay,
+            hedge_max_delay: float = llm_hedge_max_delay,
+            hedge_budget: float = llm_hedge_budget,
+            min_samples: int = llm_latency_min_samples,
+            window: int = llm_latency_window,
+            circuit_failures: int = llm_circuit_failures,
+            circuit_cooldown: float = llm_circuit_cooldown,
+            max_workers: int = llm_gateway_max_workers,
+            clock: Callable[[], float] = time.monotonic
+    ):
+        self.providers = dict(providers)
+        self.routes = {
+            task: dict(route, targets=[Target.parse(spec) for spec in route["targets"]])
+            for task, route in routes.items()
+        }
+        if "default" not in self.routes:
+            raise ValueError("LLM routes need a 'default' route")
+        for route in self.routes.values():
+            for target in route["targets"]:
+                if target.provider not in self.providers:
+                    raise ValueError(f"LLM route target uses unknown provider {target.provider!r}")
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_max_delay = hedge_max_delay
+        self.hedge_budget = hedge_budget
+        self.min_samples = min_samples
+        self.window = window
+        self.circuit_failures = circuit_failures
+        self.circuit_cooldown = circuit_cooldown
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._latencies: Dict[tuple, LatencyWindow] = {}
+        self._circuits: Dict[Target, _Circuit] = {}
+        self._hedge_tokens = 1.0
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="llm-gateway")
+
+    def route(self, task: str) -> dict:
+        return self.routes.get(task) or self.routes["default"]
+
+    # The target whose answers are cached for the task: its first configured one.
+    def primary(self, task: str) -> Target:
+        return self.route(task)["targets"][0]
+
+    def latency(self, task: str, target: Target) -> LatencyWindow:
+        with self._lock:
+            key = (task, target)
+            if key not in self._latencies:
+                self._latencies[key] = LatencyWindow(self.window)
+            return self._latencies[key]
+
+    def _circuit(self, target: Target) -> _Circuit:
+        with self._lock:
+            return self._circuits.setdefault(target, _Circuit())
+
+    # The route's targets in the order they'll be tried: healthy ones as configured, then those
+    # with an open circuit or over the latency budget, fastest first.
+    def targets(self, task: str) -> List[Target]:
+        route = self.route(task)
+        budget = route.get("latency_budget_s")
+        now = self._clock()
+        healthy, degraded = [], []
+        for target in route["targets"]:
+            p95 = self.latency(task, target).quantile(self.hedge_quantile, self.min_samples)
+            tripped = self._circuit(target).open_until > now
+            if tripped or (budget is not None and p95 is not None and p95 > budget):
+                degraded.append((tripped, p95 if p95 is not None else float("inf"), target))
+            else:
+                healthy.append(target)
+        return healthy + [target for _, _, target in sorted(degraded, key=lambda item: item[:2])]
+
+    # Seconds to wait on the first request before hedging, or None when the target hasn't seen
+    # enough requests for the task to know its p95 yet.
+    def hedge_delay(self, task: str, target: Target) -> Optional[float]:
+        if not self.hedge or not self.route(task).get("hedge", True):
+            return None
+        p95 = self.latency(task, target).quantile(self.hedge_quantile, self.min_samples)
+        if p95 is None:
+            return None
+        return min(self.hedge_max_delay, max(self.hedge_min_delay, p95))
+
+    # Each request earns `hedge_budget` of a hedge, so hedges stay a bounded share of the load.
+    def _earn_hedge(self) -> None:
+        with self._lock:
+            self._hedge_tokens = min(10.0, self._hedge_tokens + self.hedge_budget)
+
+    def _spend_hedge(self) -> bool:
+        with self._lock:
+            if self._hedge_tokens < 1.0:
+                return False
+            self._hedge_tokens -= 1.0
+            return True
+
+    def _succeeded(self, task: str, target: Target, elapsed: float) -> None:
+        self.latency(task, target).observe(elapsed)
+        LLM_REQUEST_DURATION.observe(elapsed, task=task, target=target.label, outcome="ok")
+        circuit = self._circuit(target)
+        with self._lock:
+            circuit.failures = 0
+
+    def _failed(self, task: str, target: Target, elapsed: float) -> None:
+        LLM_REQUEST_DURATION.observe(elapsed, task=task, target=target.label, outcome="error")
+        circuit = self._circuit(target)
+        with self._lock:
+            circuit.failures += 1
+            if circuit.failures >= self.circuit_failures:
+                circuit.open_until = self._clock() + self.circuit_cooldown
+
+    def _attempt(self, task: str, target: Target, messages: Messages, options: dict) -> Optional[str]:
+        started = time.perf_counter()
+        try:
+            content = self.providers[target.provider].complete(target.model, messages, **options)
+        except Exception:
+            self._failed(task, target, time.perf_counter() - started)
+            raise
+        self._succeeded(task, target, time.perf_counter() - started)
+        return content
+
+    # The completion text for `messages` and the target that gave it, from whichever answers first.
+    # Raises the last error when every target failed.
+    def complete(self, task: str, messages: Messages, **options) -> Tuple[Optional[str], Target]:
+        self._earn_hedge()
+        remaining = self.targets(task)
+        primary = remaining.pop(0)
+        deadline = self.hedge_delay(task, primary)
+        if deadline is None:
+            # Nothing to hedge against yet, so the targets are simply tried in turn on this thread
+            for index, target in enumerate([primary] + remaining):
+                try:
+                    return self._attempt(task, target, messages, options), target
+                except Exception:
+                    if index == len(remaining):
+                        raise
+                    LLM_FAILOVERS.inc(task=task)
+
+        pending: Dict[Future, Target] = {}
+        hedge_future = None
+
+        def launch(target: Target) -> Future:
+            future = self._pool.submit(self._attempt, task, target, messages, options)
+            pending[future] = target
+            return future
+
+        launch(primary)
+        started = time.monotonic()
+        error = None
+        while pending:
+            timeout = None
+            if deadline is not None and hedge_future is None:
+                timeout = max(0.0, deadline - (time.monotonic() - started))
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                # Past the primary's p95: send a duplicate, unless the budget is spent
+                deadline = None
+                if self._spend_hedge():
+                    LLM_HEDGES.inc(task=task)
+                    hedge_future = launch(remaining.pop(0) if remaining else primary)
+                continue
+            for future in done:
+                target = pending.pop(future)
+                try:
+                    content = future.result()
+                except Exception as e:
+                    error = e
+                    if remaining:
+                        LLM_FAILOVERS.inc(task=task)
+                        deadline = None
+                        launch(remaining.pop(0))
+                    continue
+                if future is hedge_future:
+                    LLM_HEDGE_WINS.inc(task=task)
+                # The slower request is left to finish (its latency still counts) unless it hasn't started
+                for other in pending:
+                    other.cancel()
+                return content, target
+        raise error
+
+    # Content deltas for `messages`, returning the target that gave them when the stream ends. Targets
+    # are failed over until one produces its first delta; after that an error is raised to the
+    # caller, since part of the answer is already out.
+    def stream(self, task: str, messages: Messages, **options) -> Generator[str, None, Target]:
+        self._earn_hedge()
+        targets = self.targets(task)
+        for index, target in enumerate(targets):
+            started = time.perf_counter()
+            chunks = self.providers[target.provider].stream(target.model, messages, **options)
+            try:
+                first = next(chunks, None)
+            except Exception:
+                self._failed(task, target, time.perf_counter() - started)
+                if index == len(targets) - 1:
+                    raise
+                LLM_FAILOVERS.inc(task=task)
+                continue
+            if first is not None:
+                yield first
+            try:
+                yield from chunks
+            except Exception:
+                self._failed(task, target, time.perf_counter() - started)
+                raise
+            self._succeeded(task, target, time.perf_counter() - started)
+            return target
+
+    # Recent latency quantiles and circuit state of every target that has been used, keyed by
+    # "task/target".
+    def metrics(self) -> Dict[str, dict]:
+        with self._lock:
+            latencies = list(self._latencies.items())
+            circuits = dict(self._circuits)
+        now = self._clock()
+        return {
+            f"{task}/{target.label}": {
+                "requests": len(window),
+                "p50": window.quantile(0.5, min_samples=1),
+                "p95": window.quantile(0.95, min_samples=1),
+                "circuit_open": target in circuits and circuits[target].open_until > now,
+            }
+            for (task, target), window in latencies
+        }
+
+    def close(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+def build_gateway() -> LLMGateway:
+    providers = {"groq": GroqProvider()}
+    providers.update({name: build_provider(name, config) for name, config in llm_providers.items()})
+    return LLMGateway(providers)
+
+
+_gateway = register("llm.gateway", build_gateway)
+
+
+def get_llm_gateway() -> LLMGateway:
+    return _gateway.get()
+
+
+def get_llm_gateway_if_created() -> Optional[LLMGateway]:
+    return _gateway.peek()
@@ -1,9 +1,45 @@
-from fastapi import FastAPI
-from fastapi.responses import RedirectResponse
+import json
+
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Query
+from fastapi.responses import PlainTextResponse, RedirectResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, Field
+from typing import AsyncIterator, Iterable, Iterator, Optional
+
+from burr_model import stream_pipeline
+from constants import persist_results, topic_default_interval, topic_scheduler_enabled
+from jobs import JobQueue, QueueFullError
+from rate_limit import limiter_metrics
+from sentiment_stats import outlet_gaps, outlet_summary, outlet_trends, sentiment_stats_available
+from telemetry import render_prometheus, shutdown as shutdown_telemetry
+from topics import TopicScheduler, TopicStore
+
+job_queue: Optional[JobQueue] = None
+topic_scheduler: Optional[TopicScheduler] = None
+
+
+# Start the job queue and topic scheduler with the app, and stop them (then flush any
+# buffered spans) when it shuts down.
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    global job_queue, topic_scheduler
+    if persist_results:
+        from persistence import init_db
+        init_db()
+    job_queue = JobQueue()
+    topic_scheduler = TopicScheduler(TopicStore())
+    if topic_scheduler_enabled:
+        topic_scheduler.start()
+    try:
+        yield
+    finally:
+        topic_scheduler.stop(wait=False)
+        job_queue.shutdown(wait=False)
+        shutdown_telemetry()
 
-app = FastAPI()
+
+app = FastAPI(lifespan=lifespan)
 
 origins = [
     'http://localhost:3000',
@@ -24,4 +60,137 @@ async def root():
 
 @app.get("/hello/{name}")
 async def say_hello(name: str):
-    return {"message": f"Hello {name}"}
\ No newline at end of file
+    return {"message": f"Hello {name}"}
+
+# Current state of the outbound rate limiters (calls, throttles, retries, concurrency limits)
+@app.get("/rate-limits")
+async def rate_limits():
+    return limiter_metrics()
+
+# Prometheus scrape endpoint: action and outbound-call latency histograms, Groq token usage,
+# scrape errors, rate limiter and cache counters. Jobs run in worker processes and aren't included.
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+# Format pipeline events as server-sent events. Failures are reported as a final error event,
+# since the 200 response has already started by the time they happen.
+def to_server_sent_events(events: Iterable[dict]) -> Iterator[str]:
+    try:
+        for event in events:
+            yield f"event: {event['event']}\ndata: {json.dumps(event['data'], default=str)}\n\n"
+    except Exception as e:
+        yield f"event: error\ndata: {json.dumps({'detail': str(e)})}\n\n"
+    yield "event: done\ndata: {}\n\n"
+
+
+# Streams SERP hits, each scraped article, summaries and bias analyses as they complete,
+# then the bias comparison token by token.
+@app.get("/analyze")
+def analyze(query: str, summarize: bool = True):
+    return StreamingResponse(
+        to_server_sent_events(stream_pipeline(query, summarize=summarize, stream_comparison=True)),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+## Jobs
+
+class JobRequest(BaseModel):
+    query: str = Field(min_length=1)
+
+
+def get_job_or_404(job_id: str) -> dict:
+    job = job_queue.store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job
+
+
+@app.post("/jobs", status_code=202)
+def create_job(request: JobRequest):
+    try:
+        job_id = job_queue.submit(request.query)
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=f"Job queue is full: {e}", headers={"Retry-After": "30"})
+    return {"job_id": job_id, "status": job_queue.store.get(job_id)["status"]}
+
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    return get_job_or_404(job_id)
+
+
+# Server-sent events with the job each time its status changes, ending when it finishes.
+@app.get("/jobs/{job_id}/events")
+def job_events(job_id: str):
+    get_job_or_404(job_id)
+    return StreamingResponse(
+        to_server_sent_events({"event": job["status"], "data": job} for job in job_queue.store.watch(job_id)),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+## Standing queries
+
+class TopicRequest(BaseModel):
+    query: str = Field(min_length=1)
+    interval_minutes: float = Field(default=topic_default_interval / 60, gt=0)
+
+
+def get_topic_or_404(topic_id: str) -> dict:
+    topic = topic_scheduler.store.get(topic_id)
+    if topic is None:
+        raise HTTPException(status_code=404, detail=f"Topic {topic_id} not found")
+    return topic
+
+
+# Follow a query: it is re-run every interval, analyzing only articles it hasn't seen before.
+@app.post("/topics", status_code=201)
+def create_topic(request: TopicRequest):
+    return topic_scheduler.store.add(request.query, interval_s=request.interval_minutes * 60)
+
+
+@app.get("/topics")
+def list_topics():
+    return topic_scheduler.store.list()
+
+
+# The topic with its current comparison and per-outlet sentiment statistics.
+@app.get("/topics/{topic_id}")
+def get_topic(topic_id: str):
+    return get_topic_or_404(topic_id)
+
+
+@app.delete("/topics/{topic_id}", status_code=204)
+def delete_topic(topic_id: str):
+    if not topic_scheduler.store.remove(topic_id):
+        raise HTTPException(status_code=404, detail=f"Topic {topic_id} not found")
+
+
+# Sentiment statistics over every article the topic has analyzed: per-outlet summary with 95%
+# confidence intervals, the largest differences between outlets and trends in buckets of bucket_hours.
+@app.get("/topics/{topic_id}/stats")
+def topic_stats(topic_id: str, bucket_hours: float = Query(24, gt=0)):
+    get_topic_or_404(topic_id)
+    if not sentiment_stats_available():
+        raise HTTPException(status_code=501, detail="Sentiment statistics need NumPy installed")
+    sample = topic_scheduler.store.sentiment_sample(topic_id)
+    return {
+        "topic_id": topic_id,
+        "articles": len(sample),
+        "outlets": outlet_summary(sample),
+        "gaps": outlet_gaps(sample),
+        "trends": outlet_trends(sample, bucket_s=bucket_hours * 3600),
+    }
+
+
+# Run the topic now instead of waiting for its next scheduled run.
+@app.post("/topics/{topic_id}/run", status_code=202)
+def run_topic(topic_id: str):
+    get_topic_or_404(topic_id)
+    topic_scheduler.store.schedule(topic_id, next_run_at=0)
+    return {"topic_id": topic_id, "started": topic_id in topic_scheduler.run_due() + topic_scheduler.running()}
@@ -1,16 +1,31 @@
 from database import Base
-from sqlalchemy import Column, Integer, String, TIMESTAMP, text, JSON
-from pydantic import BaseModel, Field
+from sqlalchemy import Column, Integer, String, TIMESTAMP, text, JSON, Float, ForeignKey, Text, func
+
+from schemas import NewsExtractSchema  # noqa: F401 (kept importable from here)
 
 class UserQueryAndResponse(Base):
     __tablename__ = "user_query_and_response"
 
     id = Column(Integer, primary_key=True, nullable=False)
     user_query = Column(String, nullable=False)
-    query_subject = Column(String, nullable=False)
+    query_subject = Column(String, nullable=False, index=True)
     serp_params = Column(JSON, nullable=False)
+    bias_comparison_output = Column(Text, nullable=True)
+    created_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=func.now())
+
 
+class ArticleAnalysis(Base):
+    __tablename__ = "article_analysis"
 
-class NewsExtractSchema(BaseModel):
-    main_article_title: str = Field(description="The main title of the article.")
-    main_article_content: str = Field(description="The main content of the article. Do not include any information from other attachments.")
+    id = Column(Integer, primary_key=True, nullable=False)
+    query_id = Column(Integer, ForeignKey("user_query_and_response.id", ondelete="CASCADE"), nullable=False, index=True)
+    position = Column(Integer, nullable=True)
+    source = Column(String, nullable=True)
+    political_bias = Column(String, nullable=True)
+    link = Column(String, nullable=False, index=True)
+    title = Column(String, nullable=True)
+    scraped_article = Column(JSON, nullable=True)
+    news_analyst_response = Column(Text, nullable=True)
+    bias_analysis = Column(JSON, nullable=True)
+    sentiment_analysis = Column(Float, nullable=True)
+    created_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=func.now())
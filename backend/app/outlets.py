@@ -0,0 +1,116 @@
+import json
+
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from constants import (outlets_path, default_exclude_tags, include_tags, scrape_per_host_concurrency,
+                       scrape_per_host_rate, unknown_outlet_bias)
+from providers import register
+
+
+def normalize_source_name(name: str) -> str:
+    return " ".join((name or "").casefold().split())
+
+
+def host_of(url: str) -> str:
+    host = urlparse(url or "").netloc.lower().split("@")[-1].split(":")[0]
+    return host[4:] if host.startswith("www.") else host
+
+
+# One news outlet: its bias rating, how to scrape it, and how hard we may hit it.
+@dataclass(frozen=True)
+class Outlet:
+    name: str
+    domains: Tuple[str, ...]
+    bias: str
+    aliases: Tuple[str, ...] = ()
+    enabled: bool = True
+    search_by_default: bool = False
+    title_selectors: Tuple[str, ...] = ()
+    content_selectors: Tuple[str, ...] = ()
+    exclude_tags: Tuple[str, ...] = tuple(default_exclude_tags)
+    include_tags: Tuple[str, ...] = tuple(include_tags)
+    max_concurrent: int = scrape_per_host_concurrency
+    rate_per_sec: Optional[float] = scrape_per_host_rate
+
+    @property
+    def has_extraction_rules(self) -> bool:
+        return bool(self.title_selectors and self.content_selectors)
+
+    @classmethod
+    def from_dict(cls, entry: dict) -> "Outlet":
+        extraction = entry.get("extraction") or {}
+        rate_limit = entry.get("rate_limit") or {}
+        return cls(
+            name=entry["name"],
+            domains=tuple(domain.lower() for domain in entry["domains"]),
+            bias=entry.get("bias") or unknown_outlet_bias,
+            aliases=tuple(entry.get("aliases", ())),
+            enabled=entry.get("enabled", True),
+            search_by_default=entry.get("search_by_default", False),
+            title_selectors=tuple(extraction.get("title", ())),
+            content_selectors=tuple(extraction.get("content", ())),
+            exclude_tags=tuple(extraction.get("exclude_tags", default_exclude_tags)),
+            include_tags=tuple(extraction.get("include_tags", include_tags)),
+            max_concurrent=rate_limit.get("concurrency") or scrape_per_host_concurrency,
+            rate_per_sec=rate_limit.get("rate_per_sec", scrape_per_host_rate),
+        )
+
+
+# Outlets indexed by domain and by (case/whitespace-insensitive) source name and alias, so a
+# lookup is a dict hit or two whatever the number of outlets. Unknown sources return None.
+class OutletRegistry:
+    def __init__(self, outlets: Iterable[Outlet]):
+        self.outlets: List[Outlet] = list(outlets)
+        self._by_domain: Dict[str, Outlet] = {}
+        self._by_source: Dict[str, Outlet] = {}
+        for outlet in self.outlets:
+            for domain in outlet.domains:
+                if domain in self._by_domain:
+                    raise ValueError(f"Domain {domain!r} is listed for both {self._by_domain[domain].name!r} and {outlet.name!r}")
+                self._by_domain[domain] = outlet
+            for name in (outlet.name,) + outlet.aliases:
+                self._by_source.setdefault(normalize_source_name(name), outlet)
+
+    def __len__(self) -> int:
+        return len(self.outlets)
+
+    def for_source(self, source: Optional[str]) -> Optional[Outlet]:
+        return self._by_source.get(normalize_source_name(source)) if source else None
+
+    # Matches the URL's host or any parent domain (news.bbc.co.uk -> bbc.co.uk).
+    def for_url(self, url: Optional[str]) -> Optional[Outlet]:
+        host = host_of(url)
+        while host:
+            outlet = self._by_domain.get(host)
+            if outlet is not None:
+                return outlet
+            _, _, host = host.partition(".")
+        return None
+
+    # The link's domain is more reliable than SERP's display name, which varies ("AP", "AP News")
+    def for_article(self, article) -> Optional[Outlet]:
+        return self.for_url(article.link) or self.for_source(article.source)
+
+    def default_search_domains(self) -> List[str]:
+        return [outlet.domains[0] for outlet in self.outlets if outlet.enabled and outlet.search_by_default]
+
+    # (max_concurrent, rate_per_sec) for a host, for HostThrottle.
+    def host_limits(self, host: str) -> Optional[Tuple[int, Optional[float]]]:
+        outlet = self.for_url(f"https://{host}")
+        return (outlet.max_concurrent, outlet.rate_per_sec) if outlet is not None else None
+
+
+def load_outlet_registry(path: str = outlets_path) -> OutletRegistry:
+    with open(path) as f:
+        data = json.load(f)
+    return OutletRegistry(Outlet.from_dict(entry) for entry in data["outlets"])
+
+
+_outlet_registry = register("outlets.registry", load_outlet_registry)
+
+
+# Shared registry, loaded from OUTLETS_PATH on first use.
+def get_outlet_registry() -> OutletRegistry:
+    return _outlet_registry.get()
@@ -0,0 +1,108 @@
+from typing import Iterable, List, Mapping, Optional
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from articles import ArticleBatch
+from constants import persist_results
+from database import Base, get_engine, get_sessionmaker
+from models import ArticleAnalysis, UserQueryAndResponse
+
+# Never store credentials that ride along in the SERP params
+REDACTED_SERP_PARAMS = ("api_key",)
+
+
+def init_db() -> None:
+    Base.metadata.create_all(bind=get_engine())
+
+
+def _query_row(result: Mapping) -> dict:
+    return {
+        "user_query": result["original_user_input"],
+        "query_subject": result["query_subject"],
+        "serp_params": {k: v for k, v in result["serp_params"].items() if k not in REDACTED_SERP_PARAMS},
+        "bias_comparison_output": result.get("bias_comparison_output"),
+    }
+
+
+def _article_rows(query_id: int, articles: Iterable) -> List[dict]:
+    if isinstance(articles, ArticleBatch):
+        articles = articles.to_dicts()
+    rows = []
+    for article in articles:
+        bias_analysis = article.get("bias_analysis")
+        sentiment = None
+        if bias_analysis:
+            try:
+                sentiment = float(bias_analysis.get("sentiment_analysis"))
+            except (TypeError, ValueError):
+                pass
+        rows.append({
+            "query_id": query_id,
+            "position": article.get("position"),
+            "source": article.get("source"),
+            "political_bias": article.get("political_bias"),
+            "link": article["link"],
+            "title": article.get("title"),
+            "scraped_article": article.get("scraped_article"),
+            "news_analyst_response": article.get("news_analyst_response"),
+            "bias_analysis": bias_analysis,
+            "sentiment_analysis": sentiment,
+        })
+    return rows
+
+
+# Persist finished pipeline results (Burr state or an equivalent mapping holding
+# original_user_input, query_subject, serp_params, news_results and bias_comparison_output).
+# One bulk insert for the query rows (returning their ids in order), one for every
+# article row, committed as a single transaction.
+def save_pipeline_results(db: Session, results: Iterable[Mapping]) -> List[int]:
+    results = list(results)
+    if not results:
+        return []
+    query_ids = db.execute(
+        insert(UserQueryAndResponse).returning(UserQueryAndResponse.id, sort_by_parameter_order=True),
+        [_query_row(result) for result in results]
+    ).scalars().all()
+
+    article_rows = []
+    for query_id, result in zip(query_ids, results):
+        article_rows.extend(_article_rows(query_id, result.get("news_results") or []))
+    if article_rows:
+        db.execute(insert(ArticleAnalysis), article_rows)
+
+    db.commit()
+    return query_ids
+
+
+def save_pipeline_result(db: Session, result: Mapping) -> int:
+    return save_pipeline_results(db, [result])[0]
+
+
+# Store a finished run when PERSIST_RESULTS is on. Semantic cache hits answer from an earlier
+# run, which was stored when it finished.
+def persist_pipeline_state(state: Mapping) -> Optional[int]:
+    if not persist_results or state.get("semantic_cache_hit"):
+        return None
+    with get_sessionmaker()() as db:
+        return save_pipeline_result(db, state)
+
+
+async def save_pipeline_results_async(db, results: Iterable[Mapping]) -> List[int]:
+    results = list(results)
+    if not results:
+        return []
+    inserted = await db.execute(
+        insert(UserQueryAndResponse).returning(UserQueryAndResponse.id, sort_by_parameter_order=True),
+        [_query_row(result) for result in results]
+    )
+    query_ids = inserted.scalars().all()
+
+    article_rows = []
+    for query_id, result in zip(query_ids, results):
+        article_rows.extend(_article_rows(query_id, result.get("news_results") or []))
+    if article_rows:
+        await db.execute(insert(ArticleAnalysis), article_rows)
+
+    await db.commit()
+    return query_ids
@@ -0,0 +1,85 @@
+import os
+import threading
+
+from typing import Callable, Dict, Generic, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+# A client, engine or connection that is created on first use and shared within a process.
+# Instances are tied to the pid that created them: after a fork the child builds its own
+# (optionally calling `on_fork` on the inherited one first) instead of reusing the parent's sockets.
+class LazyProvider(Generic[T]):
+    def __init__(
+            self,
+            name: str,
+            factory: Callable[[], T],
+            on_fork: Optional[Callable[[T], None]] = None
+    ):
+        self.name = name
+        self.factory = factory
+        self.on_fork = on_fork
+        self._instance: Optional[T] = None
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def get(self) -> T:
+        instance = self._instance
+        if instance is not None and self._pid == os.getpid():
+            return instance
+        with self._lock:
+            if self._instance is not None and self._pid != os.getpid():
+                if self.on_fork is not None:
+                    self.on_fork(self._instance)
+                self._instance = None
+            if self._instance is None:
+                self._pid = os.getpid()
+                self._instance = self.factory()
+            return self._instance
+
+    # The instance if this process already created one; never creates it.
+    def peek(self) -> Optional[T]:
+        return self._instance if self._pid == os.getpid() else None
+
+    # Forget the instance (the next get() builds a new one) and return it so the caller can close it.
+    def clear(self) -> Optional[T]:
+        with self._lock:
+            instance, self._instance = self.peek(), None
+        return instance
+
+    def _after_fork_in_child(self) -> None:
+        # Another thread may have held the lock at fork time, and it would never be released here
+        self._lock = threading.Lock()
+
+
+_providers: Dict[str, LazyProvider] = {}
+_providers_lock = threading.Lock()
+
+
+def register(
+        name: str,
+        factory: Callable[[], T],
+        on_fork: Optional[Callable[[T], None]] = None
+) -> LazyProvider[T]:
+    with _providers_lock:
+        if name in _providers:
+            raise ValueError(f"Provider {name!r} is already registered")
+        provider = _providers[name] = LazyProvider(name, factory, on_fork)
+    return provider
+
+
+# Names of the providers that have been created in this process.
+def created_providers() -> list:
+    with _providers_lock:
+        return sorted(name for name, provider in _providers.items() if provider.peek() is not None)
+
+
+def _after_fork_in_child() -> None:
+    global _providers_lock
+    _providers_lock = threading.Lock()
+    for provider in _providers.values():
+        provider._after_fork_in_child()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
@@ -0,0 +1,243 @@
+import random
+import threading
+import time
+
+from email.utils import parsedate_to_datetime
+from typing import Callable, Dict, Optional, TypeVar
+
+from constants import rate_limits
+
+R = TypeVar("R")
+
+THROTTLE_STATUS_CODES = (429, 503)
+
+# Slack for float rounding, so sleeping exactly the computed wait always satisfies it
+_EPSILON = 1e-9
+
+
+# Raised (or translated into) when a provider says we are going too fast.
+class RateLimitedError(Exception):
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class RetriesExhaustedError(Exception):
+    pass
+
+
+# Seconds from a Retry-After header value, which is either delta-seconds or an HTTP date.
+def parse_retry_after(value: Optional[str], now: Optional[float] = None) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at - (now if now is not None else time.time()))
+
+
+# Classic token bucket: `rate` tokens per second, holding at most `capacity`.
+class TokenBucket:
+    def __init__(
+            self,
+            rate: float,
+            capacity: float,
+            clock: Callable[[], float] = time.monotonic,
+            sleep: Callable[[float], None] = time.sleep
+    ):
+        self.rate = rate
+        self.capacity = capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = capacity
+        self._updated = clock()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    # Seconds to wait before `tokens` are available; takes them if the answer is 0.
+    def _reserve(self, tokens: float) -> float:
+        with self._lock:
+            now = self._clock()
+            if now < self._paused_until - _EPSILON:
+                return self._paused_until - now
+            self._refill(max(now, self._updated))
+            if self._tokens >= tokens - _EPSILON:
+                self._tokens = max(0.0, self._tokens - tokens)
+                return 0.0
+            return (tokens - self._tokens) / self.rate
+
+    def try_acquire(self, tokens: float = 1.0) -> bool:
+        return self._reserve(tokens) == 0.0
+
+    def acquire(self, tokens: float = 1.0) -> float:
+        waited = 0.0
+        while True:
+            wait = self._reserve(tokens)
+            if wait == 0.0:
+                return waited
+            self._sleep(wait)
+            waited += wait
+
+    # Provider told us to back off: nobody gets a token until the pause is over.
+    def pause(self, seconds: float) -> None:
+        with self._lock:
+            now = self._clock()
+            self._paused_until = max(self._paused_until, now + seconds)
+            self._tokens = 0.0
+            self._updated = max(now, self._paused_until)
+
+    def available(self) -> float:
+        with self._lock:
+            self._refill(max(self._clock(), self._updated))
+            return self._tokens
+
+
+# AIMD concurrency limit: grows by one after a full window of successes,
+# halves whenever the provider throttles us.
+class AdaptiveConcurrencyLimit:
+    def __init__(self, initial: int, minimum: int = 1, maximum: int = 64, decrease_factor: float = 0.5):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.decrease_factor = decrease_factor
+        self._limit = float(max(minimum, min(initial, maximum)))
+        self._in_flight = 0
+        self._condition = threading.Condition()
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def acquire(self) -> None:
+        with self._condition:
+            while self._in_flight >= int(self._limit):
+                self._condition.wait()
+            self._in_flight += 1
+
+    def release(self) -> None:
+        with self._condition:
+            self._in_flight -= 1
+            self._condition.notify()
+
+    def on_success(self) -> None:
+        with self._condition:
+            self._limit = min(self.maximum, self._limit + 1.0 / self._limit)
+            self._condition.notify()
+
+    def on_throttle(self) -> None:
+        with self._condition:
+            self._limit = max(self.minimum, self._limit * self.decrease_factor)
+
+
+# Everything a call to one provider (and model) goes through: token bucket, adaptive
+# concurrency, and retries with full-jitter exponential backoff that honour Retry-After.
+class ProviderLimiter:
+    def __init__(
+            self,
+            name: str,
+            rate_per_sec: float,
+            burst: float,
+            initial_concurrency: int = 4,
+            max_concurrency: int = 16,
+            max_retries: int = 4,
+            base_delay: float = 0.5,
+            max_delay: float = 30.0,
+            clock: Callable[[], float] = time.monotonic,
+            sleep: Callable[[float], None] = time.sleep,
+            rng: Callable[[], float] = random.random
+    ):
+        self.name = name
+        self.bucket = TokenBucket(rate_per_sec, burst, clock=clock, sleep=sleep)
+        self.concurrency = AdaptiveConcurrencyLimit(initial_concurrency, maximum=max_concurrency)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._rng = rng
+        self._lock = threading.Lock()
+        self._counters = {"calls": 0, "successes": 0, "throttled": 0, "retries": 0, "failures": 0}
+        self._waited_s = 0.0
+
+    def _count(self, key: str, value: float = 1) -> None:
+        with self._lock:
+            self._counters[key] += value
+
+    def backoff_delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        if retry_after is not None:
+            return min(self.max_delay, retry_after)
+        return self._rng() * min(self.max_delay, self.base_delay * 2 ** attempt)
+
+    def call(self, fn: Callable[[], R]) -> R:
+        self._count("calls")
+        attempt = 0
+        while True:
+            waited = self.bucket.acquire()
+            self.concurrency.acquire()
+            try:
+                result = fn()
+            except RateLimitedError as e:
+                self.concurrency.release()
+                self.concurrency.on_throttle()
+                self._count("throttled")
+                if attempt >= self.max_retries:
+                    self._count("failures")
+                    raise RetriesExhaustedError(f"{self.name}: still throttled after {attempt + 1} attempts") from e
+                delay = self.backoff_delay(attempt, e.retry_after)
+                self.bucket.pause(delay)
+                self._count("retries")
+                with self._lock:
+                    self._waited_s += waited
+                attempt += 1
+                continue
+            except Exception:
+                self.concurrency.release()
+                self._count("failures")
+                raise
+
+            self.concurrency.release()
+            self.concurrency.on_success()
+            self._count("successes")
+            with self._lock:
+                self._waited_s += waited
+            return result
+
+    def metrics(self) -> dict:
+        with self._lock:
+            metrics = dict(self._counters, waited_s=round(self._waited_s, 3))
+        metrics.update(
+            concurrency_limit=self.concurrency.limit,
+            in_flight=self.concurrency.in_flight,
+            tokens_available=round(self.bucket.available(), 3),
+        )
+        return metrics
+
+
+_limiters: Dict[str, ProviderLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+# Shared limiter for a provider ("groq", "firecrawl", "serpapi"), optionally per model. Providers
+# without an entry in rate_limits pass their `settings` (see LLM_PROVIDERS).
+def get_limiter(provider: str, model: Optional[str] = None, settings: Optional[dict] = None) -> ProviderLimiter:
+    name = f"{provider}:{model}" if model else provider
+    with _limiters_lock:
+        if name not in _limiters:
+            _limiters[name] = ProviderLimiter(name, **(settings or rate_limits[provider]))
+        return _limiters[name]
+
+
+def limiter_metrics() -> Dict[str, dict]:
+    with _limiters_lock:
+        limiters = list(_limiters.values())
+    return {limiter.name: limiter.metrics() for limiter in limiters}
@@ -0,0 +1,7 @@
+from pydantic import BaseModel, Field
+
+
+# Firecrawl JSON extraction schema for news articles.
+class NewsExtractSchema(BaseModel):
+    main_article_title: str = Field(description="The main title of the article.")
+    main_article_content: str = Field(description="The main content of the article. Do not include any information from other attachments.")
@@ -0,0 +1,157 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from typing import Callable, Optional, Set
+
+from constants import (semantic_cache_enabled, semantic_cache_path, semantic_cache_threshold,
+                       semantic_cache_max_age)
+from fingerprints import MinHasher, char_shingles, lsh_band_keys, tokenize, word_shingles
+from providers import register
+
+NUM_PERM = 64
+BANDS = 16  # 4 rows per band: pairs above ~0.6 similarity almost always share a band, unrelated ones almost never
+
+
+def normalize_subject(subject: str) -> str:
+    return " ".join(tokenize(subject))
+
+
+# Words, word pairs and character trigrams, so reordered phrasings ("China tariffs" /
+# "tariffs on China"), filler words and plurals don't defeat a match.
+def subject_shingles(subject: str) -> Set[str]:
+    tokens = tokenize(subject)
+    return word_shingles(tokens, 1) | {f"_{s}" for s in word_shingles(tokens, 2)} | char_shingles(tokens, 3)
+
+
+# Stores finished analyses keyed by query subject, and finds a recent one whose subject
+# is similar enough to a new question's subject. Candidates come from an LSH band index
+# in SQLite, so a lookup touches only a handful of rows no matter how many are stored.
+class SemanticQueryCache:
+    def __init__(
+            self,
+            path: str = semantic_cache_path,
+            threshold: float = semantic_cache_threshold,
+            max_age_seconds: Optional[float] = semantic_cache_max_age,
+            clock: Callable[[], float] = time.time
+    ):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.threshold = threshold
+        self.max_age_seconds = max_age_seconds
+        self._clock = clock
+        self._hasher = MinHasher(num_perm=NUM_PERM)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS semantic_entries (
+                id INTEGER PRIMARY KEY, subject TEXT NOT NULL, normalized TEXT NOT NULL,
+                signature TEXT NOT NULL, result TEXT NOT NULL, created_at REAL NOT NULL);
+            CREATE INDEX IF NOT EXISTS semantic_entries_normalized ON semantic_entries (normalized, created_at);
+            CREATE TABLE IF NOT EXISTS semantic_bands (
+                band INTEGER NOT NULL, bucket TEXT NOT NULL, entry_id INTEGER NOT NULL, created_at REAL NOT NULL);
+            CREATE INDEX IF NOT EXISTS semantic_bands_lookup ON semantic_bands (band, bucket, created_at);
+        """)
+        self._conn.commit()
+        self.hits = 0
+        self.misses = 0
+
+    def _signature(self, subject: str):
+        return self._hasher.signature(subject_shingles(subject))
+
+    def add(self, subject: str, result: dict) -> int:
+        now = self._clock()
+        signature = self._signature(subject)
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO semantic_entries (subject, normalized, signature, result, created_at) VALUES (?, ?, ?, ?, ?)",
+                (subject, normalize_subject(subject), json.dumps(signature), json.dumps(result, default=str), now)
+            )
+            entry_id = cursor.lastrowid
+            self._conn.executemany(
+                "INSERT INTO semantic_bands (band, bucket, entry_id, created_at) VALUES (?, ?, ?, ?)",
+                [(band, bucket, entry_id, now) for band, bucket in enumerate(lsh_band_keys(signature, BANDS))]
+            )
+            self._conn.commit()
+        return entry_id
+
+    # Best stored result within the time window whose subject similarity clears the threshold.
+    # Returns {"subject", "similarity", "created_at", "result"} or None.
+    def lookup(self, subject: str) -> Optional[dict]:
+        cutoff = self._clock() - self.max_age_seconds if self.max_age_seconds else 0.0
+        normalized = normalize_subject(subject)
+        signature = self._signature(subject)
+        band_keys = lsh_band_keys(signature, BANDS)
+
+        with self._lock:
+            exact = self._conn.execute(
+                "SELECT subject, result, created_at FROM semantic_entries "
+                "WHERE normalized = ? AND created_at >= ? ORDER BY created_at DESC LIMIT 1",
+                (normalized, cutoff)
+            ).fetchone()
+            if exact is not None:
+                self.hits += 1
+                return {"subject": exact[0], "similarity": 1.0, "created_at": exact[2], "result": json.loads(exact[1])}
+
+            candidate_ids = set()
+            for band, bucket in enumerate(band_keys):
+                candidate_ids.update(row[0] for row in self._conn.execute(
+                    "SELECT entry_id FROM semantic_bands WHERE band = ? AND bucket = ? AND created_at >= ?",
+                    (band, bucket, cutoff)
+                ))
+            best = None
+            if candidate_ids:
+                placeholders = ",".join("?" * len(candidate_ids))
+                rows = self._conn.execute(
+                    f"SELECT subject, signature, result, created_at FROM semantic_entries WHERE id IN ({placeholders})",
+                    tuple(candidate_ids)
+                ).fetchall()
+                for stored_subject, stored_signature, result, created_at in rows:
+                    similarity = MinHasher.similarity(signature, json.loads(stored_signature))
+                    if similarity >= self.threshold and (best is None or similarity > best["similarity"]):
+                        best = {"subject": stored_subject, "similarity": similarity, "created_at": created_at, "result": result}
+
+            if best is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        best["result"] = json.loads(best["result"])
+        return best
+
+    # Drop entries older than the time window.
+    def prune(self) -> int:
+        if not self.max_age_seconds:
+            return 0
+        cutoff = self._clock() - self.max_age_seconds
+        with self._lock:
+            self._conn.execute("DELETE FROM semantic_bands WHERE created_at < ?", (cutoff,))
+            deleted = self._conn.execute("DELETE FROM semantic_entries WHERE created_at < ?", (cutoff,)).rowcount
+            self._conn.commit()
+        return deleted
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        with self._lock:
+            (entries,) = self._conn.execute("SELECT COUNT(*) FROM semantic_entries").fetchone()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": entries,
+        }
+
+
+_semantic_cache = register("cache.semantic", SemanticQueryCache)
+
+
+# Shared semantic query cache, or None unless enabled with SEMANTIC_CACHE_ENABLED=1.
+def get_semantic_cache() -> Optional[SemanticQueryCache]:
+    return _semantic_cache.get() if semantic_cache_enabled else None
+
+
+# The shared cache if something has already created it; never opens the database.
+def get_semantic_cache_if_created() -> Optional[SemanticQueryCache]:
+    return _semantic_cache.peek()
@@ -0,0 +1,376 @@
+import math
+import re
+import time
+
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+from articles import Article
+from constants import (comparison_digest_excerpts, comparison_digest_excerpt_chars, comparison_digest_max_gaps,
+                       sentiment_trend_bucket, sentiment_trend_max_buckets)
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional; without it comparisons send every bias analysis to the LLM as before
+    np = None
+
+
+def sentiment_stats_available() -> bool:
+    return np is not None
+
+
+def article_sentiment(article: Article) -> Optional[float]:
+    try:
+        value = float((article.bias_analysis or {}).get("sentiment_analysis"))
+    except (TypeError, ValueError):
+        return None
+    return value if math.isfinite(value) else None
+
+
+# Two-sided 95% Student t critical values for 1-30 degrees of freedom; past that the normal value is close enough
+_T95 = (12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228, 2.201, 2.179, 2.160, 2.145, 2.131,
+        2.120, 2.110, 2.101, 2.093, 2.086, 2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042)
+_Z95 = 1.96
+
+
+def _t95(dof):
+    table = np.array((np.nan,) + _T95)
+    dof = np.floor(np.nan_to_num(dof, nan=0.0)).astype(np.int64)
+    return np.where(dof > len(_T95), _Z95, table[np.clip(dof, 0, len(_T95))])
+
+
+_RELATIVE_DATE = re.compile(r"(\d+)\s+(minute|hour|day|week|month|year)s?\s+ago", re.IGNORECASE)
+_UNIT_SECONDS = {"minute": 60, "hour": 3600, "day": 86400, "week": 7 * 86400, "month": 30 * 86400,
+                 "year": 365 * 86400}
+_DATE_FORMATS = ("%m/%d/%Y, %I:%M %p, %z UTC", "%b %d, %Y", "%B %d, %Y", "%Y-%m-%d")
+
+
+# Publication time of a SERP result ("Apr 9, 2025", "3 hours ago", Google News' "04/09/2025, 07:00 AM,
+# +0000 UTC") as a Unix timestamp, or None when the date can't be read.
+def parse_article_date(date: Optional[str], now: Optional[float] = None) -> Optional[float]:
+    if not date:
+        return None
+    date = date.strip()
+    relative = _RELATIVE_DATE.fullmatch(date)
+    if relative:
+        now = time.time() if now is None else now
+        return now - int(relative.group(1)) * _UNIT_SECONDS[relative.group(2).lower()]
+    for date_format in _DATE_FORMATS:
+        try:
+            parsed = datetime.strptime(date, date_format)
+        except ValueError:
+            continue
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=timezone.utc)
+        return parsed.timestamp()
+    return None
+
+
+# Sentiment scores held column-wise as NumPy arrays: the outlet of each score (as an index into
+# `outlets`), the score and when it was published or first seen (NaN when unknown). Every statistic
+# below is computed over the whole sample with grouped array operations, so thousands of stored
+# analyses cost about as much as a handful.
+class SentimentSample:
+    __slots__ = ("outlets", "codes", "values", "timestamps")
+
+    def __init__(
+            self,
+            outlets: Sequence[Optional[str]],
+            values: Sequence[float],
+            timestamps: Optional[Sequence[Optional[float]]] = None
+    ):
+        names = np.asarray([outlet or "Unknown" for outlet in outlets], dtype=str)
+        unique, codes = np.unique(names, return_inverse=True)
+        self.outlets = tuple(str(outlet) for outlet in unique)
+        self.codes = codes.astype(np.int64).reshape(-1)
+        self.values = np.asarray(values, dtype=np.float64).reshape(-1)
+        if timestamps is None:
+            self.timestamps = np.full(len(self.values), np.nan)
+        else:
+            self.timestamps = np.array([np.nan if ts is None else ts for ts in timestamps], dtype=np.float64)
+        if not len(self.codes) == len(self.values) == len(self.timestamps):
+            raise ValueError("SentimentSample columns must have the same length")
+
+    # Scores of the analyzed articles, skipping near-duplicates (they share their original's
+    # analysis). Times are the SERP publication dates unless `observed_at` is given for all of them.
+    @classmethod
+    def from_articles(
+            cls,
+            articles: Iterable[Article],
+            observed_at: Optional[float] = None,
+            now: Optional[float] = None
+    ) -> "SentimentSample":
+        return cls(*_columns(scored_articles(articles), observed_at, now))
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def __repr__(self) -> str:
+        return f"SentimentSample({len(self)} scores, {len(self.outlets)} outlets)"
+
+    def concat(self, other: "SentimentSample") -> "SentimentSample":
+        return SentimentSample(
+            [self.outlets[code] for code in self.codes] + [other.outlets[code] for code in other.codes],
+            np.concatenate([self.values, other.values]),
+            np.concatenate([self.timestamps, other.timestamps])
+        )
+
+
+def scored_articles(articles: Iterable[Article]) -> List[Article]:
+    return [article for article in articles
+            if article.duplicate_of is None and article_sentiment(article) is not None]
+
+
+def _columns(
+        articles: List[Article],
+        observed_at: Optional[float],
+        now: Optional[float]
+) -> Tuple[List[Optional[str]], List[float], List[Optional[float]]]:
+    return (
+        [article.outlet or article.source for article in articles],
+        [article_sentiment(article) for article in articles],
+        [observed_at if observed_at is not None else parse_article_date(article.date, now) for article in articles]
+    )
+
+
+def _finite(value) -> Optional[float]:
+    value = float(value)
+    return value if math.isfinite(value) else None
+
+
+# Per-outlet count, mean and sample variance (NaN for a single article), in outlet order.
+def _moments(sample: SentimentSample):
+    k = len(sample.outlets)
+    counts = np.bincount(sample.codes, minlength=k).astype(np.float64)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = np.bincount(sample.codes, weights=sample.values, minlength=k) / counts
+        deviations = sample.values - means[sample.codes]
+        m2 = np.bincount(sample.codes, weights=deviations * deviations, minlength=k)
+        variances = np.where(counts > 1, m2 / np.maximum(counts - 1, 1), np.nan)
+    return counts, means, variances
+
+
+# Count, mean, sample variance and standard deviation, 95% confidence interval of the mean and
+# range of each outlet's sentiment. Statistics that need more articles than an outlet has are None.
+def outlet_summary(sample: SentimentSample) -> Dict[str, dict]:
+    if not len(sample):
+        return {}
+    counts, means, variances = _moments(sample)
+    half_widths = _t95(counts - 1) * np.sqrt(variances / counts)
+    minimums = np.full(len(sample.outlets), np.inf)
+    maximums = np.full(len(sample.outlets), -np.inf)
+    np.minimum.at(minimums, sample.codes, sample.values)
+    np.maximum.at(maximums, sample.codes, sample.values)
+    return {
+        outlet: {
+            "count": int(counts[i]),
+            "mean": _finite(means[i]),
+            "variance": _finite(variances[i]),
+            "std": _finite(np.sqrt(variances[i])),
+            "ci_low": _finite(means[i] - half_widths[i]),
+            "ci_high": _finite(means[i] + half_widths[i]),
+            "min": _finite(minimums[i]),
+            "max": _finite(maximums[i]),
+        }
+        for i, outlet in enumerate(sample.outlets)
+    }
+
+
+# The outlet pairs whose mean sentiment differs most, relative to the uncertainty (Welch's t), with
+# the difference and its 95% confidence interval. Pairs where either outlet has a single article
+# are left out.
+def outlet_gaps(sample: SentimentSample, limit: int = comparison_digest_max_gaps) -> List[dict]:
+    if not len(sample):
+        return []
+    counts, means, variances = _moments(sample)
+    squared_errors = variances / counts
+    first, second = np.triu_indices(len(sample.outlets), k=1)
+    differences = means[first] - means[second]
+    pair_se2 = squared_errors[first] + squared_errors[second]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        dof = pair_se2 ** 2 / (squared_errors[first] ** 2 / (counts[first] - 1)
+                               + squared_errors[second] ** 2 / (counts[second] - 1))
+        # |t|: infinite for a difference between two constant outlets, NaN when a variance is unknown
+        scores = np.abs(differences) / np.sqrt(pair_se2)
+    scores = np.where((pair_se2 == 0) & (differences == 0), 0.0, scores)
+    valid = np.flatnonzero(~np.isnan(scores))
+    order = valid[np.argsort(-scores[valid], kind="stable")]
+    half_widths = _t95(dof) * np.sqrt(pair_se2)
+    gaps = []
+    for pair in order[:limit]:
+        a, b = (first[pair], second[pair]) if differences[pair] >= 0 else (second[pair], first[pair])
+        difference = abs(float(differences[pair]))
+        half_width = float(half_widths[pair]) if pair_se2[pair] > 0 else 0.0
+        gaps.append({
+            "outlets": [sample.outlets[a], sample.outlets[b]],
+            "difference": difference,
+            "ci_low": _finite(difference - half_width),
+            "ci_high": _finite(difference + half_width),
+            "significant": bool(difference - half_width > 0),
+        })
+    return gaps
+
+
+# Mean sentiment per outlet per time bucket (the most recent `max_buckets` buckets with articles)
+# and the least-squares slope of sentiment over time, in sentiment per day (None unless the outlet's
+# scores span more than one bucket). Scores without a time are left out; outlets with none are
+# missing from the result.
+def outlet_trends(
+        sample: SentimentSample,
+        bucket_s: float = sentiment_trend_bucket,
+        max_buckets: int = sentiment_trend_max_buckets
+) -> Dict[str, dict]:
+    timed = np.isfinite(sample.timestamps)
+    if not timed.any():
+        return {}
+    codes, values, timestamps = sample.codes[timed], sample.values[timed], sample.timestamps[timed]
+    k = len(sample.outlets)
+
+    buckets = np.floor(timestamps / bucket_s).astype(np.int64)
+    first_bucket = int(buckets.min())
+    span = int(buckets.max()) - first_bucket + 1
+    keys, inverse = np.unique(codes * span + (buckets - first_bucket), return_inverse=True)
+    bucket_counts = np.bincount(inverse)
+    bucket_means = np.bincount(inverse, weights=values) / bucket_counts
+    key_outlets = keys // span
+    key_starts = (keys % span + first_bucket) * bucket_s
+
+    days = (timestamps - timestamps.min()) / 86400
+    n = np.bincount(codes, minlength=k)
+    sum_t = np.bincount(codes, weights=days, minlength=k)
+    sum_y = np.bincount(codes, weights=values, minlength=k)
+    sum_ty = np.bincount(codes, weights=days * values, minlength=k)
+    sum_tt = np.bincount(codes, weights=days * days, minlength=k)
+    denominators = n * sum_tt - sum_t * sum_t
+    # Scores that all fall in one bucket say nothing about a trend at this resolution
+    spans_buckets = np.bincount(key_outlets, minlength=k) > 1
+    with np.errstate(invalid="ignore", divide="ignore"):
+        slopes = np.where(spans_buckets & (denominators > 0), (n * sum_ty - sum_t * sum_y) / denominators, np.nan)
+
+    # keys are sorted by outlet, then bucket, so each outlet's buckets are one contiguous run
+    bounds = np.searchsorted(key_outlets, np.arange(k + 1))
+    trends = {}
+    for code in np.flatnonzero(n):
+        start, end = bounds[code], bounds[code + 1]
+        start = max(start, end - max_buckets)
+        trends[sample.outlets[code]] = {
+            "buckets": [{"start": float(key_starts[i]), "count": int(bucket_counts[i]), "mean": float(bucket_means[i])}
+                        for i in range(start, end)],
+            "slope_per_day": _finite(slopes[code]),
+        }
+    return trends
+
+
+# Indices of the most representative scores of each outlet, alternating the one closest to the
+# outlet's mean and the one furthest from it.
+def representative_indices(
+        sample: SentimentSample,
+        per_outlet: int = comparison_digest_excerpts
+) -> Dict[str, List[int]]:
+    if not len(sample) or per_outlet <= 0:
+        return {}
+    _, means, _ = _moments(sample)
+    distances = np.abs(sample.values - means[sample.codes])
+    order = np.lexsort((distances, sample.codes))
+    bounds = np.searchsorted(sample.codes[order], np.arange(len(sample.outlets) + 1))
+    chosen = {}
+    for code, outlet in enumerate(sample.outlets):
+        group = order[bounds[code]:bounds[code + 1]].tolist()
+        picks = []
+        while group and len(picks) < per_outlet:
+            picks.append(group.pop(0))
+            if group and len(picks) < per_outlet:
+                picks.append(group.pop())
+        chosen[outlet] = picks
+    return chosen
+
+
+def _signed(value: Optional[float]) -> str:
+    return "n/a" if value is None else f"{value:+.2f}"
+
+
+def _interval(low: Optional[float], high: Optional[float]) -> str:
+    return "n/a" if low is None or high is None else f"[{low:+.2f}, {high:+.2f}]"
+
+
+# The statistics part of a comparison prompt: per-outlet summary, the largest gaps between outlets
+# and each outlet's recent trend. Its size depends on the number of outlets, not of articles.
+def format_sentiment_statistics(
+        sample: SentimentSample,
+        leanings: Optional[Mapping[str, str]] = None,
+        bucket_s: float = sentiment_trend_bucket
+) -> str:
+    leanings = leanings or {}
+    summary = outlet_summary(sample)
+    trends = outlet_trends(sample, bucket_s=bucket_s)
+    overall = np.mean(sample.values)
+    overall_half_width = float(_t95(len(sample) - 1) * np.std(sample.values, ddof=1) / np.sqrt(len(sample))) \
+        if len(sample) > 1 else float("nan")
+
+    lines = [f"ARTICLES ANALYZED: {len(sample)} across {len(summary)} outlets, overall mean "
+             f"{_signed(_finite(overall))} {_interval(_finite(overall - overall_half_width), _finite(overall + overall_half_width))}",
+             "",
+             "SENTIMENT BY OUTLET (count, mean with 95% confidence interval, std, range, trend):"]
+    for outlet, stats in sorted(summary.items(), key=lambda item: -item[1]["count"]):
+        leaning = f" ({leanings[outlet]})" if leanings.get(outlet) else ""
+        slope = (trends.get(outlet) or {}).get("slope_per_day")
+        lines.append(f"# {outlet}{leaning}: {stats['count']} articles, mean {_signed(stats['mean'])} "
+                     f"{_interval(stats['ci_low'], stats['ci_high'])}, std "
+                     f"{'n/a' if stats['std'] is None else format(stats['std'], '.2f')}, range "
+                     f"{_signed(stats['min'])} to {_signed(stats['max'])}, trend "
+                     f"{'n/a' if slope is None else format(slope, '+.3f') + '/day'}")
+
+    gaps = outlet_gaps(sample)
+    if gaps:
+        lines += ["", "LARGEST DIFFERENCES BETWEEN OUTLETS (higher minus lower mean, 95% confidence interval):"]
+        for gap in gaps:
+            lines.append(f"{gap['outlets'][0]} vs {gap['outlets'][1]}: {gap['difference']:+.2f} "
+                         f"{_interval(gap['ci_low'], gap['ci_high'])}"
+                         f"{'' if gap['significant'] else ' (not significant)'}")
+
+    if any(len(trend["buckets"]) > 1 for trend in trends.values()):
+        lines += ["", f"MEAN SENTIMENT OVER TIME ({bucket_s / 3600:g}h buckets, oldest first, article count in brackets):"]
+        for outlet, trend in sorted(trends.items()):
+            lines.append(f"# {outlet}: " + ", ".join(
+                f"{datetime.fromtimestamp(bucket['start'], timezone.utc):%Y-%m-%d %H:%M} {bucket['mean']:+.2f} ({bucket['count']})"
+                for bucket in trend["buckets"]))
+    return "\n".join(lines)
+
+
+def _excerpt(text: str, max_chars: int) -> str:
+    text = " ".join(str(text).split())
+    return text if len(text) <= max_chars else text[:max_chars - 3].rstrip() + "..."
+
+
+# The user prompt for comparing outlets from their statistics instead of every bias analysis: the
+# statistics above plus a few representative bias write-ups per outlet. Returns None when none of
+# the articles has a usable sentiment score.
+def build_comparison_digest(
+        user_query_subject: str,
+        articles: Iterable[Article],
+        excerpts_per_outlet: int = comparison_digest_excerpts,
+        excerpt_chars: int = comparison_digest_excerpt_chars,
+        now: Optional[float] = None
+) -> Optional[str]:
+    scored = scored_articles(articles)
+    if not scored:
+        return None
+    sample = SentimentSample(*_columns(scored, None, now))
+    leanings = {article.outlet or article.source: article.political_bias for article in scored}
+
+    digest = f"""
+    USER QUERY SUBJECT: {user_query_subject}
+
+    ======
+{format_sentiment_statistics(sample, leanings)}
+"""
+    chosen = representative_indices(sample, per_outlet=excerpts_per_outlet)
+    if any(chosen.values()):
+        digest += "\nREPRESENTATIVE BIAS ANALYSES (closest to and furthest from each outlet's mean):\n"
+        for outlet, indices in chosen.items():
+            digest += f"\n# {outlet}\n"
+            for index in indices:
+                article = scored[index]
+                digest += (f"- {sample.values[index]:+.2f}: "
+                           f"{_excerpt(article.bias_analysis.get('bias_shown', ''), excerpt_chars)}\n")
+    return digest
@@ -0,0 +1,291 @@
+import threading
+import time
+
+from bisect import bisect_left
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from constants import metrics_enabled, tracing_enabled, tracing_service_name
+
+_tracer = None
+if tracing_enabled:
+    try:
+        from opentelemetry import trace as otel_trace
+        _tracer = otel_trace.get_tracer(tracing_service_name)
+    except ImportError:  # opentelemetry-api is optional; spans are skipped without it
+        pass
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        if not metrics_enabled:
+            return
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(tuple(str(labels.get(name, "")) for name in self.labelnames), 0.0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        lines += [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(v)}" for key, v in values]
+        return lines
+
+
+# Cumulative-bucket histogram in the Prometheus exposition format.
+class Histogram:
+    def __init__(
+            self,
+            name: str,
+            help_text: str,
+            labelnames: Sequence[str] = (),
+            buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[LabelValues, list] = {}  # labels -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        if not metrics_enabled:
+            return
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def count(self, **labels: str) -> int:
+        series = self._series.get(tuple(str(labels.get(name, "")) for name in self.labelnames))
+        return sum(series[:-1]) if series else 0
+
+    def render(self) -> List[str]:
+        with self._lock:
+            series_items = sorted((key, list(series)) for key, series in self._series.items())
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for key, series in series_items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series[:-1]):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                bucket_labels = _format_labels(self.labelnames, key, extra=f'le="{le}"')
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(series[-1])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+ACTION_DURATION = Histogram(
+    "pipeline_action_duration_seconds", "Wall-clock duration of pipeline actions.", ["action", "status"])
+EXTERNAL_CALL_DURATION = Histogram(
+    "external_call_duration_seconds", "Duration of each outbound API request attempt.", ["provider", "outcome"])
+LLM_TOKENS = Counter("llm_tokens_total", "Tokens reported in Groq usage, by model and kind.", ["model", "kind"])
+SCRAPE_ERRORS = Counter("scrape_errors_total", "Article scrapes that returned an error, by host.", ["host"])
+BIAS_ANALYSIS_INVALID = Counter(
+    "bias_analysis_invalid_responses_total", "Bias analysis responses that failed validation.", ["outlet"])
+LOCAL_EXTRACTIONS = Counter(
+    "local_extractions_total", "Local HTML extraction attempts, by host and outcome (ok, fetch_error, fallback).",
+    ["host", "outcome"])
+LLM_REQUEST_DURATION = Histogram(
+    "llm_request_duration_seconds", "Duration of each LLM request the gateway sends, by task, target and outcome.",
+    ["task", "target", "outcome"])
+LLM_HEDGES = Counter(
+    "llm_hedged_requests_total", "Duplicate LLM requests sent after the first ran past its latency deadline.", ["task"])
+LLM_HEDGE_WINS = Counter("llm_hedge_wins_total", "LLM calls answered by the hedged duplicate first.", ["task"])
+LLM_FAILOVERS = Counter(
+    "llm_failovers_total", "LLM requests re-sent to the next target after an error, by task.", ["task"])
+METRICS = [ACTION_DURATION, EXTERNAL_CALL_DURATION, LLM_TOKENS, SCRAPE_ERRORS, BIAS_ANALYSIS_INVALID,
+           LOCAL_EXTRACTIONS, LLM_REQUEST_DURATION, LLM_HEDGES, LLM_HEDGE_WINS, LLM_FAILOVERS]
+
+
+# False when neither metrics nor tracing are on, so callers can skip instrumentation entirely.
+def is_enabled() -> bool:
+    return metrics_enabled or _tracer is not None
+
+
+class _NoopTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set_outcome(self, outcome: str) -> None:
+        pass
+
+
+_NOOP_TIMER = _NoopTimer()
+
+
+# Times a block into a histogram and, with tracing on, wraps it in an OpenTelemetry span.
+# The histogram's "status"/"outcome" label is "ok" or "error" unless set_outcome() overrides it.
+class _Timer:
+    def __init__(self, histogram: Histogram, span_name: str, outcome_label: str, labels: dict):
+        self._histogram = histogram
+        self._span_name = span_name
+        self._outcome_label = outcome_label
+        self._labels = labels
+        self._outcome = None
+        self._span_cm = None
+
+    def set_outcome(self, outcome: str) -> None:
+        self._outcome = outcome
+
+    def __enter__(self):
+        if _tracer is not None:
+            self._span_cm = _tracer.start_as_current_span(self._span_name, attributes=self._labels)
+            self._span_cm.__enter__()
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self._started
+        outcome = self._outcome or ("error" if exc_type is not None else "ok")
+        self._histogram.observe(elapsed, **{self._outcome_label: outcome}, **self._labels)
+        if self._span_cm is not None:
+            self._span_cm.__exit__(exc_type, exc, tb)
+        return False
+
+
+def time_action(action: str):
+    if not metrics_enabled and _tracer is None:
+        return _NOOP_TIMER
+    return _Timer(ACTION_DURATION, f"action {action}", "status", {"action": action})
+
+
+# One attempt at an outbound request; the limiter's retries show up as separate attempts.
+def time_external_call(provider: str):
+    if not metrics_enabled and _tracer is None:
+        return _NOOP_TIMER
+    return _Timer(EXTERNAL_CALL_DURATION, f"{provider} request", "outcome", {"provider": provider})
+
+
+# Call an action (or helper) outside of Burr with the same instrumentation TelemetryHook gives.
+def run_timed(name: str, fn, *args, **kwargs):
+    with time_action(name):
+        return fn(*args, **kwargs)
+
+
+def span(name: str, **attributes):
+    if _tracer is None:
+        return _NOOP_TIMER
+    return _tracer.start_as_current_span(name, attributes=attributes)
+
+
+# Flush spans the tracer provider still buffers (an SDK provider set up by the deployment);
+# the API's default provider has nothing to flush.
+def shutdown() -> None:
+    if _tracer is None:
+        return
+    force_flush = getattr(otel_trace.get_tracer_provider(), "force_flush", None)
+    if force_flush is not None:
+        force_flush()
+
+
+# Token counts from a Groq response's `usage` (or a stream's final x_groq.usage).
+def record_llm_usage(model: str, usage) -> None:
+    if not metrics_enabled or usage is None:
+        return
+    for kind in ("prompt_tokens", "completion_tokens"):
+        tokens = getattr(usage, kind, None)
+        if tokens:
+            LLM_TOKENS.inc(tokens, model=model, kind=kind.split("_")[0])
+
+
+def _counter_lines(name: str, help_text: str, labelname: str, values: Dict[str, float]) -> List[str]:
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+    lines += [f'{name}{{{labelname}="{_escape(key)}"}} {_format_value(v)}' for key, v in sorted(values.items())]
+    return lines
+
+
+def _gauge_lines(name: str, help_text: str, labelname: str, values: Dict[str, float]) -> List[str]:
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+    lines += [f'{name}{{{labelname}="{_escape(key)}"}} {_format_value(v)}' for key, v in sorted(values.items())]
+    return lines
+
+
+# Counters the rate limiters and caches already keep are read at scrape time rather than
+# double-counted on the hot path.
+def _runtime_metric_lines() -> List[str]:
+    from cache import cache_counters
+    from dedup import get_fingerprint_index_if_created
+    from llm_gateway import get_llm_gateway_if_created
+    from rate_limit import limiter_metrics
+    from semantic_cache import get_semantic_cache_if_created
+
+    lines = []
+    limiters = limiter_metrics()
+    for key, help_text in (("calls", "Calls made through the provider rate limiter."),
+                           ("throttled", "Throttled (429/503) responses from the provider."),
+                           ("retries", "Retries after a throttled response."),
+                           ("failures", "Calls that failed after any retries.")):
+        lines += _counter_lines(f"rate_limiter_{key}_total", help_text, "limiter",
+                                {name: m[key] for name, m in limiters.items()})
+    lines += _counter_lines("rate_limiter_wait_seconds_total", "Time spent waiting for rate limiter tokens.",
+                            "limiter", {name: m["waited_s"] for name, m in limiters.items()})
+    lines += _gauge_lines("rate_limiter_concurrency_limit", "Current adaptive concurrency limit.", "limiter",
+                          {name: m["concurrency_limit"] for name, m in limiters.items()})
+    lines += _gauge_lines("rate_limiter_in_flight", "Requests currently in flight.", "limiter",
+                          {name: m["in_flight"] for name, m in limiters.items()})
+
+    gateway = get_llm_gateway_if_created()
+    if gateway is not None:
+        routes = gateway.metrics()
+        for key, help_text in (("p50", "Median latency of recent requests, by task and target."),
+                               ("p95", "95th percentile latency of recent requests, by task and target.")):
+            lines += _gauge_lines(f"llm_route_latency_{key}_seconds", help_text, "route",
+                                  {name: m[key] for name, m in routes.items() if m[key] is not None})
+
+    caches = cache_counters()
+    semantic_cache = get_semantic_cache_if_created()
+    if semantic_cache is not None:
+        caches["semantic"] = {"hits": semantic_cache.hits, "misses": semantic_cache.misses, "evictions": 0}
+    fingerprint_index = get_fingerprint_index_if_created()
+    if fingerprint_index is not None:
+        caches["fingerprints"] = {"hits": fingerprint_index.hits, "misses": fingerprint_index.misses, "evictions": 0}
+    for key in ("hits", "misses", "evictions"):
+        lines += _counter_lines(f"cache_{key}_total", f"Cache {key}, by cache.", "cache",
+                                {name: counters[key] for name, counters in caches.items()})
+    return lines
+
+
+# Everything above in the Prometheus text exposition format (version 0.0.4).
+def render_prometheus() -> str:
+    lines = []
+    for metric in METRICS:
+        lines += metric.render()
+    lines += _runtime_metric_lines()
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,378 @@
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Set
+
+from articles import Article
+from constants import (topic_db_path, topic_default_interval, topic_max_concurrent_runs, topic_poll_interval,
+                       scrape_max_workers, bias_analysis_max_workers, bias_analysis_batched,
+                       update_comparison_system_prompt)
+from dedup import canonical_url
+from jobs import normalize_query
+from sentiment_stats import (SentimentSample, article_sentiment, format_sentiment_statistics,
+                             sentiment_stats_available)
+from telemetry import run_timed
+
+
+# Running count/mean/M2 (Welford) plus range of an outlet's sentiment, updated one article at a
+# time so a topic's statistics never need the earlier articles again.
+def add_sentiment(stats: Optional[dict], value: float) -> dict:
+    stats = dict(stats) if stats else {"count": 0, "mean": 0.0, "m2": 0.0, "min": value, "max": value}
+    stats["count"] += 1
+    delta = value - stats["mean"]
+    stats["mean"] += delta / stats["count"]
+    stats["m2"] += delta * (value - stats["mean"])
+    stats["min"] = min(stats["min"], value)
+    stats["max"] = max(stats["max"], value)
+    return stats
+
+
+# Sample standard deviation, like the stats endpoint; None until an outlet has two articles.
+def sentiment_stddev(stats: dict) -> Optional[float]:
+    return math.sqrt(stats["m2"] / (stats["count"] - 1)) if stats["count"] > 1 else None
+
+
+# Standing queries ("topics"), the article links each one has already analyzed and its per-outlet
+# sentiment statistics, in SQLite. Opens a connection per call like JobStore.
+class TopicStore:
+    def __init__(self, path: str = topic_db_path):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS topics (
+                    id TEXT PRIMARY KEY, query TEXT NOT NULL, query_key TEXT NOT NULL UNIQUE,
+                    interval_s REAL NOT NULL, next_run_at REAL NOT NULL, last_run_at REAL,
+                    query_subject TEXT, comparison TEXT, runs INTEGER NOT NULL DEFAULT 0,
+                    last_new_articles INTEGER, last_error TEXT, created_at REAL NOT NULL);
+                CREATE INDEX IF NOT EXISTS topics_next_run ON topics (next_run_at);
+                CREATE TABLE IF NOT EXISTS topic_articles (
+                    topic_id TEXT NOT NULL, link_key TEXT NOT NULL, link TEXT NOT NULL, outlet TEXT,
+                    title TEXT, sentiment REAL, counted INTEGER NOT NULL, bias_analysis TEXT,
+                    first_seen_at REAL NOT NULL, PRIMARY KEY (topic_id, link_key));
+                CREATE TABLE IF NOT EXISTS topic_outlet_stats (
+                    topic_id TEXT NOT NULL, outlet TEXT NOT NULL, count INTEGER NOT NULL, mean REAL NOT NULL,
+                    m2 REAL NOT NULL, min REAL NOT NULL, max REAL NOT NULL, PRIMARY KEY (topic_id, outlet));
+            """)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    # Adding a query that is already followed returns the existing topic.
+    def add(self, query: str, interval_s: float = topic_default_interval) -> dict:
+        topic_id = uuid.uuid4().hex
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO topics (id, query, query_key, interval_s, next_run_at, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (topic_id, query, normalize_query(query), interval_s, now, now)
+            )
+            row = conn.execute("SELECT id FROM topics WHERE query_key = ?", (normalize_query(query),)).fetchone()
+        return self.get(row["id"])
+
+    def get(self, topic_id: str) -> Optional[dict]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM topics WHERE id = ?", (topic_id,)).fetchone()
+            if row is None:
+                return None
+            (articles,) = conn.execute(
+                "SELECT COUNT(*) FROM topic_articles WHERE topic_id = ?", (topic_id,)
+            ).fetchone()
+        topic = dict(row)
+        topic.pop("query_key")
+        topic["articles"] = articles
+        topic["outlet_stats"] = self.outlet_stats(topic_id)
+        return topic
+
+    def list(self) -> List[dict]:
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT id, query, interval_s, next_run_at, last_run_at, runs, last_error FROM topics ORDER BY created_at"
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def remove(self, topic_id: str) -> bool:
+        with self._connect() as conn:
+            conn.execute("DELETE FROM topic_articles WHERE topic_id = ?", (topic_id,))
+            conn.execute("DELETE FROM topic_outlet_stats WHERE topic_id = ?", (topic_id,))
+            return conn.execute("DELETE FROM topics WHERE id = ?", (topic_id,)).rowcount > 0
+
+    # Topics whose next run is due, oldest first.
+    def due(self, now: float, limit: int) -> List[dict]:
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT id, query, query_subject, comparison, interval_s FROM topics "
+                "WHERE next_run_at <= ? ORDER BY next_run_at LIMIT ?",
+                (now, limit)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def schedule(self, topic_id: str, next_run_at: float) -> bool:
+        with self._connect() as conn:
+            return conn.execute(
+                "UPDATE topics SET next_run_at = ? WHERE id = ?", (next_run_at, topic_id)
+            ).rowcount > 0
+
+    # Canonical URLs (see dedup.canonical_url) of the articles the topic has already analyzed.
+    def known_links(self, topic_id: str) -> Set[str]:
+        with self._connect() as conn:
+            return {row[0] for row in conn.execute(
+                "SELECT link_key FROM topic_articles WHERE topic_id = ?", (topic_id,)
+            )}
+
+    def outlet_stats(self, topic_id: str) -> Dict[str, dict]:
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT outlet, count, mean, m2, min, max FROM topic_outlet_stats WHERE topic_id = ?", (topic_id,)
+            ).fetchall()
+        return {row["outlet"]: {key: row[key] for key in ("count", "mean", "m2", "min", "max")} for row in rows}
+
+    # Every counted score of the topic, timed by when the topic first saw the article.
+    def sentiment_sample(self, topic_id: str) -> SentimentSample:
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT outlet, sentiment, first_seen_at FROM topic_articles "
+                "WHERE topic_id = ? AND counted AND sentiment IS NOT NULL", (topic_id,)
+            ).fetchall()
+        return SentimentSample([row[0] for row in rows], [row[1] for row in rows], [row[2] for row in rows])
+
+    # One finished run: the newly analyzed articles, the outlets whose statistics changed and the
+    # new comparison, written together, and the next run scheduled.
+    def record_run(
+            self,
+            topic: dict,
+            query_subject: str,
+            comparison: Optional[str],
+            articles: List[Article],
+            counted: Set[str],
+            outlet_stats: Dict[str, dict]
+    ) -> None:
+        now = time.time()
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO topic_articles (topic_id, link_key, link, outlet, title, sentiment, counted, "
+                "bias_analysis, first_seen_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [(topic["id"], canonical_url(article.link), article.link, article.outlet, article.title,
+                  article_sentiment(article), article.link in counted, json.dumps(article.bias_analysis, default=str), now)
+                 for article in articles]
+            )
+            conn.executemany(
+                "INSERT OR REPLACE INTO topic_outlet_stats (topic_id, outlet, count, mean, m2, min, max) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(topic["id"], outlet, s["count"], s["mean"], s["m2"], s["min"], s["max"])
+                 for outlet, s in outlet_stats.items()]
+            )
+            conn.execute(
+                "UPDATE topics SET query_subject = ?, comparison = COALESCE(?, comparison), runs = runs + 1, "
+                "last_run_at = ?, next_run_at = ?, last_new_articles = ?, last_error = NULL WHERE id = ?",
+                (query_subject, comparison, now, now + topic["interval_s"], len(articles), topic["id"])
+            )
+
+    def record_failure(self, topic: dict, error: str) -> None:
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE topics SET last_error = ?, last_run_at = ?, next_run_at = ? WHERE id = ?",
+                (error, now, now + topic["interval_s"], topic["id"])
+            )
+
+
+def build_comparison_update_prompt(
+        user_query_subject: str,
+        previous_comparison: str,
+        outlet_stats: Dict[str, dict],
+        new_by_source: Dict[str, List[Article]],
+        statistics: Optional[str] = None
+) -> str:
+    prompt = f"""
+    USER QUERY SUBJECT: {user_query_subject}
+
+    ======
+    CURRENT COMPARISON:
+    {previous_comparison}
+
+    ======
+    SENTIMENT BY OUTLET (all articles so far):
+    """
+    if statistics is not None:
+        prompt += f"\n{statistics}"
+    else:
+        for outlet, stats in sorted(outlet_stats.items()):
+            stddev = sentiment_stddev(stats)
+            prompt += (f"\n# {outlet}: {stats['count']} articles, mean {stats['mean']:.2f}, "
+                       f"std {'n/a' if stddev is None else format(stddev, '.2f')}, "
+                       f"range {stats['min']:.2f} to {stats['max']:.2f}")
+    prompt += "\n\n    ======\n    NEW ARTICLES:\n"
+    for agency, articles in new_by_source.items():
+        prompt += f"\n# {agency}\n"
+        for article in articles:
+            prompt += f"{article.bias_analysis}\n"
+    return prompt
+
+
+# One incremental run of a standing query: search, then scrape and analyze only the results the
+# topic hasn't analyzed before, fold their sentiment into the per-outlet statistics and revise the
+# comparison (the first run writes it from scratch; a run with nothing new makes no LLM calls).
+def run_topic_update(
+        topic: dict,
+        store: TopicStore,
+        scrape_workers: int = scrape_max_workers,
+        llm_workers: int = bias_analysis_max_workers,
+        batched: bool = bias_analysis_batched
+) -> dict:
+    from burr.core import State
+
+    from burr_model import serp_google_search, set_serp_params, subject_extraction, user_entry_point
+    from dedup import analyze_articles_deduplicated
+    from utils import (analyze_articles_bias_batched, analyze_articles_bias_concurrently, bias_comparison,
+                       call_groq, group_sources, scrape_article, scrape_articles_concurrently)
+
+    state = set_serp_params(user_entry_point(State({}), query=topic["query"]))
+    if topic.get("query_subject"):
+        subject = topic["query_subject"]
+    else:
+        subject = run_timed("subject_extraction", subject_extraction, state)["query_subject"]
+    state = run_timed("serp_google_search", serp_google_search, state)
+
+    known = store.known_links(topic["id"])
+    new_articles = [article for article in state["news_results"] if canonical_url(article.link) not in known]
+    if new_articles:
+        run_timed("scrape_article_corpus", scrape_articles_concurrently, new_articles,
+                   scrape_fn=scrape_article, max_workers=scrape_workers)
+        run_timed("bias_analysis_all_articles", analyze_articles_deduplicated, subject, new_articles,
+                   analyze=analyze_articles_bias_batched if batched else analyze_articles_bias_concurrently,
+                   max_workers=llm_workers)
+
+    # Failed scrapes and analyses aren't recorded, so the next run retries them. Near-duplicates
+    # are remembered but don't count towards the statistics a second time; neither do analyses
+    # reused from an article this topic already counted (reuses from other queries are new to it).
+    analyzed = [article for article in new_articles if article.bias_analysis is not None]
+    fresh = [article for article in analyzed
+             if article.duplicate_of is None
+             and (article.bias_analysis_stats or {}).get("reused_from") not in known]
+    outlet_stats = store.outlet_stats(topic["id"])
+    changed = {}
+    for article in fresh:
+        sentiment = article_sentiment(article)
+        if sentiment is not None:
+            outlet = article.outlet or article.source
+            changed[outlet] = outlet_stats[outlet] = add_sentiment(outlet_stats.get(outlet), sentiment)
+
+    comparison = None
+    if fresh and not topic.get("comparison"):
+        comparison = run_timed("bias_comparison", bias_comparison, subject, group_sources(analyzed))
+    elif fresh:
+        # With NumPy the statistics come from every stored score, so they also show trends over time
+        statistics = None
+        if sentiment_stats_available():
+            sample = store.sentiment_sample(topic["id"]).concat(SentimentSample.from_articles(fresh, observed_at=time.time()))
+            statistics = format_sentiment_statistics(
+                sample, {article.outlet or article.source: article.political_bias for article in fresh}
+            )
+        comparison = run_timed("bias_comparison", call_groq,
+                                system_prompt=update_comparison_system_prompt,
+                                user_prompt=build_comparison_update_prompt(
+                                    subject, topic["comparison"], outlet_stats, group_sources(fresh), statistics),
+                                task="bias_comparison")
+
+    store.record_run(topic, subject, comparison, analyzed, {article.link for article in fresh}, changed)
+    return {
+        "topic_id": topic["id"],
+        "results": len(state["news_results"]),
+        "new_articles": len(new_articles),
+        "analyzed": len(analyzed),
+        "comparison_updated": comparison is not None,
+    }
+
+
+# Runs due topics on a bounded thread pool: every poll picks topics whose next run is due and
+# that aren't already running, keeping at most max_concurrent runs in flight.
+class TopicScheduler:
+    def __init__(
+            self,
+            store: Optional[TopicStore] = None,
+            max_concurrent: int = topic_max_concurrent_runs,
+            poll_interval: float = topic_poll_interval,
+            runner: Callable[[dict, TopicStore], dict] = run_topic_update,
+            clock: Callable[[], float] = time.time
+    ):
+        self.store = store or TopicStore()
+        self.max_concurrent = max_concurrent
+        self.poll_interval = poll_interval
+        self._runner = runner
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._running: Dict[str, Future] = {}
+        self._pool = ThreadPoolExecutor(max_workers=max_concurrent, thread_name_prefix="topic")
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # Start runs for due topics while there are free slots; returns the ids started.
+    def run_due(self) -> List[str]:
+        with self._lock:
+            free = self.max_concurrent - len(self._running)
+            if free <= 0:
+                return []
+            due = self.store.due(self._clock(), limit=free + len(self._running))
+            started = []
+            for topic in due:
+                if topic["id"] in self._running or len(started) >= free:
+                    continue
+                future = self._pool.submit(self._run, topic)
+                self._running[topic["id"]] = future
+                started.append(topic["id"])
+        for topic_id in started:
+            self._running[topic_id].add_done_callback(lambda f, topic_id=topic_id: self._finished(topic_id))
+        return started
+
+    def _run(self, topic: dict) -> Optional[dict]:
+        try:
+            return self._runner(topic, self.store)
+        except Exception as e:
+            self.store.record_failure(topic, repr(e))
+            return None
+
+    def _finished(self, topic_id: str) -> None:
+        with self._lock:
+            self._running.pop(topic_id, None)
+
+    def running(self) -> List[str]:
+        with self._lock:
+            return list(self._running)
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="topic-scheduler", daemon=True)
+        self._thread.start()
+
+    def _loop(self) -> None:
+        while True:
+            self.run_due()
+            if self._stop.wait(self.poll_interval):
+                return
+
+    def stop(self, wait: bool = True) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self._pool.shutdown(wait=wait, cancel_futures=not wait)
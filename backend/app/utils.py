@@ -1,20 +1,37 @@
 import os
 import requests
 import json
-
-from typing import Optional, List
-from groq import Groq
-from constants import (system_prompt_default, fox_exclude_tags, npr_exclude_tags, include_tags, 
-                       summarize_article_system_prompt, bias_system_prompt, compare_biases_system_prompt)
-from models import NewsExtractSchema
+import time
+
+from typing import Any, Callable, Dict, Generator, Iterator, Optional, List, Tuple
+from articles import Article
+from cache import get_scrape_cache, scrape_cache_key, get_llm_cache, llm_cache_key
+from concurrency import HostThrottle, map_concurrently
+from content_prep import count_tokens, prepare_article_content
+from extraction import extract_article, fetch_article_html, local_extraction_available
+from http_client import default_timeout, get_session
+from llm_gateway import GroqProvider, get_groq_client, get_llm_gateway
+from constants import (system_prompt_default, default_exclude_tags, include_tags, unknown_outlet_bias,
+                       summarize_article_system_prompt, bias_system_prompt, compare_biases_system_prompt,
+                       firecrawl_api_url, scrape_max_workers, scrape_per_host_concurrency,
+                       scrape_per_host_rate, scrape_timeout, bias_analysis_max_workers, bias_analysis_max_tries,
+                       article_token_budget, condense_chunk_system_prompt, bias_analysis_batched,
+                       bias_batch_token_budget, bias_batch_max_articles, batch_bias_system_prompt, serpapi_url,
+                       local_extraction_enabled, comparison_digest_enabled, compare_digest_system_prompt)
+from outlets import OutletRegistry, get_outlet_registry
+from schemas import NewsExtractSchema
+from sentiment_stats import build_comparison_digest, sentiment_stats_available
+from rate_limit import (THROTTLE_STATUS_CODES, RateLimitedError, RetriesExhaustedError, get_limiter,
+                        parse_retry_after)
+from telemetry import BIAS_ANALYSIS_INVALID, LOCAL_EXTRACTIONS, SCRAPE_ERRORS, time_external_call
 
 def group_sources(
-        serp_returned_articles: dict
-) -> dict:
-    # Group results by news source
+        serp_returned_articles: List[Article]
+) -> Dict[str, List[Article]]:
+    # Group results by news outlet (SERP's source name when the outlet isn't in the registry)
     news_by_source = {}
     for article in serp_returned_articles:
-        source = article.get("source")
+        source = article.outlet or article.source
         if source not in news_by_source:
             news_by_source[source] = []
         news_by_source[source].append(article)
@@ -22,42 +39,161 @@ def group_sources(
     return news_by_source
 
 
+# Bias rating and canonical outlet name for each SERP article, looked up in the outlet registry
+# by link domain, then by source name. Sources that aren't in the registry get unknown_outlet_bias.
 def assign_article_bias(
-        news_bias_ratings: dict,
-        articles: dict
-) -> dict:
+        articles: List[Article],
+        registry: Optional[OutletRegistry] = None
+) -> List[Article]:
+    if registry is None:
+        registry = get_outlet_registry()
     for article in articles:
-        articles[article['position']-1]["political_bias"] = news_bias_ratings[article['source']]
+        outlet = registry.for_article(article)
+        article.political_bias = outlet.bias if outlet is not None else unknown_outlet_bias
+        article.outlet = outlet.name if outlet is not None else article.source
 
     return articles
 
+
+# Drops SERP articles from outlets disabled in the registry; unknown outlets are kept.
+def drop_disabled_outlets(
+        articles: List[Article],
+        registry: Optional[OutletRegistry] = None
+) -> List[Article]:
+    if registry is None:
+        registry = get_outlet_registry()
+    kept = []
+    for article in articles:
+        outlet = registry.for_article(article)
+        if outlet is None or outlet.enabled:
+            kept.append(article)
+    return kept
+
 ## Groq Function
 
-client = Groq(
-    api_key=os.environ['GROQ_API_KEY']
-)
+# `client` used to be a module global; it still resolves, lazily.
+def __getattr__(name: str):
+    if name == "client":
+        return get_groq_client()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def _chat_messages(system_prompt: Optional[str], user_prompt: str) -> List[dict]:
+    return [
+        {
+            "role": "system",
+            "content": system_prompt
+        },
+        {
+            "role": "user",
+            "content": user_prompt
+        },
+    ]
 
+
+# Requests go through the LLM gateway, which picks the provider and model from the task's route
+# (see llm_routes) and hedges or fails over slow and failing ones. Passing `model` pins the call
+# to that Groq model instead.
 def call_groq(
         user_prompt: str, 
         system_prompt: Optional[str]=system_prompt_default, 
-        model: Optional[str]="llama-3.1-8b-instant",
+        model: Optional[str]=None,
+        use_cache: bool = True,
+        json_mode: bool = False,
+        validate: Optional[Callable[[str], bool]] = None,
+        task: str = "default",
         ) -> str:
+
+    # Identical (model, system prompt, user prompt) requests are answered from the cache.
+    # When a validator is given, only responses that pass it are cached. Answers are cached under
+    # the model that gave them, so a failover or hedge answer never stands in for the task's primary.
+    gateway = get_llm_gateway()
+    llm_cache = get_llm_cache() if use_cache else None
+    if llm_cache is not None:
+        cached = llm_cache.get(llm_cache_key(model or gateway.primary(task).label, system_prompt, user_prompt,
+                                             json_mode=json_mode))
+        if cached is not None:
+            return cached
     
-    chat_completion = client.chat.completions.create(
-        messages=[
-            {
-                "role": "system",
-                "content": system_prompt
-            },
-            {
-                "role": "user",
-                "content": user_prompt
-            },
-        ],
-        model=model,
-    )
+    # JSON mode constrains the model to emit a syntactically valid JSON object
+    extra_options = {"response_format": {"type": "json_object"}} if json_mode else {}
+    messages = _chat_messages(system_prompt, user_prompt)
+    if model is not None:
+        content, answered_by = GroqProvider().complete(model, messages, **extra_options), model
+    else:
+        content, target = gateway.complete(task, messages, **extra_options)
+        answered_by = target.label
+
+    if llm_cache is not None and content is not None and (validate is None or validate(content)):
+        llm_cache.set(llm_cache_key(answered_by, system_prompt, user_prompt, json_mode=json_mode), content)
+
+    return content
+
+# Token-streamed completion: yields content deltas as they are produced. A cached
+# response is replayed as a single chunk, and the full text is cached once the stream ends,
+# under the model that gave it (as in call_groq).
+def stream_groq(
+        user_prompt: str,
+        system_prompt: Optional[str]=system_prompt_default,
+        model: Optional[str]=None,
+        use_cache: bool = True,
+        task: str = "default",
+        ) -> Iterator[str]:
+    gateway = get_llm_gateway()
+    llm_cache = get_llm_cache() if use_cache else None
+    if llm_cache is not None:
+        cached = llm_cache.get(llm_cache_key(model or gateway.primary(task).label, system_prompt, user_prompt,
+                                             json_mode=False))
+        if cached is not None:
+            yield cached
+            return
+
+    messages = _chat_messages(system_prompt, user_prompt)
+    chunks = []
+    if model is not None:
+        yield from _recorded(GroqProvider().stream(model, messages), chunks)
+        answered_by = model
+    else:
+        answered_by = (yield from _recorded(gateway.stream(task, messages), chunks)).label
+
+    if llm_cache is not None and chunks:
+        llm_cache.set(llm_cache_key(answered_by, system_prompt, user_prompt, json_mode=False), "".join(chunks))
 
-    return chat_completion.choices[0].message.content
+
+# Pass a stream's deltas through while keeping them in `chunks`; returns the stream's return value.
+def _recorded(stream: Iterator[str], chunks: List[str]) -> Generator[str, None, Any]:
+    while True:
+        try:
+            delta = next(stream)
+        except StopIteration as stop:
+            return stop.value
+        chunks.append(delta)
+        yield delta
+
+
+# Pull the first JSON object out of an LLM response, tolerating code fences,
+# leading/trailing prose and raw newlines inside strings. Returns None if there isn't one.
+def extract_json_object(text: Optional[str]) -> Optional[dict]:
+    if not text:
+        return None
+    decoder = json.JSONDecoder(strict=False)
+    try:
+        parsed = decoder.decode(text.strip())
+        if isinstance(parsed, dict):
+            return parsed
+    except json.JSONDecodeError:
+        pass
+
+    start = text.find("{")
+    while start != -1:
+        try:
+            parsed, _ = decoder.raw_decode(text, start)
+            if isinstance(parsed, dict):
+                return parsed
+        except json.JSONDecodeError:
+            pass
+        start = text.find("{", start + 1)
+    return None
 
 ## Firecrawl & News Related Functions
  
@@ -68,14 +204,116 @@ def subject_extraction(
     subject_extraction_system_prompt = "You will be given a question regarding a subject in the news. Extract the subject from the question."
     subject = call_groq(
         user_prompt=question,
-        system_prompt=subject_extraction_system_prompt)
+        system_prompt=subject_extraction_system_prompt,
+        task="subject_extraction")
     
     return subject
 
 
-def scrape_article(url: str, exclude_tags: List, include_tags: List):
-    # API endpoint
-    api_url = "https://api.firecrawl.dev/v1/scrape"
+def _response_outcome(response: requests.Response) -> str:
+    if response.status_code in THROTTLE_STATUS_CODES:
+        return "throttled"
+    return "ok" if response.ok else "error"
+
+
+# POST to Firecrawl through the shared limiter, retrying throttled (429/503) responses.
+def post_firecrawl(
+        api_url: str,
+        payload: dict,
+        headers: dict,
+        timeout: Optional[float] = scrape_timeout
+) -> requests.Response:
+    def post() -> requests.Response:
+        with time_external_call("firecrawl") as timer:
+            response = get_session().post(api_url, json=payload, headers=headers, timeout=default_timeout(timeout))
+            timer.set_outcome(_response_outcome(response))
+        if response.status_code in THROTTLE_STATUS_CODES:
+            raise RateLimitedError(response.text, parse_retry_after(response.headers.get("Retry-After")))
+        return response
+
+    return get_limiter("firecrawl").call(post)
+
+
+# Google News search through SerpAPI's JSON endpoint on the pooled session (the same request
+# the serpapi package's GoogleSearch(...).get_dict() makes, minus a fresh connection per call).
+def serp_search(
+        params: dict,
+        timeout: Optional[float] = None
+) -> dict:
+    def get() -> dict:
+        with time_external_call("serpapi") as timer:
+            response = get_session().get(
+                serpapi_url,
+                params={**params, "output": "json"},
+                timeout=default_timeout(timeout)
+            )
+            timer.set_outcome(_response_outcome(response))
+        if response.status_code in THROTTLE_STATUS_CODES:
+            raise RateLimitedError(response.text, parse_retry_after(response.headers.get("Retry-After")))
+        return response.json()
+
+    return get_limiter("serpapi").call(get)
+
+
+# Fetch and extract an article locally with its outlet's selector rules (see extraction), or parse
+# `html` when the caller already has it. Returns a Firecrawl-shaped response, or None when the outlet
+# has no rules, selectolax isn't installed, the fetch fails or the result doesn't look like an article.
+def scrape_article_locally(
+        url: str,
+        exclude_tags: List,
+        include_tags: List,
+        timeout: Optional[float] = scrape_timeout,
+        html: Optional[str] = None
+) -> Optional[dict]:
+    if not local_extraction_enabled or not local_extraction_available():
+        return None
+    outlet = get_outlet_registry().for_url(url)
+    if outlet is None or not outlet.has_extraction_rules:
+        return None
+
+    scrape_cache = get_scrape_cache()
+    cache_key = scrape_cache_key(url, {
+        "extractor": "local", "title": list(outlet.title_selectors), "content": list(outlet.content_selectors),
+        "excludeTags": exclude_tags, "includeTags": include_tags
+    })
+    if scrape_cache is not None:
+        cached = scrape_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+    host = HostThrottle.host_of(url)
+    if html is None:
+        try:
+            html = fetch_article_html(url, timeout)
+        except requests.RequestException:
+            LOCAL_EXTRACTIONS.inc(host=host, outcome="fetch_error")
+            return None
+    extracted = extract_article(html, outlet.title_selectors, outlet.content_selectors, exclude_tags, include_tags)
+    if extracted is None:
+        LOCAL_EXTRACTIONS.inc(host=host, outcome="fallback")
+        return None
+
+    LOCAL_EXTRACTIONS.inc(host=host, outcome="ok")
+    scraped = {"success": True, "data": {"json": extracted, "metadata": {"sourceURL": url, "extractor": "local"}}}
+    if scrape_cache is not None:
+        scrape_cache.set(cache_key, scraped)
+    return scraped
+
+
+def scrape_article(
+        url: str, 
+        exclude_tags: List, 
+        include_tags: List,
+        timeout: Optional[float] = scrape_timeout,
+        html: Optional[str] = None
+    ):
+    # Known outlets are extracted locally; Firecrawl's LLM extraction is the fallback
+    scraped = scrape_article_locally(url, exclude_tags, include_tags, timeout, html=html)
+    if scraped is not None:
+        return scraped
+
+    # API endpoint (overridable via FIRECRAWL_API_URL, e.g. to point at a local stub)
+    api_url = firecrawl_api_url
     
     # Request payload using Firecrawl's automatic content extraction
     payload = {
@@ -97,72 +335,180 @@ def scrape_article(url: str, exclude_tags: List, include_tags: List):
         "Content-Type": "application/json"
     }
     
+    # Serve repeat scrapes of the same URL + extraction config from the on-disk cache
+    scrape_cache = get_scrape_cache()
+    cache_key = scrape_cache_key(url, payload)
+    if scrape_cache is not None:
+        cached = scrape_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
     # Make the request
-    response = requests.post(api_url, json=payload, headers=headers)
+    try:
+        response = post_firecrawl(api_url, payload, headers, timeout)
+    except (requests.RequestException, RetriesExhaustedError) as e:
+        return {"error": str(e)}
     
     # Parse response
     if response.status_code == 200:
-        return response.json()
+        scraped = response.json()
+        if scrape_cache is not None:
+            scrape_cache.set(cache_key, scraped)
+        return scraped
     else:
         return {"error": response.text}
     
 
-def scrape_article_corpus(
-        articles: List[dict]
+# Scrape one SERP article with the outlet's selector rules, respecting the per-host throttle if given.
+def scrape_single_article(
+        article: Article,
+        scrape_fn: Callable[..., dict] = scrape_article,
+        throttle: Optional[HostThrottle] = None,
+        timeout: Optional[float] = scrape_timeout
 ) -> dict:
-        for article in articles:
+    outlet = get_outlet_registry().for_article(article)
+    exclude_tags = list(outlet.exclude_tags) if outlet is not None else default_exclude_tags
+    article_include_tags = list(outlet.include_tags) if outlet is not None else include_tags
+
+    def scrape() -> dict:
+        return scrape_fn(
+            article.link,
+            exclude_tags=exclude_tags,
+            include_tags=article_include_tags,
+            timeout=timeout
+        )
 
-                if article['source'] == 'Fox News':
-                        articles[article['position']-1]['scraped_article'] = scrape_article(
-                        article['link'], 
-                        exclude_tags=fox_exclude_tags,
-                        include_tags=include_tags
-                        )
-                else:
-                        articles[article['position']-1]['scraped_article'] = scrape_article(
-                        article['link'],
-                        exclude_tags=npr_exclude_tags,
-                        include_tags=include_tags
-                        )
+    scraped = throttle.run(article.link, scrape) if throttle is not None else scrape()
+    if "error" in scraped:
+        SCRAPE_ERRORS.inc(host=HostThrottle.host_of(article.link))
+    return scraped
+
+
+# Scrape every article on a bounded thread pool. Each result is stored (by reference) on
+# the article record it came from, so ordering/positions of the SERP results don't matter.
+def scrape_articles_concurrently(
+        articles: List[Article],
+        scrape_fn: Callable[..., dict],
+        max_workers: int = scrape_max_workers,
+        per_host_concurrency: int = scrape_per_host_concurrency,
+        per_host_rate: Optional[float] = scrape_per_host_rate,
+        timeout: Optional[float] = scrape_timeout
+) -> List[Article]:
+    throttle = HostThrottle(max_concurrent=per_host_concurrency, rate_per_sec=per_host_rate,
+                            host_limits=get_outlet_registry().host_limits)
+
+    scraped_articles = map_concurrently(
+        lambda article: scrape_single_article(article, scrape_fn=scrape_fn, throttle=throttle, timeout=timeout),
+        articles,
+        max_workers=max_workers
+    )
+    for article, scraped_article in zip(articles, scraped_articles):
+        article.scraped_article = scraped_article
+
+    return articles
+
+
+def scrape_article_corpus(
+        articles: List[Article],
+        max_workers: int = scrape_max_workers
+) -> List[Article]:
+        return scrape_articles_concurrently(articles, scrape_fn=scrape_article, max_workers=max_workers)
+
+
+# Cleaned, budgeted title/body of a scraped article (see content_prep), computed once and kept
+# in the payload store as the article's prepared_content. None if the scrape didn't extract anything.
+def get_prepared_content(
+        article: Article,
+        token_budget: int = article_token_budget
+) -> Optional[dict]:
+    prepared = article.prepared_content
+    if prepared is None:
+        scraped_article = article.scraped_article or {}
+        extracted = (scraped_article.get('data') or {}).get('json')
+        if not extracted:
+            return None
+        prepared = prepare_article_content(
+            extracted.get('main_article_title') or "",
+            extracted.get('main_article_content') or "",
+            token_budget=token_budget
+        )
+        # What the summarizer used to send: the whole raw Firecrawl payload
+        prepared['raw_payload_tokens'] = count_tokens(str(scraped_article))
+        article.prepared_content = prepared
+    return prepared
+
+
+# Map step for articles over the token budget: condense each chunk in parallel, then the
+# joined notes stand in for the article body. Short articles pass through unchanged.
+def condense_prepared_content(
+        prepared: dict,
+        purpose: str,
+        max_workers: int = bias_analysis_max_workers
+) -> str:
+    chunks = prepared['chunks']
+    if len(chunks) <= 1:
+        return prepared['content']
+
+    def condense(indexed_chunk: Tuple[int, str]) -> str:
+        index, chunk = indexed_chunk
+        return call_groq(
+            user_prompt=f"PURPOSE: {purpose}\nARTICLE TITLE: {prepared['title']}\nSECTION {index + 1} OF {len(chunks)}:\n{chunk}",
+            system_prompt=condense_chunk_system_prompt,
+            task="condense"
+        )
+
+    return "\n\n".join(map_concurrently(condense, list(enumerate(chunks)), max_workers=max_workers))
 
-        return articles
+
+# Summarize one SERP article from its extracted title and body only. None if the scrape failed.
+def summarize_article(
+        article: Article,
+        summarize_article_system_prompt: str = summarize_article_system_prompt
+) -> Optional[str]:
+    prepared = get_prepared_content(article)
+    if prepared is None:
+        return None
+    content = condense_prepared_content(prepared, purpose="a summary of the article's main points")
+    return call_groq(
+            user_prompt=f"ARTICLE TITLE: {prepared['title']}\nARTICLE CONTENT: {content}",
+            system_prompt=summarize_article_system_prompt,
+            task="summarize",
+    )
 
 
 # This one's output isn't being used as part of the bias work. More so useful for presenting main points to the user at the end.
 def news_article_summarizer(
-        articles: List[dict],
+        articles: List[Article],
         summarize_article_system_prompt: str = summarize_article_system_prompt
-) -> dict:
+) -> List[Article]:
     for article in articles:
 
-        user_prompt = f"Article: {articles[article['position']-1]['scraped_article']}"
-        chat_completion = client.chat.completions.create(
-                messages=[
-                {
-                        "role": "system",
-                        "content": summarize_article_system_prompt
-                },
-                {
-                        "role": "user",
-                        "content": user_prompt
-                },
-                ],
-                model="llama-3.1-8b-instant",
+        article.news_analyst_response = summarize_article(
+                article,
+                summarize_article_system_prompt=summarize_article_system_prompt
         )
 
-        articles[article['position']-1]['news_analyst_response'] = chat_completion.choices[0].message.content
+    return articles
 
 
-# Determine bias of one article
-def single_article_bias_analysis(
+def is_valid_bias_analysis(analysis: Optional[dict]) -> bool:
+    if not analysis or "bias_shown" not in analysis:
+        return False
+    try:
+        float(analysis["sentiment_analysis"])
+    except (KeyError, TypeError, ValueError):
+        return False
+    return True
+
+
+def _bias_user_prompt(
     user_query_subject: str,
     media_publisher: str,
     media_bias_leaning: str,
     article_title: str,
     article_content: str
-    ) -> dict:
-
-    bias_user_prompt = f"""
+    ) -> str:
+    return f"""
     USER QUERY SUBJECT: {user_query_subject}
     NEWS PUBLISHER: {media_publisher}
     MEDIA BIAS LEANING: {media_bias_leaning}
@@ -172,43 +518,259 @@ def single_article_bias_analysis(
     ARTICLE TITLE: {article_title}
     ARTICLE CONTENT: {article_content}
     """
-    tries = 0
-    while tries <= 5:
-        tries += 1
-        groq_bias_analysis = call_groq(
-            system_prompt=bias_system_prompt,
-            user_prompt=bias_user_prompt
-        )
 
-        print(f"groq bias analysis: {groq_bias_analysis}")
-        
+
+# Determine bias of one article, returning the analysis (None if every attempt failed)
+# along with how many requests it took and how long they took.
+# Requests use JSON mode, and malformed output is first repaired locally; only if that
+# fails is another request sent. A request that errors (retries exhausted, every gateway target
+# down, Groq's json_validate_failed 400, ...) counts as a failed try rather than raising, so one
+# article can't sink the others analyzed alongside it.
+def single_article_bias_analysis_with_stats(
+    user_query_subject: str,
+    media_publisher: str,
+    media_bias_leaning: str,
+    article_title: str,
+    article_content: str,
+    max_tries: int = bias_analysis_max_tries
+    ) -> Tuple[Optional[dict], dict]:
+
+    bias_user_prompt = _bias_user_prompt(
+        user_query_subject, media_publisher, media_bias_leaning, article_title, article_content
+    )
+    started = time.perf_counter()
+    stats = {"tries": 0, "repaired": False, "elapsed_s": 0.0}
+    analysis = None
+    while stats["tries"] < max_tries:
+        stats["tries"] += 1
         try:
-            groq_output_dict = json.loads(groq_bias_analysis.replace('\n', ''))
-            return groq_output_dict
-        except json.JSONDecodeError as e:
-            print(f"{json.JSONDecodeError}. Retrying...")
+            groq_bias_analysis = call_groq(
+                system_prompt=bias_system_prompt,
+                user_prompt=bias_user_prompt,
+                json_mode=True,
+                validate=lambda content: is_valid_bias_analysis(extract_json_object(content)),
+                task="bias_analysis"
+            )
+        except Exception as e:
+            stats["errors"] = stats.get("errors", 0) + 1
+            stats["last_error"] = f"{type(e).__name__}: {e}"[:300]
+            continue
 
+        try:
+            analysis = json.loads(groq_bias_analysis)
+        except (json.JSONDecodeError, TypeError):
+            analysis = extract_json_object(groq_bias_analysis)
+            stats["repaired"] = analysis is not None
 
-# determine bias of a list of articles
-def bias_analysis_all_articles(
+        if is_valid_bias_analysis(analysis):
+            break
+        BIAS_ANALYSIS_INVALID.inc(outlet=media_publisher)
+        analysis = None
+
+    stats["elapsed_s"] = round(time.perf_counter() - started, 3)
+    return analysis, stats
+
+
+def single_article_bias_analysis(
+    user_query_subject: str,
+    media_publisher: str,
+    media_bias_leaning: str,
+    article_title: str,
+    article_content: str
+    ) -> dict:
+    analysis, _ = single_article_bias_analysis_with_stats(
+        user_query_subject, media_publisher, media_bias_leaning, article_title, article_content
+    )
+    return analysis
+
+
+# Bias analysis (and stats) for one scraped SERP article.
+def analyze_article_bias(
         user_query_subject: str,
-        articles: List[dict]
-) -> dict:
+        article: Article
+) -> Tuple[Optional[dict], dict]:
+    started = time.perf_counter()
+    prepared = get_prepared_content(article)
+    try:
+        content = condense_prepared_content(prepared, purpose=f"bias analysis regarding: {user_query_subject}")
+    except Exception as e:
+        # Same as a failed analysis: the article is left without one instead of failing the batch
+        return None, {"tries": 0, "errors": 1, "last_error": f"{type(e).__name__}: {e}"[:300],
+                      "total_elapsed_s": round(time.perf_counter() - started, 3)}
+    analysis, stats = single_article_bias_analysis_with_stats(
+        user_query_subject=user_query_subject,
+        media_publisher=article.source,
+        media_bias_leaning=article.political_bias,
+        article_title=prepared['title'],
+        article_content=content
+    )
+    stats.update(
+        chunks=len(prepared['chunks']),
+        tokens_original=prepared['original_tokens'],
+        tokens_sent=count_tokens(prepared['title']) + count_tokens(content),
+        tokens_saved=max(0, prepared['original_tokens'] - count_tokens(prepared['title']) - count_tokens(content)),
+        total_elapsed_s=round(time.perf_counter() - started, 3),
+    )
+    return analysis, stats
+
+
+# Run the bias analysis for every successfully scraped article on a bounded thread pool.
+# Writes 'bias_analysis' and 'bias_analysis_stats' (tries, repaired, elapsed_s, chunks, token
+# counts before/after content preparation, total_elapsed_s) onto each article.
+def analyze_articles_bias_concurrently(
+        user_query_subject: str,
+        articles: List[Article],
+        max_workers: int = bias_analysis_max_workers
+) -> List[Article]:
+    scraped = [article for article in articles if get_prepared_content(article) is not None]
+
+    results = map_concurrently(
+        lambda article: analyze_article_bias(user_query_subject, article),
+        scraped,
+        max_workers=max_workers
+    )
+    for article, (analysis, stats) in zip(scraped, results):
+        article.bias_analysis = analysis
+        article.bias_analysis_stats = stats
+
+    return articles
+
+
+# Group short (single-chunk) articles by outlet and pack them greedily into batches that stay
+# under the token budget. Long articles are left out and go through the per-article path.
+def pack_bias_batches(
+        articles: List[Article],
+        token_budget: int = bias_batch_token_budget,
+        max_articles: int = bias_batch_max_articles
+) -> Tuple[List[List[Article]], List[Article]]:
+    by_source = {}
+    singles = []
     for article in articles:
-        if article['scraped_article'].get('data'):
-                article['bias_analysis'] = single_article_bias_analysis(
-                user_query_subject=user_query_subject,
-                media_publisher=article['source'],
-                media_bias_leaning=article['political_bias'],
-                article_title=article['scraped_article']['data']['json']['main_article_title'],
-                article_content=article['scraped_article']['data']['json']['main_article_content']
-                )
+        prepared = get_prepared_content(article)
+        if len(prepared['chunks']) > 1 or prepared['prepared_tokens'] > token_budget:
+            singles.append(article)
         else:
+            by_source.setdefault(article.source, []).append(article)
+
+    batches = []
+    for source_articles in by_source.values():
+        batch, batch_tokens = [], 0
+        for article in source_articles:
+            tokens = get_prepared_content(article)['prepared_tokens']
+            if batch and (batch_tokens + tokens > token_budget or len(batch) >= max_articles):
+                batches.append(batch)
+                batch, batch_tokens = [], 0
+            batch.append(article)
+            batch_tokens += tokens
+        if batch:
+            batches.append(batch)
+
+    # A batch of one saves nothing over the regular prompt
+    singles.extend(batch[0] for batch in batches if len(batch) == 1)
+    return [batch for batch in batches if len(batch) > 1], singles
+
+
+# One request for several articles from the same outlet. Returns the valid analyses by
+# position in the batch; articles missing from the response or failing validation are absent.
+def batch_article_bias_analysis(
+        user_query_subject: str,
+        batch: List[Article]
+) -> Dict[int, dict]:
+    batch_user_prompt = f"""
+    USER QUERY SUBJECT: {user_query_subject}
+    NEWS PUBLISHER: {batch[0].source}
+    MEDIA BIAS LEANING: {batch[0].political_bias}
+    """
+    for article_id, article in enumerate(batch):
+        prepared = get_prepared_content(article)
+        batch_user_prompt += f"""
+    ======
+
+    ARTICLE ID: {article_id}
+    ARTICLE TITLE: {prepared['title']}
+    ARTICLE CONTENT: {prepared['content']}
+    """
+
+    response = extract_json_object(call_groq(
+        system_prompt=batch_bias_system_prompt,
+        user_prompt=batch_user_prompt,
+        json_mode=True,
+        task="bias_analysis"
+    ))
+    analyses = response.get("analyses") if response else None
+    if not isinstance(analyses, list):
+        return {}
+
+    results = {}
+    for analysis in analyses:
+        if not isinstance(analysis, dict):
+            continue
+        article_id = analysis.pop("article_id", None)
+        if isinstance(article_id, int) and 0 <= article_id < len(batch) and is_valid_bias_analysis(analysis):
+            results[article_id] = analysis
+    return results
+
+
+# Batched variant of analyze_articles_bias_concurrently: short articles from the same outlet share
+# a request, and any article the batch response doesn't validly cover is retried on its own.
+def analyze_articles_bias_batched(
+        user_query_subject: str,
+        articles: List[Article],
+        max_workers: int = bias_analysis_max_workers
+) -> List[Article]:
+    scraped = [article for article in articles if get_prepared_content(article) is not None]
+    batches, singles = pack_bias_batches(scraped)
+
+    # A batch request that errors leaves all of its articles to the per-article fallback
+    def run_batch(batch: List[Article]) -> Tuple[Dict[int, dict], float]:
+        started = time.perf_counter()
+        try:
+            results = batch_article_bias_analysis(user_query_subject, batch)
+        except Exception:
+            results = {}
+        return results, round(time.perf_counter() - started, 3)
+
+    fallbacks = list(singles)
+    for batch, (results, elapsed) in zip(batches, map_concurrently(run_batch, batches, max_workers=max_workers)):
+        for article_id, article in enumerate(batch):
+            if article_id not in results:
+                fallbacks.append(article)
                 continue
+            prepared = get_prepared_content(article)
+            article.bias_analysis = results[article_id]
+            article.bias_analysis_stats = {
+                "tries": 1,
+                "repaired": False,
+                "elapsed_s": elapsed,
+                "batch_size": len(batch),
+                "chunks": 1,
+                "tokens_original": prepared['original_tokens'],
+                "tokens_sent": prepared['prepared_tokens'],
+                "tokens_saved": prepared['tokens_saved'],
+                "total_elapsed_s": elapsed,
+            }
+
+    analyze_articles_bias_concurrently(user_query_subject, fallbacks, max_workers=max_workers)
+    for article in fallbacks:
+        if article.bias_analysis_stats is not None:
+            article.bias_analysis_stats['batch_size'] = 1
+
+    return articles
+
+
+# determine bias of a list of articles
+def bias_analysis_all_articles(
+        user_query_subject: str,
+        articles: List[Article],
+        max_workers: int = bias_analysis_max_workers,
+        batched: bool = bias_analysis_batched
+) -> List[Article]:
+    if batched:
+        return analyze_articles_bias_batched(user_query_subject, articles, max_workers=max_workers)
+    return analyze_articles_bias_concurrently(user_query_subject, articles, max_workers=max_workers)
         
 
-# Compare the bias of different articles grouped by media source
-def bias_comparison(
+def build_bias_comparison_prompt(
         user_query_subject: str,
         news_by_source: dict
     ) -> str:
@@ -221,12 +783,44 @@ def bias_comparison(
     for agency in news_by_source:
         compare_biases_user_prompt += f"\n# {agency}\n"
         for article in news_by_source[agency]:
-            if article.get('bias_analysis') is not None:
-                compare_biases_user_prompt += f"{article['bias_analysis']}\n"
+            # Near-duplicates share their original's analysis; counting it twice would skew the comparison
+            if article.bias_analysis is not None and article.duplicate_of is None:
+                compare_biases_user_prompt += f"{article.bias_analysis}\n"
 
-    bias_comparison_output = call_groq(
-        system_prompt=compare_biases_system_prompt,
-        user_prompt=compare_biases_user_prompt
-    )
+    return compare_biases_user_prompt
+
+
+# System and user prompt for the comparison: a statistical digest whose size doesn't grow with the
+# number of articles when NumPy is available, otherwise every article's bias analysis.
+def bias_comparison_prompts(
+        user_query_subject: str,
+        news_by_source: dict
+    ) -> Tuple[str, str]:
+    if comparison_digest_enabled and sentiment_stats_available():
+        digest = build_comparison_digest(
+            user_query_subject, [article for articles in news_by_source.values() for article in articles]
+        )
+        if digest is not None:
+            return compare_digest_system_prompt, digest
+    return compare_biases_system_prompt, build_bias_comparison_prompt(user_query_subject, news_by_source)
+
+
+# Compare the bias of different articles grouped by media source
+def bias_comparison(
+        user_query_subject: str,
+        news_by_source: dict
+    ) -> str:
+
+    system_prompt, user_prompt = bias_comparison_prompts(user_query_subject, news_by_source)
+    bias_comparison_output = call_groq(system_prompt=system_prompt, user_prompt=user_prompt, task="bias_comparison")
 
     return bias_comparison_output
+
+
+# Same as bias_comparison, but yields the completion token by token.
+def stream_bias_comparison(
+        user_query_subject: str,
+        news_by_source: dict
+    ) -> Iterator[str]:
+    system_prompt, user_prompt = bias_comparison_prompts(user_query_subject, news_by_source)
+    return stream_groq(system_prompt=system_prompt, user_prompt=user_prompt, task="bias_comparison")
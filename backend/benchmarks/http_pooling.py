@@ -0,0 +1,70 @@
+"""Per-request latency against a local stub Firecrawl endpoint, with and without connection pooling.
+
+    python backend/benchmarks/http_pooling.py --requests 200 --concurrency 8
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+
+import requests
+
+from http_client import build_session
+from measure import percentile
+from stub_servers import StubServer
+
+
+def scrape_route(method, path, query, body):
+    return 200, {"success": True, "data": {"json": {"main_article_title": "Stub", "main_article_content": "Body"}}}
+
+
+def run(post, url, n_requests, concurrency):
+    payload = {"url": "https://www.npr.org/stub", "formats": ["json"]}
+
+    def one(_):
+        started = time.perf_counter()
+        response = post(url, json=payload, timeout=10)
+        response.raise_for_status()
+        return (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = list(pool.map(one, range(n_requests)))
+    elapsed = time.perf_counter() - started
+    return {
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p95_ms": round(percentile(latencies, 95), 3),
+        "mean_ms": round(sum(latencies) / len(latencies), 3),
+        "requests_per_s": round(n_requests / elapsed, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="simulated server processing time")
+    args = parser.parse_args()
+
+    results = {}
+    with StubServer({"/v1/scrape": scrape_route}, latency_s=args.latency_ms / 1000) as stub:
+        url = f"{stub.url}/v1/scrape"
+        opened = stub.connections_opened
+        results["unpooled"] = run(requests.post, url, args.requests, args.concurrency)
+        results["unpooled"]["connections"] = stub.connections_opened - opened
+
+        session = build_session(pool_maxsize=args.concurrency)
+        opened = stub.connections_opened
+        results["pooled"] = run(session.post, url, args.requests, args.concurrency)
+        results["pooled"]["connections"] = stub.connections_opened - opened
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Cold import time of the backend modules, each measured in a fresh interpreter.
+
+    python backend/benchmarks/import_time.py --runs 10
+    python backend/benchmarks/import_time.py --app-dir /path/to/older/checkout/backend/app   # compare
+
+Reports the median wall time of `python -c "import <module>"` minus an empty interpreter's
+start-up, and the cumulative import time Python's -X importtime attributes to the module.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+DEFAULT_APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app")
+DEFAULT_MODULES = ["database", "utils", "burr_model", "main"]
+
+
+def run_python(code: str, app_dir: str, importtime: bool = False) -> subprocess.CompletedProcess:
+    args = [sys.executable] + (["-X", "importtime"] if importtime else []) + ["-c", code]
+    # A dummy key so trees that still build the Groq client at import time can be measured too
+    env = dict(os.environ, GROQ_API_KEY=os.environ.get("GROQ_API_KEY", "benchmark"))
+    return subprocess.run(args, cwd=app_dir, env=env, capture_output=True, text=True, check=True)
+
+
+def wall_time(code: str, app_dir: str) -> float:
+    started = time.perf_counter()
+    run_python(code, app_dir)
+    return time.perf_counter() - started
+
+
+# Cumulative microseconds -X importtime reports for the top-level module.
+def cumulative_import_us(module: str, app_dir: str) -> int:
+    stderr = run_python(f"import {module}", app_dir, importtime=True).stderr
+    for line in reversed(stderr.splitlines()):
+        fields = [field.strip() for field in line.split("|")]
+        if len(fields) == 3 and fields[2] == module:
+            return int(fields[1])
+    raise RuntimeError(f"no importtime entry for {module}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--app-dir", default=DEFAULT_APP_DIR)
+    parser.add_argument("--modules", default=",".join(DEFAULT_MODULES))
+    parser.add_argument("--runs", type=int, default=7)
+    parser.add_argument("--output", help="also write the results as JSON here")
+    args = parser.parse_args()
+
+    app_dir = os.path.abspath(args.app_dir)
+    modules = args.modules.split(",")
+    # Warm the bytecode and OS file caches so the first module isn't penalised
+    for module in modules:
+        run_python(f"import {module}", app_dir)
+
+    baseline = statistics.median(wall_time("pass", app_dir) for _ in range(args.runs))
+    results = {"app_dir": app_dir, "python": sys.version.split()[0], "interpreter_startup_s": round(baseline, 4),
+               "modules": {}}
+    for module in modules:
+        wall = statistics.median(wall_time(f"import {module}", app_dir) for _ in range(args.runs))
+        cumulative = statistics.median(cumulative_import_us(module, app_dir) for _ in range(args.runs))
+        results["modules"][module] = {
+            "import_wall_s": round(wall - baseline, 4),
+            "importtime_cumulative_s": round(cumulative / 1e6, 4),
+        }
+        print(f"{module:<12} {wall - baseline:8.3f}s wall   {cumulative / 1e6:8.3f}s cumulative (-X importtime)")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+"""End-to-end pipeline benchmark against local SerpAPI, Firecrawl and Groq stubs serving recorded fixtures.
+
+Runs the burr_model pipeline for a batch of questions at each concurrency level and reports
+per-stage latency percentiles, throughput in queries/minute and memory, saved as JSON.
+
+    python backend/benchmarks/pipeline_benchmark.py --concurrency 1,4,8 --queries 16
+    python backend/benchmarks/pipeline_benchmark.py --groq-latency-ms 400 --error-rate 0.05 \\
+        --baseline backend/benchmarks/results/pipeline-20250101T000000Z.json
+
+Caches are off and provider rate limits are raised unless --with-caches / --real-rate-limits,
+so the numbers measure the pipeline itself rather than cache hits or the limiter's pacing.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHMARKS_DIR, "..", "app"))
+
+from measure import current_rss_mb, latency_summary, peak_rss_mb
+from provider_stubs import FIXTURES_DIR, load_fixture, provider_stubs
+
+
+def configure_environment(stub_env: Dict[str, str], args: argparse.Namespace, cache_dir: str) -> None:
+    os.environ.update(stub_env)
+    for key in ("GROQ_API_KEY", "SERP_API_KEY", "FIRECRAWL_API_KEY"):
+        os.environ.setdefault(key, "benchmark")
+    os.environ.setdefault("CACHE_DIR", cache_dir)
+    os.environ.setdefault("BIAS_ANALYSIS_BATCHED", "1" if args.batched else "0")
+    # Local extraction reads recorded outlet HTML; without it the benchmark must not fetch real pages
+    os.environ.setdefault("LOCAL_EXTRACTION_ENABLED", "1" if args.local_extraction else "0")
+    os.environ.setdefault("ARTICLE_HTML_DIR", os.path.join(FIXTURES_DIR, "html"))
+    if not args.with_caches:
+        for key in ("SCRAPE_CACHE_ENABLED", "LLM_CACHE_ENABLED", "SEMANTIC_CACHE_ENABLED", "FINGERPRINT_INDEX_ENABLED"):
+            os.environ.setdefault(key, "0")
+    else:
+        os.environ.setdefault("SEMANTIC_CACHE_ENABLED", "1")
+    if not args.real_rate_limits:
+        for provider in ("GROQ", "FIRECRAWL", "SERPAPI"):
+            os.environ.setdefault(f"{provider}_RATE_PER_SEC", "10000")
+            os.environ.setdefault(f"{provider}_BURST", "10000")
+
+
+# Returns a function that runs one question and returns {stage: seconds}.
+def make_query_runner(mode: str) -> Callable[[str], Dict[str, float]]:
+    # Imported only once the environment points at the stubs
+    from burr_model import run_pipeline, stream_pipeline
+
+    def run(query: str) -> Dict[str, float]:
+        _, trace = run_pipeline(query)
+        stages = {}
+        for step in trace:
+            stages[step["action"]] = stages.get(step["action"], 0.0) + (step["duration_s"] or 0.0)
+        return stages
+
+    # For the streaming pipeline a stage is the time until its first event arrives
+    def stream(query: str) -> Dict[str, float]:
+        started = time.perf_counter()
+        stages = {}
+        for event in stream_pipeline(query):
+            stages.setdefault(f"first_{event['event']}", time.perf_counter() - started)
+        return stages
+
+    return run if mode == "run" else stream
+
+
+def run_level(
+        run_query: Callable[[str], Dict[str, float]],
+        queries: List[str],
+        n_queries: int,
+        concurrency: int,
+        servers: dict,
+        trace_memory: bool
+) -> dict:
+    served_before = {name: server.requests_served for name, server in servers.items()}
+    rss_before = current_rss_mb()
+    if trace_memory:
+        tracemalloc.start()
+
+    def one(i: int) -> dict:
+        started = time.perf_counter()
+        try:
+            stages = run_query(queries[i % len(queries)])
+        except Exception as e:
+            return {"error": repr(e)}
+        return {"stages": stages, "end_to_end_s": time.perf_counter() - started}
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        outcomes = list(pool.map(one, range(n_queries)))
+    wall_s = time.perf_counter() - started
+
+    heap_peak_mb = None
+    if trace_memory:
+        heap_peak_mb = round(tracemalloc.get_traced_memory()[1] / 2 ** 20, 1)
+        tracemalloc.stop()
+
+    completed = [outcome for outcome in outcomes if "error" not in outcome]
+    stage_samples = {}
+    for outcome in completed:
+        for stage, seconds in outcome["stages"].items():
+            stage_samples.setdefault(stage, []).append(seconds)
+
+    return {
+        "concurrency": concurrency,
+        "queries": n_queries,
+        "completed": len(completed),
+        "errors": [outcome["error"] for outcome in outcomes if "error" in outcome],
+        "wall_s": round(wall_s, 3),
+        "queries_per_minute": round(len(completed) / wall_s * 60, 2) if wall_s else None,
+        "end_to_end": latency_summary([outcome["end_to_end_s"] for outcome in completed]),
+        "stages": {stage: latency_summary(samples) for stage, samples in stage_samples.items()},
+        "provider_requests": {
+            name: server.requests_served - served_before[name] for name, server in servers.items()
+        },
+        "memory": {
+            "rss_before_mb": rss_before,
+            "rss_after_mb": current_rss_mb(),
+            "peak_rss_mb": peak_rss_mb(),
+            "python_heap_peak_mb": heap_peak_mb,
+        },
+    }
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BENCHMARKS_DIR,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def percent_change(new: Optional[float], old: Optional[float]) -> str:
+    if new is None or not old:
+        return "n/a"
+    return f"{(new - old) / old * 100:+.1f}%"
+
+
+# Side-by-side of end-to-end latency, throughput and per-stage p50 for levels present in both runs.
+def compare_with_baseline(results: dict, baseline: dict) -> List[str]:
+    baseline_levels = {level["concurrency"]: level for level in baseline["levels"]}
+    lines = [f"compared with {baseline['meta'].get('git_revision')} ({baseline['meta'].get('timestamp')})"]
+    for level in results["levels"]:
+        old = baseline_levels.get(level["concurrency"])
+        if old is None:
+            continue
+        lines.append(f"concurrency {level['concurrency']}:")
+        lines.append(f"  queries/min  {old['queries_per_minute']} -> {level['queries_per_minute']} "
+                     f"({percent_change(level['queries_per_minute'], old['queries_per_minute'])})")
+        for key in ("p50_s", "p95_s"):
+            new_value, old_value = level["end_to_end"].get(key), old["end_to_end"].get(key)
+            lines.append(f"  end-to-end {key[:3]}  {old_value} -> {new_value} ({percent_change(new_value, old_value)})")
+        for stage, summary in level["stages"].items():
+            old_value = old["stages"].get(stage, {}).get("p50_s")
+            lines.append(f"  {stage} p50  {old_value} -> {summary.get('p50_s')} "
+                         f"({percent_change(summary.get('p50_s'), old_value)})")
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", default="1,4,8", help="comma-separated concurrent queries per level")
+    parser.add_argument("--queries", type=int, default=16, help="questions run at each concurrency level")
+    parser.add_argument("--warmup", type=int, default=1, help="untimed questions run before the first level")
+    parser.add_argument("--mode", choices=["run", "stream"], default="run",
+                        help="run_pipeline (per-action stages) or stream_pipeline (time to first event)")
+    parser.add_argument("--serp-latency-ms", type=float, default=300)
+    parser.add_argument("--firecrawl-latency-ms", type=float, default=800)
+    parser.add_argument("--groq-latency-ms", type=float, default=250)
+    parser.add_argument("--jitter", type=float, default=0.25, help="extra random latency as a fraction of the base")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of stub responses that are 429s")
+    parser.add_argument("--batched", action="store_true", help="batch bias analysis (BIAS_ANALYSIS_BATCHED=1)")
+    parser.add_argument("--local-extraction", action="store_true",
+                        help="extract Fox News/NPR articles from recorded HTML instead of the Firecrawl stub")
+    parser.add_argument("--with-caches", action="store_true",
+                        help="leave scrape, LLM and semantic caches and the fingerprint index on")
+    parser.add_argument("--real-rate-limits", action="store_true", help="keep the configured provider rate limits")
+    parser.add_argument("--trace-memory", action="store_true", help="also record the Python heap peak (slower)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="results file (default: benchmarks/results/pipeline-<timestamp>.json)")
+    parser.add_argument("--baseline", help="earlier results file to compare against")
+    args = parser.parse_args()
+
+    levels = [int(level) for level in args.concurrency.split(",")]
+    latencies = {"serpapi": args.serp_latency_ms, "firecrawl": args.firecrawl_latency_ms, "groq": args.groq_latency_ms}
+    settings = {
+        name: {"latency_s": ms / 1000, "jitter_s": ms / 1000 * args.jitter, "error_rate": args.error_rate}
+        for name, ms in latencies.items()
+    }
+    queries = load_fixture("queries.json")
+    timestamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+    with tempfile.TemporaryDirectory(prefix="pipeline-benchmark-") as cache_dir, \
+            provider_stubs(settings, seed=args.seed) as stubs:
+        configure_environment(stubs["env"], args, cache_dir)
+        run_query = make_query_runner(args.mode)
+        from rate_limit import limiter_metrics
+
+        for i in range(args.warmup):
+            run_query(queries[i % len(queries)])
+
+        results = {
+            "meta": {
+                "timestamp": timestamp,
+                "git_revision": git_revision(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "mode": args.mode,
+                "stubs": settings,
+                "batched": args.batched,
+                "local_extraction": args.local_extraction,
+                "with_caches": args.with_caches,
+                "real_rate_limits": args.real_rate_limits,
+            },
+            "levels": [],
+        }
+        for concurrency in levels:
+            level = run_level(run_query, queries, args.queries, concurrency, stubs["servers"], args.trace_memory)
+            level["rate_limiters"] = limiter_metrics()
+            results["levels"].append(level)
+            print(f"concurrency {concurrency}: {level['queries_per_minute']} queries/min, "
+                  f"p50 {level['end_to_end'].get('p50_s')}s, p95 {level['end_to_end'].get('p95_s')}s, "
+                  f"{len(level['errors'])} errors, peak RSS {level['memory']['peak_rss_mb']} MB")
+
+    output = args.output or os.path.join(BENCHMARKS_DIR, "results", f"pipeline-{timestamp}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"results written to {output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            print("\n".join(compare_with_baseline(results, json.load(f))))
+
+
+if __name__ == "__main__":
+    main()
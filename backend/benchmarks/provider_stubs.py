@@ -0,0 +1,112 @@
+import itertools
+import json
+import os
+import threading
+import time
+
+from contextlib import ExitStack, contextmanager
+from typing import Dict, Iterator, Optional
+
+from stub_servers import StubServer
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def load_fixture(name: str, fixtures_dir: str = FIXTURES_DIR):
+    with open(os.path.join(fixtures_dir, name)) as f:
+        return json.load(f)
+
+
+# SerpAPI: GET /search returns the recorded news results for any query.
+def serp_route(fixture: dict):
+    def route(method, path, query, body):
+        return 200, fixture
+    return route
+
+
+# Firecrawl: POST /v1/scrape returns the recorded extraction for the URL, or the first
+# recorded article for URLs that weren't recorded.
+def firecrawl_route(fixture: Dict[str, dict]):
+    fallback = next(iter(fixture.values()))
+
+    def route(method, path, query, body):
+        extracted = fixture.get((body or {}).get("url"), fallback)
+        return 200, {"success": True, "data": {"json": extracted}}
+    return route
+
+
+# Groq's OpenAI-compatible chat completions endpoint. Picks the recorded answer from the
+# system prompt, so the pipeline's own parsing and validation run on realistic output.
+def groq_route(fixture: dict):
+    bias_answers = itertools.cycle(fixture["bias_analysis"])
+    lock = threading.Lock()
+
+    def next_bias() -> dict:
+        with lock:
+            return dict(next(bias_answers))
+
+    def answer(system_prompt: str, user_prompt: str) -> str:
+        if system_prompt.startswith("You will be given a question"):
+            return fixture["subject_extraction"]
+        if "several articles, each with an ARTICLE ID" in system_prompt:
+            count = user_prompt.count("ARTICLE ID:")
+            return json.dumps({"analyses": [dict(next_bias(), article_id=i) for i in range(count)]})
+        if system_prompt.startswith("You are a bias identifier"):
+            return json.dumps(next_bias())
+        if system_prompt.startswith("You are a news analyst"):
+            return json.dumps(fixture["summary"])
+        if system_prompt.startswith("You will be given one section"):
+            return fixture["condense"]
+        return fixture["comparison"]
+
+    def route(method, path, query, body):
+        if body.get("stream"):
+            return 400, {"error": {"message": "streaming is not supported by the stub"}}
+        messages = body["messages"]
+        system_prompt = next((m["content"] for m in messages if m["role"] == "system"), "")
+        user_prompt = next((m["content"] for m in messages if m["role"] == "user"), "")
+        content = answer(system_prompt, user_prompt)
+        prompt_tokens = sum(len(m["content"].split()) for m in messages)
+        completion_tokens = len(content.split())
+        return 200, {
+            "id": "chatcmpl-stub",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body["model"],
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        }
+    return route
+
+
+# Starts SerpAPI, Firecrawl and Groq stubs and yields the environment variables that point
+# the app at them. Each provider gets its own {"latency_s", "jitter_s", "error_rate"}.
+@contextmanager
+def provider_stubs(
+        settings: Optional[Dict[str, dict]] = None,
+        fixtures_dir: str = FIXTURES_DIR,
+        seed: int = 0
+) -> Iterator[Dict[str, object]]:
+    settings = settings or {}
+    with ExitStack() as stack:
+        serp = stack.enter_context(StubServer(
+            {"/search": serp_route(load_fixture("serp_search.json", fixtures_dir))},
+            seed=seed, **settings.get("serpapi", {})))
+        firecrawl = stack.enter_context(StubServer(
+            {"/v1/scrape": firecrawl_route(load_fixture("firecrawl_scrape.json", fixtures_dir))},
+            seed=seed + 1, **settings.get("firecrawl", {})))
+        groq = stack.enter_context(StubServer(
+            {"/openai/v1/chat/completions": groq_route(load_fixture("groq_responses.json", fixtures_dir))},
+            seed=seed + 2, **settings.get("groq", {})))
+        yield {
+            "env": {
+                "SERPAPI_URL": f"{serp.url}/search",
+                "FIRECRAWL_API_URL": f"{firecrawl.url}/v1/scrape",
+                "GROQ_BASE_URL": groq.url,
+            },
+            "servers": {"serpapi": serp, "firecrawl": firecrawl, "groq": groq},
+        }
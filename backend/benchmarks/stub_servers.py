@@ -0,0 +1,112 @@
+import json
+import random
+import threading
+import time
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+# A route gets (method, path, query params, parsed JSON body) and returns (status, JSON body)
+Route = Callable[[str, str, dict, Optional[dict]], Tuple[int, dict]]
+
+
+# Local HTTP/1.1 keep-alive server standing in for an external API, with configurable
+# per-request latency (fixed + jitter) and a probability of answering 429 instead.
+class StubServer:
+    def __init__(
+            self,
+            routes: Dict[str, Route],
+            latency_s: float = 0.0,
+            jitter_s: float = 0.0,
+            error_rate: float = 0.0,
+            seed: int = 0
+    ):
+        self.routes = routes
+        self.latency_s = latency_s
+        self.jitter_s = jitter_s
+        self.error_rate = error_rate
+        self.requests_served = 0
+        self.connections_opened = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def _next_delay_and_error(self) -> Tuple[float, bool]:
+        with self._lock:
+            self.requests_served += 1
+            delay = self.latency_s + (self._rng.uniform(0, self.jitter_s) if self.jitter_s else 0.0)
+            return delay, self._rng.random() < self.error_rate
+
+    def _handler_class(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body go out in separate writes; without this, Nagle plus delayed ACKs
+            # add ~40ms to every response on a reused connection
+            disable_nagle_algorithm = True
+
+            def setup(self):
+                super().setup()
+                with stub._lock:
+                    stub.connections_opened += 1
+
+            def log_message(self, *args):
+                pass
+
+            def _respond(self, status: int, body: dict, headers: Optional[dict] = None):
+                payload = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _handle(self, method: str):
+                parsed = urlparse(self.path)
+                length = int(self.headers.get("Content-Length") or 0)
+                body = json.loads(self.rfile.read(length)) if length else None
+                route = stub.routes.get(parsed.path)
+                if route is None:
+                    return self._respond(404, {"error": f"no stub route for {parsed.path}"})
+
+                delay, throttled = stub._next_delay_and_error()
+                if delay:
+                    time.sleep(delay)
+                if throttled:
+                    return self._respond(429, {"error": "rate limited (stub)"}, {"Retry-After": "0"})
+                query = {k: v[0] for k, v in parse_qs(parsed.query).items()}
+                status, response = route(method, parsed.path, query, body)
+                self._respond(status, response)
+
+            def do_GET(self):
+                self._handle("GET")
+
+            def do_POST(self):
+                self._handle("POST")
+
+        return Handler
+
+    def start(self) -> "StubServer":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "StubServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
@@ -0,0 +1,8 @@
+import os
+import sys
+
+# The app modules import each other as top-level modules, and some build API clients at import
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+# Local stub servers for the external APIs
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "benchmarks"))
+os.environ.setdefault("GROQ_API_KEY", "test")
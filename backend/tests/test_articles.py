@@ -0,0 +1,78 @@
+import gc
+import weakref
+
+import pytest
+
+from articles import Article, ArticleBatch, PayloadStore
+
+
+def serp_batch(count=3):
+    return ArticleBatch.from_serp(
+        {"position": i, "link": f"https://example.com/{i}", "source": "Example"} for i in range(count))
+
+
+def scrape(batch):
+    articles = batch.articles()
+    for article in articles:
+        article.scraped_article = {"data": {"json": {"main_article_title": article.link}}}
+    return batch.with_columns(scraped_ref=[article.scraped_ref for article in articles])
+
+
+def test_articles_of_a_query_share_one_store():
+    batch = serp_batch()
+
+    stores = {id(article.payloads) for article in batch}
+
+    assert len(stores) == 1
+    assert batch[0].payloads is not None
+
+
+def test_payloads_resolve_from_rebuilt_articles():
+    batch = scrape(serp_batch())
+
+    assert [article.scraped_article["data"]["json"]["main_article_title"] for article in batch] == [
+        "https://example.com/0", "https://example.com/1", "https://example.com/2"]
+    assert batch.to_dicts()[1]["scraped_article"] == batch[1].scraped_article
+
+
+def test_payloads_live_as_long_as_the_query_articles():
+    batch = scrape(serp_batch())
+    store = weakref.ref(batch[0].payloads)
+    article = batch[2]
+
+    del batch
+    gc.collect()
+    assert store() is not None
+    assert article.scraped_article["data"]["json"]["main_article_title"] == "https://example.com/2"
+
+    del article
+    gc.collect()
+    assert store() is None
+
+
+def test_large_queries_keep_every_payload():
+    batch = serp_batch(count=500)
+    content = "x" * 1_000_000
+
+    articles = batch.articles()
+    for article in articles:
+        article.prepared_content = {"content": content}
+
+    assert all(article.prepared_content is not None for article in articles)
+    assert len(articles[0].payloads) == 500
+
+
+def test_unknown_reference_raises():
+    with pytest.raises(KeyError):
+        PayloadStore().get("payload-1")
+
+
+def test_standalone_article_gets_its_own_store():
+    article = Article(position=1, link="https://example.com/a")
+    assert article.scraped_article is None
+
+    article.scraped_article = {"data": {}}
+
+    assert article.scraped_article == {"data": {}}
+    assert "payloads" not in article.to_dict()
+    assert "scraped_ref" not in article.to_dict()
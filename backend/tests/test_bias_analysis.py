@@ -0,0 +1,135 @@
+import json
+
+import pytest
+
+import utils
+from articles import Article
+
+
+def article(position, source, title, content="body"):
+    record = Article(position=position, link=f"https://{source.lower()}.example/{position}", title=title,
+                     source=source, political_bias="Center")
+    record.scraped_article = {"data": {"json": {"main_article_title": title, "main_article_content": content}}}
+    return record
+
+
+def analysis(sentiment=0.2):
+    return json.dumps({"bias_shown": "none", "sentiment_analysis": sentiment})
+
+
+@pytest.fixture
+def groq(monkeypatch):
+    # Answers keyed by a substring of the user prompt. A list is answered in order; an exception is raised.
+    answers = {}
+    calls = []
+
+    def fake_call_groq(user_prompt, **kwargs):
+        calls.append(user_prompt)
+        answer = next((answer for needle, answer in answers.items() if needle in user_prompt), analysis())
+        if isinstance(answer, list):
+            answer = answer.pop(0)
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+
+    monkeypatch.setattr(utils, "call_groq", fake_call_groq)
+    fake_call_groq.answers = answers
+    fake_call_groq.calls = calls
+    return fake_call_groq
+
+
+def test_provider_error_on_one_article_leaves_the_others(groq):
+    groq.answers["Broken story"] = RuntimeError("retries exhausted")
+    articles = [article(1, "Fox", "Good story"), article(2, "NPR", "Broken story"), article(3, "NPR", "Other story")]
+
+    utils.analyze_articles_bias_concurrently("Subject", articles, max_workers=2)
+
+    assert articles[0].bias_analysis["sentiment_analysis"] == 0.2
+    assert articles[2].bias_analysis["sentiment_analysis"] == 0.2
+    assert articles[1].bias_analysis is None
+    stats = articles[1].bias_analysis_stats
+    assert stats["tries"] == stats["errors"] == utils.bias_analysis_max_tries
+    assert stats["last_error"] == "RuntimeError: retries exhausted"
+
+
+def test_failed_condense_step_leaves_only_that_article_without_analysis(groq):
+    groq.answers["SECTION 1 OF"] = RuntimeError("retries exhausted")
+    long_body = " ".join(f"Sentence {i} about the subject." for i in range(utils.article_token_budget))
+    articles = [article(1, "Fox", "Long story", content=long_body), article(2, "NPR", "Short story")]
+
+    utils.analyze_articles_bias_concurrently("Subject", articles)
+
+    assert articles[0].bias_analysis is None
+    assert articles[0].bias_analysis_stats["last_error"] == "RuntimeError: retries exhausted"
+    assert articles[1].bias_analysis["sentiment_analysis"] == 0.2
+
+
+def test_error_then_valid_answer_is_retried(groq):
+    groq.answers["Flaky story"] = [RuntimeError("timeout"), analysis(0.7)]
+
+    result, stats = utils.single_article_bias_analysis_with_stats("Subject", "Fox", "Right", "Flaky story", "body")
+
+    assert result["sentiment_analysis"] == 0.7
+    assert stats["tries"] == 2 and stats["errors"] == 1
+
+
+def test_malformed_json_is_repaired_without_another_request(groq):
+    groq.answers["Fenced story"] = "Here you go:\n```json\n" + analysis(-0.4) + "\n```"
+
+    result, stats = utils.single_article_bias_analysis_with_stats("Subject", "Fox", "Right", "Fenced story", "body")
+
+    assert result["sentiment_analysis"] == -0.4
+    assert stats["tries"] == 1 and stats["repaired"]
+    assert len(groq.calls) == 1
+
+
+def batch_response(*analyses):
+    return json.dumps({"analyses": list(analyses)})
+
+
+def batched_analysis(article_id, sentiment=0.5):
+    return {"article_id": article_id, "bias_shown": "none", "sentiment_analysis": sentiment}
+
+
+@pytest.fixture
+def fox_articles():
+    return [article(position, "Fox", f"Fox story {position}") for position in (1, 2, 3)]
+
+
+def test_batch_covers_every_article_in_one_request(groq, fox_articles):
+    groq.answers["ARTICLE ID"] = batch_response(*(batched_analysis(i) for i in range(3)))
+
+    utils.analyze_articles_bias_batched("Subject", fox_articles)
+
+    assert len(groq.calls) == 1
+    assert [a.bias_analysis["sentiment_analysis"] for a in fox_articles] == [0.5, 0.5, 0.5]
+    assert all(a.bias_analysis_stats["batch_size"] == 3 for a in fox_articles)
+
+
+def test_missing_and_invalid_batch_entries_fall_back_to_single_requests(groq, fox_articles):
+    groq.answers["ARTICLE ID"] = batch_response(
+        batched_analysis(0),
+        {"article_id": 1, "bias_shown": "none"},  # no sentiment
+        batched_analysis(7),                      # not in the batch
+    )
+
+    utils.analyze_articles_bias_batched("Subject", fox_articles)
+
+    assert fox_articles[0].bias_analysis["sentiment_analysis"] == 0.5
+    assert fox_articles[0].bias_analysis_stats["batch_size"] == 3
+    for fallback in fox_articles[1:]:
+        assert fallback.bias_analysis["sentiment_analysis"] == 0.2
+        assert fallback.bias_analysis_stats["batch_size"] == 1
+    assert len(groq.calls) == 3
+
+
+@pytest.mark.parametrize("batch_answer", ["not json at all", json.dumps({"analyses": "none"}),
+                                          RuntimeError("retries exhausted")])
+def test_failed_batch_request_falls_back_for_every_article(groq, fox_articles, batch_answer):
+    groq.answers["ARTICLE ID"] = batch_answer
+
+    utils.analyze_articles_bias_batched("Subject", fox_articles)
+
+    assert all(a.bias_analysis["sentiment_analysis"] == 0.2 for a in fox_articles)
+    assert all(a.bias_analysis_stats["batch_size"] == 1 for a in fox_articles)
+    assert len(groq.calls) == 4
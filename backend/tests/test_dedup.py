@@ -0,0 +1,144 @@
+import pytest
+
+from articles import Article
+from dedup import FingerprintIndex, analyze_articles_deduplicated, canonical_url, dedupe_by_canonical_url
+from utils import build_bias_comparison_prompt, group_sources
+
+STORY = "https://example.com/news/story"
+
+STORY_BODY = (
+    "The central bank held interest rates steady on Wednesday, citing cooling inflation and a labor market "
+    "that remains resilient. Officials signalled that cuts could come later this year if price growth keeps "
+    "easing, while warning that tariffs may push some goods prices higher in the coming months."
+)
+OTHER_BODY = (
+    "Lawmakers passed a bill expanding broadband access to rural counties, funding new fiber lines and "
+    "subsidies for low-income households. Supporters called it overdue; critics questioned its price tag."
+)
+
+
+@pytest.mark.parametrize("url, expected", [
+    # Google AMP cache links, https (/c/s/) and http (/c/), with the cache's own query flags
+    ("https://www-example-com.cdn.ampproject.org/c/s/www.example.com/news/story", STORY),
+    ("https://www-example-com.cdn.ampproject.org/v/s/www.example.com/news/story?amp_js_v=0.1&usqp=mq331AQ", STORY),
+    ("http://www-example-com.cdn.ampproject.org/c/example.com/news/story", STORY),
+    # amp. subdomains
+    ("https://amp.example.com/news/story", STORY),
+    # /amp path segments and .amp suffixes
+    ("https://www.example.com/news/story/amp", STORY),
+    ("https://www.example.com/amp/news/story", STORY),
+    ("https://www.example.com/news/story.amp", STORY),
+    ("https://www.example.com/news/story.amp.html", "https://example.com/news/story.html"),
+    # ?amp=1 and other AMP query flags, keeping the rest of the query
+    ("https://www.example.com/news/story?amp=1", STORY),
+    ("https://www.example.com/news/story?outputType=amp", STORY),
+    ("https://www.example.com/news/story?id=5&amp=1", STORY + "?id=5"),
+    # www. and m., scheme, case, trailing slash, fragment and tracking parameters
+    ("http://www.example.com/news/story", STORY),
+    ("https://m.example.com/news/story/", STORY),
+    ("https://WWW.Example.com/news/story#top", STORY),
+    ("https://www.example.com/news/story?utm_source=newsletter", STORY),
+])
+def test_canonical_url(url, expected):
+    assert canonical_url(url) == expected
+
+
+@pytest.mark.parametrize("url", [
+    "https://example.com/news/amplify",
+    "https://example.com/news/story-2",
+    "https://example.org/news/story",
+    "https://example.com/news/story?id=6",
+])
+def test_canonical_url_keeps_different_pages_apart(url):
+    assert canonical_url(url) != canonical_url("https://example.com/news/story?id=5")
+
+
+def test_dedupe_by_canonical_url_keeps_first_and_unwraps_amp():
+    articles = [
+        Article(position=1, link="https://www-example-com.cdn.ampproject.org/c/s/www.example.com/news/story"),
+        Article(position=2, link="https://m.example.com/news/story"),
+        Article(position=3, link="https://www.example.com/news/other?amp=1"),
+    ]
+
+    kept = dedupe_by_canonical_url(articles)
+
+    assert [article.position for article in kept] == [1, 3]
+    assert [article.link for article in kept] == ["https://www.example.com/news/story",
+                                                  "https://www.example.com/news/other"]
+
+
+def article(position, outlet, body, link=None):
+    record = Article(position=position, link=link or f"https://{outlet.lower()}.com/{position}", source=outlet,
+                     outlet=outlet)
+    record.scraped_article = {"data": {"json": {"main_article_title": f"Story {position}",
+                                                 "main_article_content": body}}}
+    return record
+
+
+class FakeAnalyzer:
+    def __init__(self):
+        self.analyzed = []
+
+    def __call__(self, user_query_subject, articles, max_workers):
+        for record in articles:
+            self.analyzed.append(record.link)
+            record.bias_analysis = {"sentiment": 0.5, "analyzed": record.link}
+        return articles
+
+
+@pytest.fixture
+def index():
+    return FingerprintIndex(path=":memory:")
+
+
+def test_duplicates_inherit_the_analysis_and_are_left_out_of_the_comparison(index):
+    original = article(1, "Example", STORY_BODY)
+    duplicate = article(2, "Example", STORY_BODY + " Updated at 10am.")
+    other = article(3, "Example", OTHER_BODY)
+    analyzer = FakeAnalyzer()
+
+    analyze_articles_deduplicated("interest rates", [original, duplicate, other], analyzer, index=index)
+
+    assert analyzer.analyzed == [original.link, other.link]
+    assert duplicate.duplicate_of == original.link
+    assert duplicate.bias_analysis == original.bias_analysis
+    assert duplicate.bias_analysis_stats == {"tries": 0, "duplicate_of": original.link}
+
+    prompt = build_bias_comparison_prompt("interest rates", group_sources([original, duplicate, other]))
+    assert prompt.count(original.link) == 1
+    assert prompt.count(other.link) == 1
+
+
+def test_same_content_from_another_outlet_is_not_a_duplicate(index):
+    first = article(1, "Example", STORY_BODY)
+    syndicated = article(2, "Wire", STORY_BODY)
+    analyzer = FakeAnalyzer()
+
+    analyze_articles_deduplicated("interest rates", [first, syndicated], analyzer, index=index)
+
+    assert analyzer.analyzed == [first.link, syndicated.link]
+    assert syndicated.duplicate_of is None
+
+
+def test_fingerprint_index_reuses_analysis_from_an_earlier_query(index):
+    first_query = FakeAnalyzer()
+    analyze_articles_deduplicated("Interest rates", [article(1, "Example", STORY_BODY)], first_query, index=index)
+
+    second_query = FakeAnalyzer()
+    repeat = article(7, "Example", STORY_BODY, link="https://example.com/rates-live")
+    analyze_articles_deduplicated("interest  rates", [repeat], second_query, index=index)
+
+    assert second_query.analyzed == []
+    assert repeat.duplicate_of is None
+    assert repeat.bias_analysis == {"sentiment": 0.5, "analyzed": "https://example.com/1"}
+    assert repeat.bias_analysis_stats["reused_from"] == "https://example.com/1"
+    assert repeat.bias_analysis_stats["tries"] == 0
+
+
+def test_fingerprint_index_does_not_reuse_across_subjects(index):
+    analyze_articles_deduplicated("interest rates", [article(1, "Example", STORY_BODY)], FakeAnalyzer(), index=index)
+
+    analyzer = FakeAnalyzer()
+    analyze_articles_deduplicated("tariffs", [article(2, "Example", STORY_BODY)], analyzer, index=index)
+
+    assert analyzer.analyzed == ["https://example.com/2"]
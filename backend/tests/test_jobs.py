@@ -0,0 +1,65 @@
+import jobs
+import persistence
+
+from jobs import FAILED, SUCCEEDED, JobStore, run_job
+
+
+def finished_state():
+    return {"query_subject": "tariffs", "bias_comparison_output": "comparison", "news_results": None}
+
+
+def pipeline(result):
+    def run_pipeline(query):
+        if isinstance(result, Exception):
+            raise result
+        return result, {"total_s": 0.1}
+
+    return run_pipeline
+
+
+def store_job(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.db"))
+    return store, store.create("tariffs")
+
+
+def test_successful_job_is_stored_with_result(tmp_path, monkeypatch):
+    monkeypatch.setattr("burr_model.run_pipeline", pipeline(finished_state()))
+    monkeypatch.setattr(jobs, "persist_results", False)
+    store, job_id = store_job(tmp_path)
+
+    run_job(store.path, job_id, "tariffs")
+
+    job = store.get(job_id)
+    assert job["status"] == SUCCEEDED
+    assert job["result"]["bias_comparison_output"] == "comparison"
+    assert "persist_error" not in job["result"]
+
+
+def test_pipeline_error_fails_job(tmp_path, monkeypatch):
+    monkeypatch.setattr("burr_model.run_pipeline", pipeline(RuntimeError("serp down")))
+    store, job_id = store_job(tmp_path)
+
+    run_job(store.path, job_id, "tariffs")
+
+    job = store.get(job_id)
+    assert job["status"] == FAILED
+    assert "serp down" in job["error"]
+    assert job["result"] is None
+
+
+def test_persistence_error_keeps_job_succeeded(tmp_path, monkeypatch):
+    def persist_pipeline_state(state):
+        raise RuntimeError("database unavailable")
+
+    monkeypatch.setattr("burr_model.run_pipeline", pipeline(finished_state()))
+    monkeypatch.setattr(jobs, "persist_results", True)
+    monkeypatch.setattr(persistence, "persist_pipeline_state", persist_pipeline_state)
+    store, job_id = store_job(tmp_path)
+
+    run_job(store.path, job_id, "tariffs")
+
+    job = store.get(job_id)
+    assert job["status"] == SUCCEEDED
+    assert job["error"] is None
+    assert job["result"]["bias_comparison_output"] == "comparison"
+    assert "database unavailable" in job["result"]["persist_error"]
@@ -0,0 +1,48 @@
+from fastapi.testclient import TestClient
+
+import main
+
+
+class FakeJobQueue:
+    instances = []
+
+    def __init__(self):
+        self.stopped = False
+        FakeJobQueue.instances.append(self)
+
+    def shutdown(self, wait=True):
+        self.stopped = True
+
+
+class FakeTopicScheduler:
+    instances = []
+
+    def __init__(self, store):
+        self.started = False
+        self.stopped = False
+        FakeTopicScheduler.instances.append(self)
+
+    def start(self):
+        self.started = True
+
+    def stop(self, wait=True):
+        self.stopped = True
+
+
+def test_lifespan_starts_and_stops_background_services(monkeypatch):
+    telemetry_shutdowns = []
+    monkeypatch.setattr(main, "JobQueue", FakeJobQueue)
+    monkeypatch.setattr(main, "TopicScheduler", FakeTopicScheduler)
+    monkeypatch.setattr(main, "TopicStore", lambda: None)
+    monkeypatch.setattr(main, "topic_scheduler_enabled", True)
+    monkeypatch.setattr(main, "persist_results", False)
+    monkeypatch.setattr(main, "shutdown_telemetry", lambda: telemetry_shutdowns.append(True))
+
+    with TestClient(main.app) as client:
+        assert client.get("/").status_code == 200
+        job_queue, topic_scheduler = FakeJobQueue.instances[-1], FakeTopicScheduler.instances[-1]
+        assert main.job_queue is job_queue and main.topic_scheduler is topic_scheduler
+        assert topic_scheduler.started and not topic_scheduler.stopped and not job_queue.stopped
+
+    assert topic_scheduler.stopped and job_queue.stopped
+    assert telemetry_shutdowns == [True]
@@ -0,0 +1,280 @@
+import threading
+
+import pytest
+
+import utils
+from cache import LRUMemoryCache, llm_cache_key
+from llm_gateway import FakeLLMProvider, LLMGateway, Target
+from telemetry import LLM_FAILOVERS, LLM_HEDGE_WINS, LLM_HEDGES
+
+MESSAGES = [{"role": "user", "content": "one two three"}]
+PRIMARY = Target("primary", "m1")
+SECONDARY = Target("secondary", "m2")
+
+
+class FakeClock:
+    def __init__(self, now=1_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def answering(name, **kwargs):
+    return FakeLLMProvider(name, respond=lambda model, messages: f"{name} answer", **kwargs)
+
+
+# Blocks every request until released (or a 5s safety timeout), so the hedge decides the race
+def stalled(name):
+    released = threading.Event()
+    provider = answering(name, latency_s=5.0, sleep=released.wait)
+    provider.release = released.set
+    return provider
+
+
+def gateway(providers, targets=("primary:m1", "secondary:m2"), clock=None, **kwargs):
+    route = kwargs.pop("route", {})
+    settings = dict(hedge=True, hedge_min_delay=0.0, hedge_max_delay=1.0, hedge_budget=1.0, min_samples=5,
+                    circuit_failures=2, circuit_cooldown=60.0)
+    settings.update(kwargs)
+    return LLMGateway(providers, {"default": dict(route, targets=list(targets))}, clock=clock or FakeClock(),
+                      **settings)
+
+
+def observe(llm_gateway, target, *latencies):
+    for latency in latencies:
+        llm_gateway.latency("default", target).observe(latency)
+
+
+# Streams `deltas`, then raises if `error` is set
+class ScriptedStreamProvider:
+    def __init__(self, deltas, error=None):
+        self.deltas = deltas
+        self.error = error
+        self.calls = 0
+
+    def stream(self, model, messages, **options):
+        self.calls += 1
+        yield from self.deltas
+        if self.error is not None:
+            raise self.error
+
+
+def test_hedge_delay_is_the_primary_p95_within_bounds():
+    llm_gateway = gateway({"primary": answering("primary"), "secondary": answering("secondary")},
+                          hedge_min_delay=0.05, hedge_max_delay=0.5, window=20)
+
+    assert llm_gateway.hedge_delay("default", PRIMARY) is None
+    observe(llm_gateway, PRIMARY, *[i / 100 for i in range(1, 21)])
+    assert llm_gateway.hedge_delay("default", PRIMARY) == 0.19
+
+    observe(llm_gateway, PRIMARY, *[0.001] * 20)
+    assert llm_gateway.hedge_delay("default", PRIMARY) == 0.05
+    observe(llm_gateway, PRIMARY, *[2.0] * 20)
+    assert llm_gateway.hedge_delay("default", PRIMARY) == 0.5
+
+
+def test_request_past_p95_is_hedged_to_the_next_target():
+    primary, secondary = stalled("primary"), answering("secondary")
+    llm_gateway = gateway({"primary": primary, "secondary": secondary})
+    observe(llm_gateway, PRIMARY, *[0.01] * 5)
+    hedges, wins = LLM_HEDGES.value(task="default"), LLM_HEDGE_WINS.value(task="default")
+
+    try:
+        assert llm_gateway.complete("default", MESSAGES) == ("secondary answer", SECONDARY)
+    finally:
+        primary.release()
+        llm_gateway.close()
+
+    assert (primary.calls, secondary.calls) == (1, 1)
+    assert LLM_HEDGES.value(task="default") == hedges + 1
+    assert LLM_HEDGE_WINS.value(task="default") == wins + 1
+
+
+def test_no_hedge_until_the_primary_has_enough_samples():
+    primary, secondary = answering("primary", latency_s=0.05), answering("secondary")
+    llm_gateway = gateway({"primary": primary, "secondary": secondary})
+    observe(llm_gateway, PRIMARY, *[0.001] * 4)
+
+    assert llm_gateway.complete("default", MESSAGES) == ("primary answer", PRIMARY)
+    assert secondary.calls == 0
+
+
+def test_hedges_stop_when_the_budget_is_spent():
+    primary, secondary = answering("primary", latency_s=0.2), answering("secondary")
+    llm_gateway = gateway({"primary": primary, "secondary": secondary}, hedge_budget=0.0,
+                          hedge_max_delay=0.02)
+    observe(llm_gateway, PRIMARY, *[0.01] * 5)
+
+    try:
+        # The one hedge the gateway starts with goes to the first request; nothing is earned after it
+        answered = [llm_gateway.complete("default", MESSAGES)[1] for _ in range(3)]
+    finally:
+        llm_gateway.close()
+
+    assert answered == [SECONDARY, PRIMARY, PRIMARY]
+    assert secondary.calls == 1
+
+
+def test_hedge_budget_is_earned_per_request():
+    primary, secondary = answering("primary", latency_s=0.2), answering("secondary")
+    llm_gateway = gateway({"primary": primary, "secondary": secondary}, hedge_budget=0.5,
+                          hedge_max_delay=0.02)
+    observe(llm_gateway, PRIMARY, *[0.01] * 5)
+
+    try:
+        answered = [llm_gateway.complete("default", MESSAGES)[1] for _ in range(4)]
+    finally:
+        llm_gateway.close()
+
+    # 1 + 0.5 -> hedge, 0.5 + 0.5 -> hedge, 0 + 0.5 -> none, 0.5 + 0.5 -> hedge
+    assert answered == [SECONDARY, SECONDARY, PRIMARY, SECONDARY]
+
+
+def test_errors_fail_over_and_open_the_circuit():
+    clock = FakeClock()
+    failing, secondary = answering("primary", error_rate=1.0), answering("secondary")
+    llm_gateway = gateway({"primary": failing, "secondary": secondary}, clock=clock)
+    failovers = LLM_FAILOVERS.value(task="default")
+
+    answers = [llm_gateway.complete("default", MESSAGES) for _ in range(4)]
+
+    assert answers == [("secondary answer", SECONDARY)] * 4
+    # Two failures open the circuit; the next requests go straight to the secondary
+    assert failing.calls == 2
+    assert LLM_FAILOVERS.value(task="default") == failovers + 2
+    assert llm_gateway.targets("default") == [SECONDARY, PRIMARY]
+    assert llm_gateway.metrics()["default/primary:m1"]["circuit_open"]
+
+    clock.now += 61
+    assert llm_gateway.targets("default") == [PRIMARY, SECONDARY]
+
+
+def test_success_resets_the_failure_count():
+    clock = FakeClock()
+    flaky = answering("primary")
+    llm_gateway = gateway({"primary": flaky, "secondary": answering("secondary")}, clock=clock)
+
+    flaky.error_rate = 1.0
+    llm_gateway.complete("default", MESSAGES)
+    flaky.error_rate = 0.0
+    llm_gateway.complete("default", MESSAGES)
+    flaky.error_rate = 1.0
+    llm_gateway.complete("default", MESSAGES)
+
+    assert llm_gateway.targets("default")[0] == PRIMARY
+
+
+def test_last_error_is_raised_when_every_target_fails():
+    llm_gateway = gateway({"primary": answering("primary", error_rate=1.0),
+                           "secondary": answering("secondary", error_rate=1.0)})
+
+    with pytest.raises(RuntimeError, match="secondary: injected failure"):
+        llm_gateway.complete("default", MESSAGES)
+
+
+def test_targets_over_the_latency_budget_move_back_fastest_first():
+    clock = FakeClock()
+    providers = {name: answering(name) for name in ("slow", "slower", "tripped", "fast")}
+    llm_gateway = gateway(providers, targets=("slower:m", "tripped:m", "slow:m", "fast:m"), clock=clock,
+                          route={"latency_budget_s": 0.1}, circuit_failures=1)
+    observe(llm_gateway, Target("slower", "m"), *[0.5] * 5)
+    observe(llm_gateway, Target("slow", "m"), *[0.2] * 5)
+    observe(llm_gateway, Target("fast", "m"), *[0.05] * 5)
+    llm_gateway._failed("default", Target("tripped", "m"), 0.01)
+
+    assert llm_gateway.targets("default") == [Target("fast", "m"), Target("slow", "m"), Target("slower", "m"),
+                                              Target("tripped", "m")]
+    assert llm_gateway.primary("default") == Target("slower", "m")
+
+
+def test_too_few_samples_keep_the_configured_order():
+    llm_gateway = gateway({"primary": answering("primary"), "secondary": answering("secondary")},
+                          route={"latency_budget_s": 0.1})
+    observe(llm_gateway, PRIMARY, *[0.5] * 4)
+
+    assert llm_gateway.targets("default") == [PRIMARY, SECONDARY]
+
+
+def stream(llm_gateway):
+    deltas = []
+    chunks = llm_gateway.stream("default", MESSAGES)
+    while True:
+        try:
+            deltas.append(next(chunks))
+        except StopIteration as stop:
+            return deltas, stop.value
+
+
+def test_stream_fails_over_before_the_first_delta():
+    failing, secondary = answering("primary", error_rate=1.0), answering("secondary")
+    llm_gateway = gateway({"primary": failing, "secondary": secondary})
+
+    assert stream(llm_gateway) == (["secondary ", "answer "], SECONDARY)
+    assert failing.calls == 1
+
+
+def test_stream_error_after_the_first_delta_is_raised():
+    primary = ScriptedStreamProvider(["partial "], error=RuntimeError("connection reset"))
+    secondary = ScriptedStreamProvider(["secondary"])
+    llm_gateway = gateway({"primary": primary, "secondary": secondary})
+    deltas = []
+
+    with pytest.raises(RuntimeError, match="connection reset"):
+        for delta in llm_gateway.stream("default", MESSAGES):
+            deltas.append(delta)
+
+    assert deltas == ["partial "]
+    assert secondary.calls == 0
+
+
+class FixedGateway:
+    def __init__(self, answer, target, primary=PRIMARY):
+        self.answer = answer
+        self.target = target
+        self._primary = primary
+
+    def primary(self, task):
+        return self._primary
+
+    def complete(self, task, messages, **options):
+        return self.answer, self.target
+
+    def stream(self, task, messages, **options):
+        yield from self.answer.split(" ")
+        return self.target
+
+
+@pytest.fixture
+def llm_cache(monkeypatch):
+    cache = LRUMemoryCache()
+    monkeypatch.setattr(utils, "get_llm_cache", lambda: cache)
+    return cache
+
+
+@pytest.mark.parametrize("target", [PRIMARY, SECONDARY])
+def test_call_groq_caches_under_the_target_that_answered(monkeypatch, llm_cache, target):
+    monkeypatch.setattr(utils, "get_llm_gateway", lambda: FixedGateway("answer", target))
+
+    assert utils.call_groq("question", system_prompt="system") == "answer"
+
+    assert llm_cache.get(llm_cache_key(target.label, "system", "question", json_mode=False)) == "answer"
+    assert len(llm_cache) == 1
+
+
+def test_call_groq_does_not_serve_a_failover_answer_as_the_primary(monkeypatch, llm_cache):
+    monkeypatch.setattr(utils, "get_llm_gateway", lambda: FixedGateway("fallback answer", SECONDARY))
+    utils.call_groq("question", system_prompt="system")
+
+    monkeypatch.setattr(utils, "get_llm_gateway", lambda: FixedGateway("primary answer", PRIMARY))
+    assert utils.call_groq("question", system_prompt="system") == "primary answer"
+    assert utils.call_groq("question", system_prompt="system") == "primary answer"
+
+
+def test_stream_groq_caches_under_the_target_that_answered(monkeypatch, llm_cache):
+    monkeypatch.setattr(utils, "get_llm_gateway", lambda: FixedGateway("fallback answer", SECONDARY))
+
+    assert list(utils.stream_groq("question", system_prompt="system")) == ["fallback", "answer"]
+
+    assert llm_cache.get(llm_cache_key(SECONDARY.label, "system", "question", json_mode=False)) == "fallbackanswer"
+    assert llm_cache.get(llm_cache_key(PRIMARY.label, "system", "question", json_mode=False)) is None
@@ -0,0 +1,89 @@
+import pytest
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session
+
+from articles import Article, ArticleBatch
+from database import Base
+from models import ArticleAnalysis, UserQueryAndResponse
+from persistence import save_pipeline_result, save_pipeline_results
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    with Session(engine) as session:
+        yield session
+    engine.dispose()
+
+
+def pipeline_result(query, articles):
+    return {
+        "original_user_input": query,
+        "query_subject": query.title(),
+        "serp_params": {"q": query, "tbm": "nws", "api_key": "secret"},
+        "news_results": articles,
+        "bias_comparison_output": f"comparison for {query}",
+    }
+
+
+def article(link, source, sentiment="0.5"):
+    return {
+        "position": 1,
+        "source": source,
+        "political_bias": "Center",
+        "link": link,
+        "title": f"title {link}",
+        "scraped_article": {"content": "body"},
+        "news_analyst_response": "summary",
+        "bias_analysis": {"sentiment_analysis": sentiment},
+    }
+
+
+def test_bulk_insert_returns_query_ids_in_order(db):
+    results = [
+        pipeline_result("rate hike", [article("https://a.example/1", "A"), article("https://b.example/1", "B")]),
+        pipeline_result("election", [article("https://a.example/2", "A")]),
+        pipeline_result("no articles", []),
+    ]
+
+    ids = save_pipeline_results(db, results)
+
+    queries = db.execute(select(UserQueryAndResponse).order_by(UserQueryAndResponse.id)).scalars().all()
+    assert ids == [query.id for query in queries]
+    assert [query.user_query for query in queries] == ["rate hike", "election", "no articles"]
+    links_by_query = {}
+    for row in db.execute(select(ArticleAnalysis)).scalars():
+        links_by_query.setdefault(row.query_id, []).append(row.link)
+    assert links_by_query == {
+        ids[0]: ["https://a.example/1", "https://b.example/1"],
+        ids[1]: ["https://a.example/2"],
+    }
+
+
+def test_api_key_is_redacted(db):
+    query_id = save_pipeline_result(db, pipeline_result("rate hike", []))
+
+    serp_params = db.get(UserQueryAndResponse, query_id).serp_params
+    assert serp_params == {"q": "rate hike", "tbm": "nws"}
+
+
+def test_article_batch_payloads_and_sentiment(db):
+    articles = []
+    for link, source, sentiment in (("https://a.example/1", "A", "0.25"), ("https://b.example/1", "B", "n/a")):
+        record = Article(position=1, link=link, source=source, bias_analysis={"sentiment_analysis": sentiment})
+        record.scraped_article = {"content": "body"}
+        articles.append(record)
+    batch = ArticleBatch.from_articles(articles)
+
+    query_id = save_pipeline_result(db, pipeline_result("rate hike", batch))
+
+    rows = db.execute(select(ArticleAnalysis).where(ArticleAnalysis.query_id == query_id)
+                      .order_by(ArticleAnalysis.link)).scalars().all()
+    assert [(row.source, row.sentiment_analysis) for row in rows] == [("A", 0.25), ("B", None)]
+    assert all(row.scraped_article == {"content": "body"} for row in rows)
+
+
+def test_empty_results_insert_nothing(db):
+    assert save_pipeline_results(db, []) == []
+    assert db.execute(select(UserQueryAndResponse)).first() is None
@@ -0,0 +1,192 @@
+from datetime import datetime, timezone
+from email.utils import format_datetime
+
+import pytest
+
+from rate_limit import (AdaptiveConcurrencyLimit, ProviderLimiter, RateLimitedError, RetriesExhaustedError, TokenBucket,
+                        parse_retry_after)
+
+
+# Time only moves when something sleeps
+class FakeClock:
+    def __init__(self, now=1_000.0):
+        self.now = now
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+def limiter(clock, **kwargs):
+    settings = dict(rate_per_sec=1000, burst=1000, initial_concurrency=4, rng=lambda: 1.0)
+    settings.update(kwargs)
+    return ProviderLimiter("test", clock=clock, sleep=clock.sleep, **settings)
+
+
+# Fails with RateLimitedError for the first `throttles` calls, then answers
+def throttled(throttles, retry_after=None):
+    calls = []
+
+    def fn():
+        calls.append(len(calls))
+        if len(calls) <= throttles:
+            raise RateLimitedError("429", retry_after=retry_after)
+        return "ok"
+
+    fn.calls = calls
+    return fn
+
+
+def test_bucket_allows_a_burst_up_to_capacity(clock):
+    bucket = TokenBucket(rate=2, capacity=3, clock=clock, sleep=clock.sleep)
+
+    assert [bucket.try_acquire() for _ in range(4)] == [True, True, True, False]
+
+
+def test_bucket_refills_at_rate_and_caps_at_capacity(clock):
+    bucket = TokenBucket(rate=2, capacity=3, clock=clock, sleep=clock.sleep)
+    for _ in range(3):
+        bucket.try_acquire()
+
+    clock.now += 0.5
+    assert bucket.try_acquire()
+    assert not bucket.try_acquire()
+
+    clock.now += 60
+    assert bucket.available() == 3
+
+
+def test_bucket_acquire_sleeps_until_a_token_refills(clock):
+    bucket = TokenBucket(rate=4, capacity=1, clock=clock, sleep=clock.sleep)
+    bucket.acquire()
+
+    assert bucket.acquire() == pytest.approx(0.25)
+    assert clock.sleeps == [pytest.approx(0.25)]
+
+
+def test_paused_bucket_hands_out_nothing_until_the_pause_ends(clock):
+    bucket = TokenBucket(rate=10, capacity=10, clock=clock, sleep=clock.sleep)
+    bucket.pause(2)
+
+    assert not bucket.try_acquire()
+    clock.now += 1.99
+    assert not bucket.try_acquire()
+    clock.now += 0.11
+    assert bucket.try_acquire()
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("3", 3.0),
+    ("0.5", 0.5),
+    ("-4", 0.0),
+    (None, None),
+    ("", None),
+    ("soon", None),
+])
+def test_parse_retry_after_seconds(value, expected):
+    assert parse_retry_after(value) == expected
+
+
+def test_parse_retry_after_http_date():
+    retry_at = datetime(2026, 10, 21, 7, 28, tzinfo=timezone.utc)
+    value = format_datetime(retry_at, usegmt=True)
+
+    assert parse_retry_after(value, now=retry_at.timestamp() - 120) == 120
+    assert parse_retry_after(value, now=retry_at.timestamp() + 5) == 0.0
+
+
+@pytest.mark.parametrize("header", [
+    "7",
+    format_datetime(datetime.fromtimestamp(1_007.0, timezone.utc), usegmt=True),
+])
+def test_limiter_pauses_for_retry_after(clock, header):
+    provider = limiter(clock)
+    fn = throttled(1, retry_after=parse_retry_after(header, now=clock()))
+
+    assert provider.call(fn) == "ok"
+    assert len(fn.calls) == 2
+    # The pause, then the one token the pause drained
+    assert clock.sleeps == [pytest.approx(7.0), pytest.approx(0.001)]
+
+
+def test_retry_after_is_capped_at_max_delay(clock):
+    provider = limiter(clock, max_delay=5.0)
+
+    provider.call(throttled(1, retry_after=600))
+
+    assert clock.sleeps[0] == 5.0
+
+
+def test_aimd_grows_by_one_after_a_window_of_successes():
+    limit = AdaptiveConcurrencyLimit(initial=4, maximum=6)
+
+    for _ in range(4):
+        limit.on_success()
+    assert limit.limit == 4
+    limit.on_success()
+    assert limit.limit == 5
+
+    for _ in range(50):
+        limit.on_success()
+    assert limit.limit == 6
+
+
+def test_aimd_halves_on_throttle_down_to_the_minimum():
+    limit = AdaptiveConcurrencyLimit(initial=8, minimum=1)
+
+    limits = []
+    for _ in range(5):
+        limit.on_throttle()
+        limits.append(limit.limit)
+
+    assert limits == [4, 2, 1, 1, 1]
+
+
+def test_limiter_retries_stop_after_max_retries(clock):
+    provider = limiter(clock, max_retries=2, base_delay=0.5)
+    fn = throttled(10)
+
+    with pytest.raises(RetriesExhaustedError):
+        provider.call(fn)
+
+    assert len(fn.calls) == 3
+    # Full-jitter backoff at its ceiling (rng = 1.0): base_delay * 2 ** attempt, each followed by one token
+    assert [round(s, 3) for s in clock.sleeps] == [0.5, 0.001, 1.0, 0.001]
+    metrics = provider.metrics()
+    assert (metrics["calls"], metrics["throttled"], metrics["retries"], metrics["failures"]) == (1, 3, 2, 1)
+    assert metrics["successes"] == 0
+    assert metrics["concurrency_limit"] == 1
+    assert metrics["in_flight"] == 0
+
+
+def test_limiter_recovers_within_max_retries(clock):
+    provider = limiter(clock, max_retries=2)
+
+    assert provider.call(throttled(2)) == "ok"
+    metrics = provider.metrics()
+    assert (metrics["throttled"], metrics["retries"], metrics["successes"], metrics["failures"]) == (2, 2, 1, 0)
+
+
+def test_other_errors_are_not_retried(clock):
+    provider = limiter(clock)
+    calls = []
+
+    def fn():
+        calls.append(1)
+        raise ValueError("bad request")
+
+    with pytest.raises(ValueError):
+        provider.call(fn)
+
+    assert len(calls) == 1
+    assert clock.sleeps == []
+    assert provider.metrics()["failures"] == 1
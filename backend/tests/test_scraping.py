@@ -0,0 +1,112 @@
+import random
+import threading
+import time
+
+import pytest
+
+import utils
+from articles import Article
+from concurrency import HostThrottle
+from rate_limit import ProviderLimiter
+from stub_servers import StubServer
+
+
+# Firecrawl stand-in that echoes the requested URL back as the extracted title, holding each
+# request for a random moment and recording in-flight counts and start times per article host.
+class FirecrawlRecorder:
+    def __init__(self, hold_s=(0.01, 0.05), seed=0):
+        self.hold_s = hold_s
+        self.in_flight = {}
+        self.max_in_flight = {}
+        self.started = {}
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def route(self, method, path, query, body):
+        url = body["url"]
+        host = HostThrottle.host_of(url)
+        with self._lock:
+            self.started.setdefault(host, []).append(time.monotonic())
+            self.in_flight[host] = self.in_flight.get(host, 0) + 1
+            self.max_in_flight[host] = max(self.max_in_flight.get(host, 0), self.in_flight[host])
+            hold = self._rng.uniform(*self.hold_s)
+        time.sleep(hold)
+        with self._lock:
+            self.in_flight[host] -= 1
+        return 200, {"success": True, "data": {"json": {"main_article_title": url, "main_article_content": "body"}}}
+
+
+@pytest.fixture
+def firecrawl(monkeypatch):
+    recorder = FirecrawlRecorder()
+    with StubServer({"/v1/scrape": recorder.route}) as server:
+        monkeypatch.setenv("FIRECRAWL_API_KEY", "test")
+        monkeypatch.setattr(utils, "firecrawl_api_url", f"{server.url}/v1/scrape")
+        monkeypatch.setattr(utils, "get_scrape_cache", lambda: None)
+        monkeypatch.setattr(utils, "local_extraction_enabled", False)
+        limiter = ProviderLimiter("firecrawl-test", rate_per_sec=1000, burst=1000, initial_concurrency=32)
+        monkeypatch.setattr(utils, "get_limiter", lambda *args, **kwargs: limiter)
+        yield recorder
+
+
+def articles_on(*hosts, per_host=6):
+    return [Article(position=i, link=f"https://{host}/story-{i}", source=host)
+            for host in hosts for i in range(per_host)]
+
+
+def test_results_are_written_back_to_their_own_articles(firecrawl):
+    articles = articles_on("a.example", "b.example")
+    random.Random(1).shuffle(articles)
+
+    utils.scrape_articles_concurrently(articles, scrape_fn=utils.scrape_article, max_workers=8, per_host_concurrency=3)
+
+    for article in articles:
+        assert article.scraped_article["data"]["json"]["main_article_title"] == article.link
+
+
+def test_per_host_concurrency_is_capped(firecrawl):
+    articles = articles_on("a.example", "b.example", per_host=8)
+
+    utils.scrape_articles_concurrently(articles, scrape_fn=utils.scrape_article, max_workers=16, per_host_concurrency=2)
+
+    assert firecrawl.max_in_flight == {"a.example": 2, "b.example": 2}
+
+
+def test_per_host_rate_spaces_out_request_starts(firecrawl):
+    articles = articles_on("a.example", "b.example", per_host=4)
+
+    utils.scrape_articles_concurrently(articles, scrape_fn=utils.scrape_article, max_workers=8,
+                                       per_host_concurrency=4, per_host_rate=20)
+
+    for host, starts in firecrawl.started.items():
+        gaps = [later - earlier for earlier, later in zip(sorted(starts), sorted(starts)[1:])]
+        assert min(gaps) >= 0.045, (host, gaps)
+    # Hosts are throttled independently, so both start right away
+    first_starts = [min(starts) for starts in firecrawl.started.values()]
+    assert max(first_starts) - min(first_starts) < 0.04
+
+
+def test_throttle_waits_out_the_min_interval_with_a_fake_clock():
+    now = [100.0]
+    sleeps = []
+
+    def sleep(seconds):
+        sleeps.append(round(seconds, 6))
+        now[0] += seconds
+
+    throttle = HostThrottle(max_concurrent=1, rate_per_sec=4, clock=lambda: now[0], sleep=sleep)
+    for _ in range(3):
+        throttle.run("https://a.example/1", lambda: None)
+    throttle.run("https://b.example/1", lambda: None)
+
+    assert sleeps == [0.25, 0.25]
+
+
+def test_host_limits_override_the_defaults():
+    throttle = HostThrottle(max_concurrent=4, host_limits=lambda host: (1, 2.0) if host == "slow.example" else None)
+
+    semaphore, min_interval = throttle._host_state("slow.example")
+    assert min_interval == 0.5
+    assert semaphore.acquire(blocking=False)
+    assert not semaphore.acquire(blocking=False)
+    assert throttle._host_state("fast.example")[1] == 0.0
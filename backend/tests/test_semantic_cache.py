@@ -0,0 +1,67 @@
+import pytest
+
+from semantic_cache import SemanticQueryCache
+
+
+class FakeClock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def cache(clock):
+    cache = SemanticQueryCache(path=":memory:", clock=clock)
+    cache.add("Federal Reserve interest rate hike", {"bias_comparison_output": "hike"})
+    cache.add("Biden student loan forgiveness", {"bias_comparison_output": "biden"})
+    cache.add("US tariffs on Chinese imports", {"bias_comparison_output": "tariffs"})
+    return cache
+
+
+def test_default_threshold_is_strict(cache):
+    assert cache.threshold == 0.9
+
+
+@pytest.mark.parametrize("subject", [
+    "Federal Reserve interest rate cut",
+    "Trump student loan forgiveness",
+    "Biden student loan forgiveness plan",
+])
+def test_different_subjects_miss(cache, subject):
+    assert cache.lookup(subject) is None
+
+
+@pytest.mark.parametrize("subject, expected", [
+    ("interest rate hike Federal Reserve", "hike"),
+    ("the Federal Reserve interest rate hike", "hike"),
+    ("Federal Reserve's interest rate hikes", "hike"),
+    ("student loan forgiveness Biden", "biden"),
+    ("tariffs on Chinese imports", "tariffs"),
+    ("US Tariffs on Chinese imports.", "tariffs"),
+])
+def test_paraphrases_hit(cache, subject, expected):
+    found = cache.lookup(subject)
+    assert found is not None and found["result"]["bias_comparison_output"] == expected
+    assert found["similarity"] >= cache.threshold
+
+
+def test_entries_expire_after_max_age(cache, clock):
+    clock.now += cache.max_age_seconds + 1
+
+    assert cache.lookup("Federal Reserve interest rate hike") is None
+    assert cache.prune() == 3
+    assert cache.stats()["entries"] == 0
+
+
+def test_stats_count_hits_and_misses(cache):
+    cache.lookup("Federal Reserve interest rate hike")
+    cache.lookup("Federal Reserve interest rate cut")
+
+    assert cache.stats() == {"hits": 1, "misses": 1, "hit_rate": 0.5, "entries": 3}
@@ -0,0 +1,43 @@
+import statistics
+
+import pytest
+
+from topics import add_sentiment, build_comparison_update_prompt, sentiment_stddev
+
+
+def running_stats(values):
+    stats = None
+    for value in values:
+        stats = add_sentiment(stats, value)
+    return stats
+
+
+@pytest.mark.parametrize("values", [
+    [0.2, 0.4],
+    [-0.5, 0.1, 0.3, 0.9],
+    [0.25, 0.25, 0.25],
+])
+def test_sentiment_stddev_is_the_sample_standard_deviation(values):
+    assert sentiment_stddev(running_stats(values)) == pytest.approx(statistics.stdev(values))
+
+
+def test_sentiment_stddev_needs_two_articles():
+    assert sentiment_stddev(running_stats([0.7])) is None
+
+
+def test_running_stats_track_mean_and_range():
+    stats = running_stats([-0.5, 0.1, 0.3, 0.9])
+
+    assert stats["count"] == 4
+    assert stats["mean"] == pytest.approx(0.2)
+    assert (stats["min"], stats["max"]) == (-0.5, 0.9)
+
+
+def test_update_prompt_reports_stddev_only_when_defined():
+    prompt = build_comparison_update_prompt(
+        "interest rates", "previous comparison",
+        {"Example": running_stats([0.2, 0.4]), "Wire": running_stats([0.5])}, {}
+    )
+
+    assert "# Example: 2 articles, mean 0.30, std 0.14, range 0.20 to 0.40" in prompt
+    assert "# Wire: 1 articles, mean 0.50, std n/a, range 0.50 to 0.50" in prompt